@@ -1,18 +1,105 @@
+import contextlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 import extract_top_centers as etc
+from marker_lut import DARK_RED_RANGES, NORMAL_RED_RANGES, get_marker_lut, apply_marker_lut
+from frame_buffers import FrameBufferPool
 # 修改，替换标志物中心提取方法
 
+_tile_executor = None
+_tile_executor_lock = threading.Lock()
+
+
+def get_tile_executor():
+    """分块分割共用的线程池（OpenCV 与 NumPy 的大数组运算释放 GIL，各块可并行）"""
+    global _tile_executor
+    if _tile_executor is None:
+        with _tile_executor_lock:
+            if _tile_executor is None:
+                _tile_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="TileWorker")
+    return _tile_executor
+
+
 class ExPixelCoord:
     """
     封装标志物的筛选、排序和记忆逻辑，便于连续帧提取像素坐标。
 
-    polygon_pts 定义 ROI 多边形，pre_points 缓存上一帧结果以保持编号一致。
+    polygon_pts 定义 ROI 多边形，pre_points 缓存上一帧结果以保持编号一致；
+    buffer_pool 复用灰度图、掩膜等大尺寸缓冲区，稳态处理不再逐帧分配。
+    hsv_ranges / dark_hsv_ranges / min_area / dark_threshold 为该 ROI 的标志物阈值，未指定时使用默认值；
+    tiles 大于 1 时 ROI 按行切成 tiles 块由线程池并行分割（用于 40MP 以上的大 ROI），结果与不分块完全相同。
     """
 
-    def __init__(self, polygon_pts, pre_points=None):
+    # ROI 外接矩形向外扩展的像素数，需不小于闭运算核半径之和，保证与整图处理结果一致
+    ROI_MARGIN = 2
+    CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    GRAY_LEVELS = np.arange(256, dtype=np.float64)
+    # 分块时每块向上下多处理的行数（闭运算先膨胀后腐蚀，各需 1 行），保证块内结果与整块处理一致
+    TILE_HALO = 2
+    # 每块最少行数，ROI 过矮时不分块
+    TILE_MIN_ROWS = 64
+    # calcHist 以 float32 计数，单块像素数不超过 2^24 时计数精确，分块求和与整帧直方图一致
+    HIST_TILE_PIXELS = 1 << 24
+
+    def __init__(self, polygon_pts, pre_points=None, buffer_pool=None, hsv_ranges=None, dark_hsv_ranges=None,
+                 min_area=40, dark_threshold=60, tiles=0):
         self.pre_points = pre_points
         self.polygon_pts = polygon_pts
+        self.buffer_pool = buffer_pool or FrameBufferPool()
+        self.hsv_ranges = hsv_ranges or NORMAL_RED_RANGES
+        self.dark_hsv_ranges = dark_hsv_ranges or DARK_RED_RANGES
+        self.min_area = min_area
+        self.dark_threshold = dark_threshold
+        self.tiles = tiles
+        # 每块独立的缓冲池（块任务在线程池中并发执行，FrameBufferPool 非线程安全）
+        self.tile_pools = []
+
+    def clone(self):
+        """复制阈值与当前 pre_points 的独立跟踪器，共用帧缓冲池（用于最新帧优先模式的历史跟踪器）"""
+        return ExPixelCoord(
+            self.polygon_pts,
+            None if self.pre_points is None else np.array(self.pre_points, dtype=np.float32),
+            buffer_pool=self.buffer_pool,
+            hsv_ranges=self.hsv_ranges,
+            dark_hsv_ranges=self.dark_hsv_ranges,
+            min_area=self.min_area,
+            dark_threshold=self.dark_threshold,
+            tiles=self.tiles
+        )
+
+    def set_pre_points(self, points):
+        """以给定结果（如时间线上的前一帧）作为下一帧匹配的 pre_points"""
+        self.pre_points = np.array(points, dtype=np.float32)
+
+    def warm_up(self):
+        """编译本 ROI 的两套查找表，并用覆盖 ROI 的空白帧跑一遍提取流程，预先分配 ROI 尺寸的缓冲区"""
+        get_marker_lut(self.hsv_ranges)
+        get_marker_lut(self.dark_hsv_ranges)
+        polygon_pts = np.asarray(self.polygon_pts)
+        height = int(polygon_pts[:, 1].max()) + self.ROI_MARGIN + 1
+        width = int(polygon_pts[:, 0].max()) + self.ROI_MARGIN + 1
+        # 空白帧中没有标志物，不会改变 pre_points；必然出现的“未找到有效标志物”不输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark_pixel_coords_ex(np.zeros((height, width, 3), dtype=np.uint8))
+
+    def roi_bounds(self, img_shape):
+        """
+        计算多边形 ROI 外接矩形（含 ROI_MARGIN 边距并裁剪到图像范围）。
+
+        返回 (x0, y0, x1, y1)，切片 img[y0:y1, x0:x1] 即为参与分割的区域。
+        """
+        height, width = img_shape[:2]
+        x, y, w, h = cv2.boundingRect(np.asarray(self.polygon_pts, dtype=np.int32))
+        x0 = max(x - self.ROI_MARGIN, 0)
+        y0 = max(y - self.ROI_MARGIN, 0)
+        x1 = min(x + w + self.ROI_MARGIN, width)
+        y1 = min(y + h + self.ROI_MARGIN, height)
+        return x0, y0, x1, y1
 
     def smart_sort_cross(self, points):
         """
@@ -110,7 +197,7 @@ class ExPixelCoord:
         判断图像是否过暗
 
         参数:
-        - img_path: 图像路径
+        - img_path: 图像路径，或已解码的 BGR 图像（避免重复读取）
         - dark_threshold: 亮度阈值（0-255）
         - dark_pixel_ratio: 暗像素比例阈值
 
@@ -118,20 +205,19 @@ class ExPixelCoord:
         - True: 图像过暗
         - False: 图像亮度正常
         """
-        img = cv2.imread(img_path)
+        img = cv2.imread(img_path) if isinstance(img_path, str) else img_path
         if img is None:
             return True  # 如果无法读取，也跳过
 
-        # 转换为灰度图
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # 计算统计信息
-        mean_val = np.mean(gray)
-        std_val = np.std(gray)  # 标准差，用于判断对比度
+        # 转换为灰度图（写入复用缓冲区）并计算直方图
+        hist = self.gray_histogram(img)
+        total_pixels = img.shape[0] * img.shape[1]
 
-        # 计算直方图
-        hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-        total_pixels = gray.size
+        # 由直方图计算统计信息，避免整图浮点临时数组
+        levels = self.GRAY_LEVELS
+        counts = hist.ravel().astype(np.float64)
+        mean_val = float(np.dot(levels, counts) / total_pixels)
+        std_val = float(np.sqrt(max(np.dot(levels * levels, counts) / total_pixels - mean_val ** 2, 0.0)))  # 标准差，用于判断对比度
 
         # 计算不同亮度区间的像素比例
         very_dark = np.sum(hist[:30]) / total_pixels  # 极暗像素比例
@@ -149,56 +235,182 @@ class ExPixelCoord:
 
         return any(conditions)
 
-    def mark_pixel_coords_ex(self, img_file):
+    def _tile_bounds(self, height, tiles):
+        return np.linspace(0, height, tiles + 1).astype(int)
+
+    def _get_tile_pool(self, index):
+        while len(self.tile_pools) <= index:
+            self.tile_pools.append(FrameBufferPool())
+        return self.tile_pools[index]
+
+    def gray_histogram(self, img):
+        """整帧灰度直方图（256x1 float32），启用分块时按行分块并行转换与统计"""
+        gray = self.buffer_pool.get('gray', img.shape[:2])
+        height, width = img.shape[:2]
+        tiles = max(self.tiles, -(-height * width // self.HIST_TILE_PIXELS)) if self.tiles > 1 else 1
+        if tiles <= 1:
+            cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+            return cv2.calcHist([gray], [0], None, [256], [0, 256])
+
+        def tile_histogram(start, end):
+            cv2.cvtColor(img[start:end], cv2.COLOR_BGR2GRAY, dst=gray[start:end])
+            return cv2.calcHist([gray[start:end]], [0], None, [256], [0, 256])
+
+        bounds = self._tile_bounds(height, tiles)
+        executor = get_tile_executor()
+        futures = [executor.submit(tile_histogram, bounds[i], bounds[i + 1]) for i in range(tiles)]
+        # 各块计数为精确整数，合计后再转为 float32，与整帧 calcHist 的结果相同
+        return sum(future.result().astype(np.float64) for future in futures).astype(np.float32)
+
+    def _find_contours_tiled(self, roi, lut, mask_poly, x0, y0):
+        """
+        ROI 按行分块并行完成查表、多边形掩膜、闭运算与轮廓查找，再合并跨越块边界的轮廓。
+
+        只在块内部的轮廓与整块结果相同；接触块边界行的轮廓按外接矩形聚类，在合并后的掩膜上
+        用连通域标记取出完整区域重新查找；被合并轮廓包围的块内轮廓（整块处理时属于内层）去掉。
+        最后按起点（最上、最左的像素）逆光栅顺序排列，与 findContours 对整块的输出顺序一致。
+        """
+        height, width = roi.shape[:2]
+        bounds = self._tile_bounds(height, self.tiles)
+        last = self.tiles - 1
+        mask_closed = self.buffer_pool.get('mask_closed', (height, width))
+        for index in range(self.tiles):
+            self._get_tile_pool(index)
+
+        def segment_tile(index):
+            start, end = bounds[index], bounds[index + 1]
+            halo_start = max(start - self.TILE_HALO, 0)
+            halo_end = min(end + self.TILE_HALO, height)
+            pool = self.tile_pools[index]
+            mask_red = apply_marker_lut(roi[halo_start:halo_end], lut, pool=pool)
+            cv2.bitwise_and(mask_red, mask_poly[halo_start:halo_end], dst=mask_red)
+            closed = pool.get('mask_closed', mask_red.shape)
+            cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, self.CLOSE_KERNEL, dst=closed)
+            tile_closed = mask_closed[start:end]
+            tile_closed[...] = closed[start - halo_start:end - halo_start]
+            contours, _ = cv2.findContours(tile_closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE,
+                                           offset=(x0, y0 + start))
+            return contours
+
+        executor = get_tile_executor()
+        futures = [executor.submit(segment_tile, index) for index in range(self.tiles)]
+
+        contours = []
+        seam_parts = []
+        for index, future in enumerate(futures):
+            for contour in future.result():
+                x, y, w, h = cv2.boundingRect(contour)
+                top, bottom = y - y0, y - y0 + h
+                if (index > 0 and top == bounds[index]) or (index < last and bottom == bounds[index + 1]):
+                    seam_parts.append((contour, (x - x0, top, x - x0 + w, bottom)))
+                else:
+                    contours.append(contour)
+
+        merged = []
+        for cluster in self._cluster_rects([rect for _, rect in seam_parts]):
+            cx0 = min(seam_parts[i][1][0] for i in cluster)
+            cy0 = min(seam_parts[i][1][1] for i in cluster)
+            cx1 = max(seam_parts[i][1][2] for i in cluster)
+            cy1 = max(seam_parts[i][1][3] for i in cluster)
+            # 连通域（8 邻域，与轮廓查找一致）中包含各部分起点的区域即完整的跨块区域
+            _, labels = cv2.connectedComponents(mask_closed[cy0:cy1, cx0:cx1], connectivity=8)
+            keep = {labels[seam_parts[i][0][0, 0, 1] - y0 - cy0, seam_parts[i][0][0, 0, 0] - x0 - cx0]
+                    for i in cluster}
+            region = np.isin(labels, list(keep)).astype(np.uint8)
+            region_contours, _ = cv2.findContours(region, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE,
+                                                  offset=(x0 + cx0, y0 + cy0))
+            merged.extend(region_contours)
+
+        if merged:
+            merged_rects = [cv2.boundingRect(contour) for contour in merged]
+            inner = []
+            for contour in contours:
+                px, py = (float(v) for v in contour[0, 0])
+                for outer, (mx, my, mw, mh) in zip(merged, merged_rects):
+                    if mx <= px < mx + mw and my <= py < my + mh and cv2.pointPolygonTest(outer, (px, py), False) > 0:
+                        break
+                else:
+                    inner.append(contour)
+            contours = inner + merged
+
+        contours.sort(key=lambda contour: (int(contour[0, 0, 1]), int(contour[0, 0, 0])), reverse=True)
+        return contours
+
+    @staticmethod
+    def _cluster_rects(rects):
+        """按外接矩形（向外扩 1 像素，8 邻域相邻即相交）是否相交聚类，返回下标列表的列表"""
+        parent = list(range(len(rects)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, (ax0, ay0, ax1, ay1) in enumerate(rects):
+            for j in range(i):
+                bx0, by0, bx1, by1 = rects[j]
+                if ax0 <= bx1 and bx0 <= ax1 and ay0 <= by1 and by0 <= ay1:
+                    parent[find(i)] = find(j)
+        clusters = {}
+        for i in range(len(rects)):
+            clusters.setdefault(find(i), []).append(i)
+        return list(clusters.values())
+
+    def mark_pixel_coords_ex(self, img_file, too_dark=None):
         """
         读取图片、在 ROI 内提取蓝色标志物轮廓、计算中心并返回排序后的坐标列表。
 
         流程：
-        1. HSV 阈值提取蓝色区域；
+        1. 在 ROI 外接矩形内用预编译的 BGR 位查找表提取红色区域（等价于 HSV 双区间阈值）；
         2. 应用多边形掩膜限定区域；
         3. 查找轮廓 -> 过滤面积 -> 使用 adaptive_contour_center 求中心；
         4. 基于历史或初次排序策略输出最终像素坐标。
+
+        img_file 可以是图片路径，也可以是调用方已解码的 BGR 图像（只读使用）；
+        too_dark 为调用方已判定的整帧明暗（多个 ROI 共用一帧时只判定一次），None 时自行判定。
         """
-        img = cv2.imread(img_file)
+        img = cv2.imread(img_file) if isinstance(img_file, str) else img_file
         if img is None:
             print("Error: 无法读取图像文件")
             return
 
-        # 转换为HSV颜色空间
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # 修改，调整了hsv阈值范围
-        if self.is_image_too_dark(img_file):
-            lower_red1 = np.array([0, 180, 50])  # 红色低区间（H: 0-10）
-            upper_red1 = np.array([10, 255, 255])
-            lower_red2 = np.array([140, 180, 50])  # 红色高区间（H: 160-180）
-            upper_red2 = np.array([180, 255, 255])
+        # 修改，HSV 阈值预编译为 BGR 位查找表，仅在 ROI 外接矩形内查表
+        if too_dark is None:
+            too_dark = self.is_image_too_dark(img, self.dark_threshold)
+        if too_dark:
+            lut = get_marker_lut(self.dark_hsv_ranges)
         else:
-            lower_red1 = np.array([0, 150, 180])  # 红色低区间（H: 0-10）
-            upper_red1 = np.array([10, 255, 255])
-            lower_red2 = np.array([160, 90, 180])  # 红色高区间（H: 160-180）
-            upper_red2 = np.array([180, 255, 255])
+            lut = get_marker_lut(self.hsv_ranges)
+
+        x0, y0, x1, y1 = self.roi_bounds(img.shape)
+        roi = img[y0:y1, x0:x1]
+        roi_shape = roi.shape[:2]
 
-        # 创建红色掩膜（需要组合两个范围）
-        mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask_red = cv2.bitwise_or(mask_red1, mask_red2)
+        # 多边形区域掩膜只与 ROI 尺寸相关，仅在缓冲区（重新）分配时绘制
+        def draw_polygon(mask_poly):
+            mask_poly.fill(0)
+            cv2.fillPoly(mask_poly, [self.polygon_pts - np.array([x0, y0], dtype=self.polygon_pts.dtype)], 255)
+        mask_poly = self.buffer_pool.get(('poly_mask', x0, y0), roi_shape, init=draw_polygon)
 
-        # 创建多边形区域掩膜
-        mask_poly = np.zeros_like(mask_red)
-        cv2.fillPoly(mask_poly, [self.polygon_pts], 255)
+        if self.tiles > 1 and roi_shape[0] >= self.tiles * self.TILE_MIN_ROWS:
+            contours = self._find_contours_tiled(roi, lut, mask_poly, x0, y0)
+        else:
+            # 创建红色掩膜（查表结果即两个红色区间的并集）
+            mask_red = apply_marker_lut(roi, lut, pool=self.buffer_pool)
 
-        # 联合掩膜：只在多边形区域内检测红色
-        mask_combined = cv2.bitwise_and(mask_red, mask_poly)
+            # 联合掩膜：只在多边形区域内检测红色（原地写回）
+            cv2.bitwise_and(mask_red, mask_poly, dst=mask_red)
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        mask_closed = cv2.morphologyEx(mask_combined, cv2.MORPH_CLOSE, kernel)
+            mask_closed = self.buffer_pool.get('mask_closed', roi_shape)
+            cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, self.CLOSE_KERNEL, dst=mask_closed)
 
-        # 查找轮廓
-        contours, _ = cv2.findContours(mask_closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+            # 查找轮廓
+            contours, _ = cv2.findContours(mask_closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE,
+                                           offset=(x0, y0))
 
         centers = []
-        min_area = 40
+        min_area = self.min_area
 
         for contour in contours:
             area = cv2.contourArea(contour)
@@ -222,6 +434,67 @@ class ExPixelCoord:
         return self.pre_points
 
 
+class RoiGroup:
+    """
+    单台相机的多个命名 ROI（如同一画面中的多块靶板），各自有独立的阈值、初始坐标和跟踪状态。
+
+    一帧只解码一次，依次交给各 ROI 的 ExPixelCoord 提取；整帧明暗按不同的 dark_threshold 各判定一次。
+    各 ROI 的缓冲区登记在同一个 FrameBufferPool 的不同命名空间下。
+    """
+
+    def __init__(self, trackers, buffer_pool=None):
+        """
+        Args:
+            trackers: {ROI 名称: ExPixelCoord}，按配置顺序
+            buffer_pool: 各 ROI 共用的底层缓冲池（用于统计）
+        """
+        self.trackers = dict(trackers)
+        self.buffer_pool = buffer_pool or FrameBufferPool()
+
+    @property
+    def polygon_pts(self):
+        """全部 ROI 的多边形顶点，其外接矩形覆盖所有 ROI（用于重复帧指纹等整体判断）"""
+        return np.vstack([np.asarray(tracker.polygon_pts) for tracker in self.trackers.values()])
+
+    @property
+    def pre_points(self):
+        return {name: tracker.pre_points for name, tracker in self.trackers.items()}
+
+    def clone(self):
+        return RoiGroup({name: tracker.clone() for name, tracker in self.trackers.items()}, self.buffer_pool)
+
+    def set_pre_points(self, points):
+        """points 为 {ROI 名称: 坐标}，缺少的 ROI 保持原状态"""
+        for name, roi_points in points.items():
+            if name in self.trackers and roi_points is not None:
+                self.trackers[name].set_pre_points(roi_points)
+
+    def warm_up(self):
+        for tracker in self.trackers.values():
+            tracker.warm_up()
+
+    def mark_pixel_coords_ex(self, img_file):
+        """
+        对同一帧提取全部 ROI，返回 {ROI 名称: 坐标或 None}；全部 ROI 均失败时返回 None。
+        """
+        img = cv2.imread(img_file) if isinstance(img_file, str) else img_file
+        if img is None:
+            print("Error: 无法读取图像文件")
+            return
+
+        first = next(iter(self.trackers.values()))
+        darkness = {}
+        results = {}
+        for name, tracker in self.trackers.items():
+            if tracker.dark_threshold not in darkness:
+                darkness[tracker.dark_threshold] = first.is_image_too_dark(img, tracker.dark_threshold)
+            results[name] = tracker.mark_pixel_coords_ex(img, too_dark=darkness[tracker.dark_threshold])
+
+        if all(points is None for points in results.values()):
+            return
+        return results
+
+
 if __name__ == "__main__":
     process = ExPixelCoord(
         polygon_pts=np.array(
@@ -3,21 +3,31 @@
 # 3.识别到文件夹中出现新图片，开始处理，包括：
 #   解析时间戳，提取像素坐标，将像素坐标文件保存到另一文件夹路径（基于输入路径构建）下，最后将图片备份
 
-import os
 import time
+
+# 启动耗时统计的起点（含下方模块导入）
+_IMPORT_STARTED = time.perf_counter()
+
+import io
+import os
+import shutil
 import sys
 import logging
 from datetime import datetime
 
 import cv2
 import numpy as np
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import threading
-from Ex_Pixel import ExPixelCoord
-from config_loader import load_config
+from Ex_Pixel import RoiGroup
+from camera_registry import create_tracker
+from output_writer import OutputWriter
+from config_loader import IMAGE_EXTENSIONS, load_config
 from PIL import Image
-import shutil
+
+# 可选功能（重复帧检测、负载降级、调度、位移告警、轮询、查询/推送接口、归档）的模块在启用时才导入，
+# 未启用的功能不增加启动耗时
+
 
 def setup_logging(log_file=None):
     """设置日志配置"""
@@ -48,24 +58,88 @@ def setup_logging(log_file=None):
     logger.info(f"日志系统已启动，日志文件: {log_file}")
     return logger
 
+
+class StartupTimer:
+    """按阶段记录启动耗时（自模块导入开始），启动完成后与预算比较并写入日志"""
+
+    def __init__(self):
+        self.phases = []
+        self._last = _IMPORT_STARTED
+
+    def mark(self, phase):
+        """记录自上一阶段结束以来的耗时"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self, logger, budget=0):
+        """输出各阶段耗时；budget 为启动耗时预算（秒），超出时记录警告，0 不检查"""
+        detail = ", ".join(f"{phase}: {seconds:.2f}秒" for phase, seconds in self.phases)
+        logger.info(f"启动耗时: {self.total:.2f}秒 ({detail})")
+        if budget and self.total > budget:
+            slowest, seconds = max(self.phases, key=lambda item: item[1])
+            logger.warning(f"启动耗时 {self.total:.2f}秒 超出预算 {budget}秒，最慢阶段: {slowest} {seconds:.2f}秒")
+
+def roi_names(ex_pixel_coord_obj):
+    """相机的 ROI 名称列表；单 ROI 相机为 [None]"""
+    if isinstance(ex_pixel_coord_obj, RoiGroup):
+        return list(ex_pixel_coord_obj.trackers)
+    return [None]
+
+
+def result_stream_name(camera_name, roi_name):
+    """结果在查询接口、推送与位移告警中使用的名称：单 ROI 相机为相机名，多 ROI 为 相机名:ROI 名"""
+    return camera_name if roi_name is None else f"{camera_name}:{roi_name}"
+
+
 class CameraMonitor:
     """统一管理多台相机的上传目录监控与事件分发。"""
-    def __init__(self, base_upload_path, base_processed_path, camera_configs,  wait_time=2, logger=None):
+    def __init__(self, base_upload_path, base_processed_path, camera_configs,  wait_time=2, logger=None,
+                 dedup_config=None, output_writer=None, load_shedding_config=None, scheduling_config=None,
+                 displacement_config=None, result_cache=None, result_publisher=None, ingest_config=None,
+                 quality_gate_config=None, memory_monitor=None, freshness_monitor=None, extraction_config=None,
+                 camera_cache_config=None):
         """
         初始化顶层监控器，负责为每个相机场景创建事件观察者和像素提取器。
 
         Args:
             base_upload_path: ATLI 上传目录根路径（监听源）。
             base_processed_path: 处理结果根路径（输出像素与备份）。
-            camera_configs: 每台相机的 ROI 配置，用于实例化 ExPixelCoord。
+            camera_configs: 每台相机的 ROI 配置，用于实例化 ExPixelCoord（按需创建时可为 LazyCameraConfigs）。
             wait_time: 文件写入等待时间（秒）。
+            dedup_config: 重复帧检测配置（见 ConfigLoader.get_dedup_config），None 或未启用时不做检测。
+            output_writer: 全部相机共用的 OutputWriter（组提交），None 时各批次同步写出。
+            load_shedding_config: 负载降级配置（见 ConfigLoader.get_load_shedding_config），None 或未启用时不降级。
+            scheduling_config: 调度配置（见 ConfigLoader.get_scheduling_config），mode 为 latest_first 时最新帧优先。
+            displacement_config: 位移统计与告警配置（见 ConfigLoader.get_displacement_config），None 或未启用时不统计。
+            result_cache: 查询接口使用的 ResultCache，None 时不缓存结果。
+            result_publisher: 结果推送使用的 ResultPublisher，None 时不推送。
+            ingest_config: 新文件发现方式（见 ConfigLoader.get_ingest_config），mode 为 polling 时
+                以单线程轮询替代 watchdog，用于收不到 inotify 事件的网络挂载目录。
+            quality_gate_config: 图像质量门限配置（见 ConfigLoader.get_quality_gate_config），None 或未启用时不评估。
+            memory_monitor: 内存监控使用的 MemoryMonitor，登记各组件计数并记录单帧峰值内存，None 时不监控。
+            freshness_monitor: 数据新鲜度监控使用的 FreshnessMonitor，记录各相机上传与处理时间，None 时不监控。
+            extraction_config: 坐标提取方式（见 ConfigLoader.get_extraction_config），mode 为 process 时
+                在工作进程中提取，帧经共享内存传递。
+            camera_cache_config: 相机状态按需创建配置（见 ConfigLoader.get_camera_cache_config），lazy 为 True 时
+                各相机的跟踪器与位移统计在第一次上传时创建，超过内存预算时回收空闲相机的跟踪器。
         """
         self.base_upload_path = base_upload_path
         self.base_processed_path = base_processed_path
         self.camera_configs = camera_configs
         self.cameras = list(camera_configs.keys())
         self.observers = []
+        self.camera_handlers = []
         self.wait_time = wait_time
+        self.output_writer = output_writer
+        self.result_cache = result_cache
+        self.result_publisher = result_publisher
+        self.memory_monitor = memory_monitor
+        self.freshness_monitor = freshness_monitor
         self.logger = logger or logging.getLogger('atli_monitor.camera_monitor')
 
         self.logger.info(f"初始化相机监控器 - 相机数量: {len(self.cameras)}")
@@ -73,16 +147,231 @@ class CameraMonitor:
         self.logger.info(f"处理路径: {base_processed_path}")
         self.logger.info(f"等待时间: {wait_time}秒")
 
-        # 为每个相机创建ExPixelCoord对象
+        # 为每个相机创建ExPixelCoord对象；配置了多个 ROI 的相机创建 RoiGroup，一帧解码后依次提取各 ROI
+        # 按需创建模式下启动时不读取各相机的初始坐标，跟踪器由 CameraRegistry 在第一次上传时创建
         self.ex_pixel_coord_objects = {}
-        for camera_name, config in camera_configs.items():
-            polygon_pts = config.get('polygon_pts')
-            pre_points = config.get('pre_points', None)
-            if polygon_pts is not None:
-                self.ex_pixel_coord_objects[camera_name] = ExPixelCoord(polygon_pts, pre_points)
-                self.logger.info(f"相机 {camera_name} 像素提取器初始化成功")
-            else:
-                self.logger.warning(f"相机 {camera_name} 缺少 polygon_pts 配置")
+        self.camera_registry = None
+        if camera_cache_config and camera_cache_config.get('lazy', False):
+            from camera_registry import CameraRegistry
+            self.camera_registry = CameraRegistry(
+                camera_configs,
+                state_dir=camera_cache_config.get('state_dir', 'tracker_state'),
+                memory_budget_mb=camera_cache_config.get('memory_budget_mb', 0),
+                max_cameras=camera_cache_config.get('max_cameras', 0),
+                idle_seconds=camera_cache_config.get('idle_seconds', 300),
+                on_create=self._on_camera_created,
+                on_evict=self._on_camera_evicted,
+                logger=self.logger
+            )
+            self.logger.info(f"相机状态按需创建 - 内存预算: {camera_cache_config.get('memory_budget_mb', 0)}MB, "
+                             f"常驻相机上限: {camera_cache_config.get('max_cameras', 0)}, 跟踪状态目录: {camera_cache_config.get('state_dir', 'tracker_state')}")
+        else:
+            for camera_name, config in camera_configs.items():
+                tracker = create_tracker(config)
+                if tracker is None:
+                    self.logger.warning(f"相机 {camera_name} 缺少 polygon_pts 配置")
+                    continue
+                self.ex_pixel_coord_objects[camera_name] = tracker
+                if isinstance(tracker, RoiGroup):
+                    self.logger.info(f"相机 {camera_name} 像素提取器初始化成功 - ROI: {', '.join(tracker.trackers)}")
+                else:
+                    self.logger.info(f"相机 {camera_name} 像素提取器初始化成功")
+        # 按需创建时全部相机都有处理组件，否则只有成功创建了跟踪器的相机
+        managed_cameras = self.cameras if self.camera_registry is not None else list(self.ex_pixel_coord_objects)
+
+        # 为每个相机创建重复帧检测器（跨 TLS 批次保留指纹）
+        self.frame_deduplicators = {}
+        if dedup_config and dedup_config.get('enabled', False):
+            from frame_dedup import FrameDeduplicator
+            for camera_name in managed_cameras:
+                self.frame_deduplicators[camera_name] = FrameDeduplicator(
+                    near_duplicate_distance=dedup_config.get('near_duplicate_distance', -1),
+                    max_reuse=dedup_config.get('max_reuse', 5),
+                    history_size=dedup_config.get('history_size', 256)
+                )
+            self.logger.info(f"重复帧检测已启用 - 近似阈值: {dedup_config.get('near_duplicate_distance', -1)}, "
+                             f"最大连续复用: {dedup_config.get('max_reuse', 5)}")
+
+        # 为每个相机创建图像质量门限：提取前在缩小的 ROI 上评分，雾、模糊、过暗等帧跳过提取或标记
+        self.quality_gates = {}
+        if quality_gate_config and quality_gate_config.get('enabled', False):
+            from quality_gate import FrameQualityGate
+            for camera_name in managed_cameras:
+                self.quality_gates[camera_name] = FrameQualityGate(
+                    reduce_factor=quality_gate_config.get('reduce_factor', 4),
+                    min_sharpness=quality_gate_config.get('min_sharpness', 0.0),
+                    min_contrast=quality_gate_config.get('min_contrast', 0.0),
+                    min_red_ratio=quality_gate_config.get('min_red_ratio', 0.0),
+                    min_marker_ratio=quality_gate_config.get('min_marker_ratio', 0.0),
+                    action=quality_gate_config.get('action', 'flag'),
+                    logger=self.logger
+                )
+            self.logger.info(f"图像质量门限已启用 - 低质量帧处理: {quality_gate_config.get('action', 'flag')}")
+
+        # 为每个相机创建负载降级状态（跨 TLS 批次保留）
+        self.load_shedders = {}
+        if load_shedding_config and load_shedding_config.get('enabled', False):
+            from load_shedding import LoadShedder
+            for camera_name in managed_cameras:
+                self.load_shedders[camera_name] = LoadShedder(
+                    camera_name,
+                    queue_depth=load_shedding_config.get('queue_depth', (3, 6, 10, 20)),
+                    frame_age=load_shedding_config.get('frame_age', (30, 60, 120, 300)),
+                    recover_ratio=load_shedding_config.get('recover_ratio', 0.5),
+                    logger=self.logger
+                )
+            self.logger.info(f"负载降级已启用 - 积压阈值: {load_shedding_config.get('queue_depth')}, "
+                             f"等待阈值: {load_shedding_config.get('frame_age')}秒")
+
+        # 为每个相机（多 ROI 相机为每个 ROI）创建位移统计（以初始坐标为基准），告警输出各相机共用
+        # 按需创建模式下先登记空字典，相机第一次创建跟踪器时再填入（处理器持有同一个字典）
+        self.alert_sinks = []
+        self.displacement_trackers = {}
+        self.displacement_config = None
+        if displacement_config and displacement_config.get('enabled', False):
+            from displacement import build_alert_sinks
+            self.displacement_config = displacement_config
+            self.alert_sinks = build_alert_sinks(displacement_config.get('sinks'), self.logger)
+            for camera_name in managed_cameras:
+                self.displacement_trackers[camera_name] = {}
+                if self.camera_registry is None:
+                    self._create_displacement_trackers(camera_name, camera_configs[camera_name])
+            self.logger.info(f"位移告警已启用 - 位移阈值: {displacement_config.get('displacement_threshold')}px, "
+                             f"告警输出: {len(self.alert_sinks)}个")
+
+        # 最新帧优先模式：每台相机一个调度线程，实时路径优先处理最新帧，旧帧转入历史路径补处理
+        self.frame_schedulers = {}
+        if scheduling_config and scheduling_config.get('mode', 'fifo') == 'latest_first':
+            from frame_scheduler import LatestFirstScheduler
+            for camera_name in managed_cameras:
+                self.frame_schedulers[camera_name] = LatestFirstScheduler(
+                    camera_name,
+                    self.ex_pixel_coord_objects.get(camera_name),
+                    wait_time=wait_time,
+                    timeline_size=scheduling_config.get('timeline_size', 512),
+                    camera_registry=self.camera_registry,
+                    logger=self.logger
+                )
+            self.logger.info("调度模式: 最新帧优先（旧帧低优先级补处理）")
+
+        # 进程提取模式：所有相机共用一个工作进程池，解码帧经共享内存槽位传给工作进程
+        # （按需创建的相机在第一次提取时才把跟踪器参数发给工作进程）
+        self.extraction_pool = None
+        if extraction_config and extraction_config.get('mode', 'thread') == 'process':
+            from frame_transport import ProcessExtractionPool
+            self.extraction_pool = ProcessExtractionPool(
+                self.ex_pixel_coord_objects,
+                workers=extraction_config.get('workers', 2),
+                slots=extraction_config.get('slots', 4),
+                slot_mb=extraction_config.get('slot_mb', 32),
+                timeout=extraction_config.get('timeout', 60),
+                max_restarts=extraction_config.get('max_restarts', 5),
+                logger=self.logger
+            )
+            self.logger.info(f"坐标提取方式: 工作进程（{extraction_config.get('workers', 2)}个）")
+
+        # 轮询模式：所有相机共用一个轮询线程
+        self.polling_watcher = None
+        if ingest_config and ingest_config.get('mode', 'watchdog') == 'polling':
+            from polling_watcher import PollingWatcher
+            self.polling_watcher = PollingWatcher(
+                min_interval=ingest_config.get('min_interval', 0.5),
+                max_interval=ingest_config.get('max_interval', 5.0),
+                dispatch_workers=ingest_config.get('dispatch_workers', 8),
+                logger=self.logger
+            )
+            self.logger.info(f"文件发现方式: 轮询（间隔 {ingest_config.get('min_interval', 0.5)}~"
+                             f"{ingest_config.get('max_interval', 5.0)}秒）")
+
+        if memory_monitor is not None:
+            self.register_memory_gauges(memory_monitor)
+
+    def _create_displacement_trackers(self, camera_name, config):
+        """按相机配置的初始坐标创建各 ROI 的位移统计，填入该相机的位移统计字典"""
+        from displacement import DisplacementTracker
+        displacement_config = self.displacement_config
+        roi_configs = config['rois'] if config.get('rois') else {None: config}
+        trackers = self.displacement_trackers[camera_name]
+        for roi_name, roi_config in roi_configs.items():
+            if roi_config.get('pre_points') is None:
+                continue
+            trackers[roi_name] = DisplacementTracker(
+                result_stream_name(camera_name, roi_name),
+                np.array(roi_config['pre_points'], dtype=np.float64),
+                self.alert_sinks,
+                displacement_threshold=displacement_config.get('displacement_threshold', 20.0),
+                rate_threshold=displacement_config.get('rate_threshold', 0.0),
+                zscore_threshold=displacement_config.get('zscore_threshold', 0.0),
+                ewma_alpha=displacement_config.get('ewma_alpha', 0.1),
+                clear_ratio=displacement_config.get('clear_ratio', 0.8)
+            )
+
+    def _on_camera_created(self, camera_name, config):
+        """CameraRegistry 第一次为相机创建跟踪器时调用：创建依赖初始坐标的位移统计"""
+        if self.displacement_config is not None:
+            self._create_displacement_trackers(camera_name, config)
+
+    def _on_camera_evicted(self, camera_name):
+        """CameraRegistry 回收相机后调用：工作进程中的同名跟踪器一并释放"""
+        if self.extraction_pool is not None:
+            self.extraction_pool.forget(camera_name)
+
+    def camera_roi_names(self, camera_name):
+        """相机的 ROI 名称列表，按需创建模式下不创建跟踪器"""
+        if self.camera_registry is not None:
+            return self.camera_registry.roi_names(camera_name)
+        return roi_names(self.ex_pixel_coord_objects.get(camera_name))
+
+    def register_memory_gauges(self, memory_monitor):
+        """向内存监控登记可能随运行时间增长的状态规模"""
+        memory_monitor.register_gauge('processed_files', lambda: sum(
+            len(handler.time_folder_handler.processed_files) for handler in self.camera_handlers
+            if handler.time_folder_handler is not None))
+        memory_monitor.register_gauge('observers', lambda: sum(1 for observer in self.observers if observer.is_alive()) + sum(
+            1 for handler in self.camera_handlers
+            if handler.time_folder_observer is not None and handler.time_folder_observer.is_alive()))
+        if self.camera_registry is not None:
+            memory_monitor.register_gauge('buffer_pool_bytes', self.camera_registry.resident_bytes)
+            memory_monitor.register_gauge('resident_cameras', self.camera_registry.resident_cameras)
+        else:
+            memory_monitor.register_gauge('buffer_pool_bytes', lambda: sum(
+                ex_pixel_coord_obj.buffer_pool.nbytes() for ex_pixel_coord_obj in self.ex_pixel_coord_objects.values()))
+        if self.frame_schedulers:
+            memory_monitor.register_gauge('scheduler_backlog', lambda: sum(
+                frame_scheduler.backlog() for frame_scheduler in self.frame_schedulers.values()))
+        if self.output_writer is not None:
+            memory_monitor.register_gauge('output_queue', lambda: self.output_writer.stats()['queued'])
+        if self.extraction_pool is not None:
+            memory_monitor.register_gauge('extraction_slots_busy', self.extraction_pool.busy_slots)
+        if self.result_cache is not None:
+            memory_monitor.register_gauge('cached_frames', lambda: sum(
+                camera['frames'] for camera in self.result_cache.cameras().values()))
+
+    def warm_result_cache(self, cache_sources):
+        """从最近的结果文件预热查询缓存，在后台线程运行，不阻塞监控启动；新帧结果可同时写入缓存"""
+        for stream_name, camera_processed_path, roi_name in cache_sources:
+            try:
+                loaded = self.result_cache.load_recent(stream_name, camera_processed_path, roi=roi_name)
+            except OSError as e:
+                self.logger.warning(f"相机 {stream_name} 查询缓存预热失败: {e}")
+                continue
+            self.logger.info(f"相机 {stream_name} 查询缓存预热: {loaded}帧")
+
+    def warm_up(self):
+        """
+        在开始监控前预热首帧才会用到的资源，避免第一帧承担这些开销:
+        初始化 OpenCV 编解码器，编译各相机（各 ROI）的标志物颜色查找表，并用覆盖 ROI 的空白帧跑一遍提取流程，
+        预先分配帧缓冲池中 ROI 尺寸的缓冲区。空白帧中没有标志物，不会改变跟踪器的 pre_points。
+        按需创建模式下只编译默认阈值的查找表，各相机在第一次上传时创建，启动耗时与相机数量无关。
+        """
+        _, encoded = cv2.imencode('.jpg', np.zeros((16, 16, 3), dtype=np.uint8))
+        cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        if self.camera_registry is not None:
+            from marker_lut import DARK_RED_RANGES, NORMAL_RED_RANGES, get_marker_lut
+            get_marker_lut(NORMAL_RED_RANGES)
+            get_marker_lut(DARK_RED_RANGES)
+        for ex_pixel_coord_obj in self.ex_pixel_coord_objects.values():
+            ex_pixel_coord_obj.warm_up()
 
     def start_monitoring(self):
         """
@@ -90,6 +379,9 @@ class CameraMonitor:
 
         同时确保对应的处理输出目录存在，便于后续写入像素与备份文件。
         """
+        if self.extraction_pool is not None:
+            self.extraction_pool.start()
+        cache_sources = []
         for camera in self.cameras:
             camera_upload_path = os.path.join(self.base_upload_path, camera)
             camera_processed_path = os.path.join(self.base_processed_path, camera)
@@ -97,6 +389,10 @@ class CameraMonitor:
             # 确保处理目录存在
             os.makedirs(camera_processed_path, exist_ok=True)
 
+            if self.result_cache is not None:
+                for roi_name in self.camera_roi_names(camera):
+                    cache_sources.append((result_stream_name(camera, roi_name), camera_processed_path, roi_name))
+
             # 获取该相机的ExPixelCoord对象
             ex_pixel_coord_obj = self.ex_pixel_coord_objects.get(camera)
 
@@ -106,13 +402,43 @@ class CameraMonitor:
                 camera_processed_path,
                 ex_pixel_coord_obj,
                 wait_time=self.wait_time,
-                logger=self.logger
+                logger=self.logger,
+                frame_deduplicator=self.frame_deduplicators.get(camera),
+                quality_gate=self.quality_gates.get(camera),
+                output_writer=self.output_writer,
+                load_shedder=self.load_shedders.get(camera),
+                frame_scheduler=self.frame_schedulers.get(camera),
+                displacement_trackers=self.displacement_trackers.get(camera),
+                result_cache=self.result_cache,
+                result_publisher=self.result_publisher,
+                polling_watcher=self.polling_watcher,
+                memory_monitor=self.memory_monitor,
+                freshness_monitor=self.freshness_monitor,
+                extraction_pool=self.extraction_pool,
+                camera_registry=self.camera_registry
             )
-            observer = Observer()
-            observer.schedule(event_handler, camera_upload_path, recursive=False)
-            observer.start()
-            self.observers.append(observer)
+            self.camera_handlers.append(event_handler)
+            if self.freshness_monitor is not None:
+                # 新鲜度检查扫描当前批次目录，识别未收到文件事件的图片
+                self.freshness_monitor.watch_folder(camera, lambda handler=event_handler: handler.current_time_folder)
+            frame_scheduler = self.frame_schedulers.get(camera)
+            if frame_scheduler is not None:
+                frame_scheduler.start()
+            if self.polling_watcher is not None:
+                self.polling_watcher.schedule(event_handler, camera_upload_path)
+            else:
+                from watchdog.observers import Observer
+                observer = Observer()
+                observer.schedule(event_handler, camera_upload_path, recursive=False)
+                observer.start()
+                self.observers.append(observer)
             self.logger.info(f"开始监控相机: {camera} - 路径: {camera_upload_path}")
+        if self.polling_watcher is not None:
+            self.polling_watcher.start()
+        if cache_sources:
+            # 预热需读取各相机最近 cache_size 个结果文件，放到后台线程，监控启动不等待
+            threading.Thread(target=self.warm_result_cache, args=(cache_sources,),
+                             name='result-cache-warmup', daemon=True).start()
 
     def stop_monitoring(self):
         """
@@ -124,36 +450,97 @@ class CameraMonitor:
             observer.stop()
         for observer in self.observers:
             observer.join()
+        # 各相机当前批次目录的观察者（批次切换时已停止旧的）
+        for handler in self.camera_handlers:
+            if handler.time_folder_observer is not None:
+                handler.time_folder_observer.stop()
+                handler.time_folder_observer.join()
+        if self.polling_watcher is not None:
+            self.polling_watcher.stop()
+        for camera_name, frame_scheduler in self.frame_schedulers.items():
+            frame_scheduler.stop()
+            self.logger.info(f"相机 {camera_name} 调度统计 - {frame_scheduler.format_stats()}")
+        if self.extraction_pool is not None:
+            self.extraction_pool.stop()
+        if self.output_writer is not None:
+            self.output_writer.close()
+        if self.camera_registry is not None:
+            self.camera_registry.close()
+            self.logger.info(f"相机按需创建统计 - {self.camera_registry.format_stats()}")
+        for camera_name, ex_pixel_coord_obj in self.ex_pixel_coord_objects.items():
+            pool_stats = ex_pixel_coord_obj.buffer_pool.stats()
+            self.logger.info(f"相机 {camera_name} 帧缓冲池 - 缓冲区: {pool_stats['buffers']}, "
+                             f"常驻: {pool_stats['resident_bytes'] / 1024 / 1024:.1f}MB, "
+                             f"累计分配: {pool_stats['allocations']}次")
+        for camera_name, deduplicator in self.frame_deduplicators.items():
+            self.logger.info(f"相机 {camera_name} 重复帧统计 - {deduplicator.format_stats()}")
+        for camera_name, quality_gate in self.quality_gates.items():
+            quality_gate.flush_records()
+            self.logger.info(f"相机 {camera_name} 图像质量统计 - {quality_gate.format_stats()}")
+        if self.freshness_monitor is not None:
+            for camera_name in self.cameras:
+                self.logger.info(f"相机 {camera_name} 新鲜度统计 - {self.freshness_monitor.format_stats(camera_name)}")
+        for camera_name, load_shedder in self.load_shedders.items():
+            self.logger.info(f"相机 {camera_name} 负载降级统计 - {load_shedder.format_stats()}")
+        for trackers in self.displacement_trackers.values():
+            for displacement_tracker in trackers.values():
+                self.logger.info(f"相机 {displacement_tracker.camera_name} 位移统计 - "
+                                 f"{displacement_tracker.format_stats()}")
+        for sink in self.alert_sinks:
+            sink.close()
 
 
 class CameraHandler(FileSystemEventHandler):
     """监听单个相机上传目录并动态切换最新批次。"""
-    def __init__(self, camera_upload_path, camera_processed_path, ex_pixel_coord_obj,wait_time=2,  logger=None):
+    def __init__(self, camera_upload_path, camera_processed_path, ex_pixel_coord_obj,wait_time=2,  logger=None,
+                 frame_deduplicator=None, output_writer=None, load_shedder=None, frame_scheduler=None,
+                 displacement_trackers=None, result_cache=None, result_publisher=None, polling_watcher=None,
+                 quality_gate=None, memory_monitor=None, freshness_monitor=None, extraction_pool=None,
+                 camera_registry=None):
         """
         构建相机级观察者，记录上传/处理路径并保留像素提取对象。
+
+        提供 polling_watcher 时批次目录改由轮询监控，不再创建 watchdog Observer；
+        提供 camera_registry 时 ex_pixel_coord_obj 为 None，每帧处理时从注册表取得跟踪器。
         """
         super().__init__()
         self.camera_upload_path = camera_upload_path
         self.camera_processed_path = camera_processed_path
         self.ex_pixel_coord_obj = ex_pixel_coord_obj
         self.wait_time = wait_time
-        self.logger = logger or logging.getLogger('atli_monitor.camera_handler')
+        self.frame_deduplicator = frame_deduplicator
+        self.quality_gate = quality_gate
+        self.output_writer = output_writer
+        self.load_shedder = load_shedder
+        self.frame_scheduler = frame_scheduler
+        self.displacement_trackers = displacement_trackers
+        self.result_cache = result_cache
+        self.result_publisher = result_publisher
+        self.polling_watcher = polling_watcher
+        self.memory_monitor = memory_monitor
+        self.freshness_monitor = freshness_monitor
+        self.extraction_pool = extraction_pool
+        self.camera_registry = camera_registry
+        camera_name = os.path.basename(camera_upload_path)
+        # 日志记录器名称带相机名（如 atli_monitor.camera1），交错的多相机日志可按相机区分
+        self.logger = (logger or logging.getLogger('atli_monitor.camera_handler')).getChild(camera_name)
         self.current_time_folder = None
+        self.time_folder_handler = None
         self.time_folder_observer = None
 
-        camera_name = os.path.basename(camera_upload_path)
         self.logger.info(f"初始化相机处理器 - {camera_name}")
         self.logger.info(f"监控路径: {camera_upload_path}")
         self.logger.info(f"输出路径: {camera_processed_path}")
 
         # 初始化时找到最新的时间文件夹
-        self.update_current_time_folder()
+        self.update_current_time_folder(initial=True)
 
-    def update_current_time_folder(self):
+    def update_current_time_folder(self, initial=False):
         """
         扫描相机目录下的 TLS_* 子目录，锁定编号最大的时间文件夹并开始监听。
 
         如检测到新文件夹，会切换到新的 Observer，避免老目录阻塞资源。
+        initial 为启动时的首次扫描（轮询模式下不处理目录中已有的图片，与 watchdog 一致）。
         """
         time_folders = [f for f in os.listdir(self.camera_upload_path)
                         if f.startswith('TLS_') and os.path.isdir(os.path.join(self.camera_upload_path, f))]
@@ -177,23 +564,45 @@ class CameraHandler(FileSystemEventHandler):
 
         # 如果时间文件夹发生变化，更新监控
         if new_time_folder != self.current_time_folder:
+            previous_time_folder = self.current_time_folder
             # 停止旧的观察者
             if self.time_folder_observer:
                 self.time_folder_observer.stop()
                 self.time_folder_observer.join()
+            if self.polling_watcher is not None and previous_time_folder:
+                self.polling_watcher.unschedule(previous_time_folder)
 
             self.current_time_folder = new_time_folder
             self.logger.info(f"更新监控文件夹: {latest_folder}")
 
             # 开始监控新的时间文件夹
-            self.time_folder_observer = Observer()
             time_folder_handler = TimeFolderHandler(
                 self.current_time_folder,
                 self.camera_processed_path,
                 self.ex_pixel_coord_obj,
                 wait_time=self.wait_time,
-                logger=self.logger
+                logger=self.logger,
+                frame_deduplicator=self.frame_deduplicator,
+                output_writer=self.output_writer,
+                load_shedder=self.load_shedder,
+                frame_scheduler=self.frame_scheduler,
+                displacement_trackers=self.displacement_trackers,
+                result_cache=self.result_cache,
+                result_publisher=self.result_publisher,
+                quality_gate=self.quality_gate,
+                memory_monitor=self.memory_monitor,
+                freshness_monitor=self.freshness_monitor,
+                extraction_pool=self.extraction_pool,
+                camera_registry=self.camera_registry
             )
+            self.time_folder_handler = time_folder_handler
+            if self.polling_watcher is not None:
+                # 轮询发现新批次目录有延迟，切换时目录中已有的图片一并处理
+                self.polling_watcher.schedule(time_folder_handler, self.current_time_folder,
+                                              emit_existing=not initial)
+                return
+            from watchdog.observers import Observer
+            self.time_folder_observer = Observer()
             self.time_folder_observer.schedule(
                 time_folder_handler,
                 self.current_time_folder,
@@ -222,7 +631,10 @@ class CameraHandler(FileSystemEventHandler):
 
 class TimeFolderHandler(FileSystemEventHandler):
     """针对特定时间批次的图片事件处理器，负责 OCR 与像素提取。"""
-    def __init__(self, time_folder_path, camera_processed_path:str, ex_pixel_coord_obj,  wait_time=2,  logger=None):
+    def __init__(self, time_folder_path, camera_processed_path:str, ex_pixel_coord_obj,  wait_time=2,  logger=None,
+                 frame_deduplicator=None, output_writer=None, load_shedder=None, frame_scheduler=None,
+                 displacement_trackers=None, result_cache=None, result_publisher=None, quality_gate=None,
+                 memory_monitor=None, freshness_monitor=None, extraction_pool=None, camera_registry=None):
         """
         缓存批次目录、目标输出目录及 ExPixelCoord，供后续事件调用。
         """
@@ -235,18 +647,39 @@ class TimeFolderHandler(FileSystemEventHandler):
         self.pixel_dir = None
         self.img_dir = None
         self.draw_img_dir = None
+        self.quality_path = None
         self.wait_time = wait_time
         self.logger = logger or logging.getLogger('atli_monitor.time_folder_handler')
         self.processing_lock = threading.Lock()
+        self.frame_deduplicator = frame_deduplicator
+        self.load_shedder = load_shedder
+        self.frame_scheduler = frame_scheduler
+        # 按需创建模式下位移统计字典在相机创建跟踪器时才填入，需保留同一个对象
+        self.displacement_trackers = displacement_trackers if displacement_trackers is not None else {}
+        self.result_cache = result_cache
+        self.result_publisher = result_publisher
+        self.quality_gate = quality_gate
+        self.memory_monitor = memory_monitor
+        self.freshness_monitor = freshness_monitor
+        self.extraction_pool = extraction_pool
+        self.camera_registry = camera_registry
+        # 未提供共享写入器时同步写出（仍为临时文件 + 原子重命名）
+        self.output_writer = output_writer or OutputWriter(async_write=False, durability='file', logger=self.logger)
 
         # 提取文件夹名前8个字符作为目标文件夹名
         folder_name = os.path.basename(time_folder_path)
         self.target_folder_name = folder_name[:8] if len(folder_name) >= 8 else folder_name
 
         # 创建目标目录结构
+        self.camera_name = os.path.basename(os.path.dirname(time_folder_path))
         self.create_target_directories()
-        camera_name = os.path.basename(os.path.dirname(time_folder_path))
-        self.logger.info(f"初始化时间文件夹处理器 - {camera_name}/{folder_name}")
+        # 处理器创建前已在目录中的图片（重启前遗留、提取失败保留的帧）收不到创建事件，不计入积压，也不算漏事件
+        self.preexisting_files = set()
+        if self.freshness_monitor is not None or (self.load_shedder is not None and self.frame_scheduler is None):
+            self.preexisting_files = self.list_images()
+        if self.freshness_monitor is not None:
+            self.freshness_monitor.seed_folder(self.camera_name, self.preexisting_files)
+        self.logger.info(f"初始化时间文件夹处理器 - {self.camera_name}/{folder_name}")
         self.logger.info(f"监控路径: {time_folder_path}")
         self.logger.info(f"等待时间: {wait_time}秒")
 
@@ -256,17 +689,27 @@ class TimeFolderHandler(FileSystemEventHandler):
         self.pixel_dir = os.path.join(target_dir, 'pixel')
         self.img_dir = os.path.join(target_dir, 'img')
         self.draw_img_dir=os.path.join(target_dir, 'draw_img')
+        # 图像质量评分逐帧追加到批次目录的 quality.csv
+        self.quality_path = os.path.join(target_dir, 'quality.csv')
 
         os.makedirs(self.pixel_dir, exist_ok=True)
         os.makedirs(self.img_dir, exist_ok=True)
         os.makedirs(self.draw_img_dir, exist_ok=True)
+        # 多 ROI 相机的坐标文件按 ROI 分目录: pixel/<ROI 名称>/
+        if self.camera_registry is not None:
+            names = self.camera_registry.roi_names(self.camera_name)
+        else:
+            names = roi_names(self.ex_pixel_coord_obj)
+        for roi_name in names:
+            if roi_name is not None:
+                os.makedirs(os.path.join(self.pixel_dir, roi_name), exist_ok=True)
         print(f"已创建目标目录: {target_dir}")
 
-    def get_image_timestamp(self, image_path):
-        """从图片EXIF数据中获取拍摄时间戳"""
+    def get_image_timestamp(self, image_path, image_data=None):
+        """从图片EXIF数据中获取拍摄时间戳，提供 image_data 时直接解析内存中的字节"""
         try:
             # 打开图片并获取EXIF数据
-            image = Image.open(image_path)
+            image = Image.open(io.BytesIO(image_data) if image_data is not None else image_path)
             exifdata = image.getexif()
 
             # 获取拍摄时间（标签306对应DateTime）
@@ -289,91 +732,305 @@ class TimeFolderHandler(FileSystemEventHandler):
             return None
 
     def on_created(self, event):
-        if not event.is_directory and event.src_path.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+        if not event.is_directory and event.src_path.lower().endswith(IMAGE_EXTENSIONS):
             filename = os.path.basename(event.src_path)
+            if self.freshness_monitor is not None:
+                self.freshness_monitor.record_upload(self.camera_name, event.src_path)
+
+            # 最新帧优先模式：登记到相机调度器后立即返回，由调度线程按优先级处理
+            if self.frame_scheduler is not None:
+                with self.processing_lock:
+                    if filename in self.processed_files:
+                        return
+                    self.processed_files.add(filename)
+                self.frame_scheduler.submit(self, event.src_path, filename)
+                return
 
             # 使用线程锁确保每个文件的处理是串行的
             with self.processing_lock:
                 # 处理所有图片文件
                 if filename not in self.processed_files:
-                    time.sleep(self.wait_time)  # 等待文件完全写入
+                    # 等待文件完全写入（仅最新帧模式下被跳过的帧也要移动原图，同样需要等待）
+                    time.sleep(self.wait_time)
                     self.processed_files.add(filename)
                     self.process_image(event.src_path, filename)
 
-    def process_image(self, src_path, filename):
+    def list_images(self):
+        """批次目录中当前的图片文件名集合"""
+        try:
+            with os.scandir(self.time_folder_path) as entries:
+                return {entry.name for entry in entries if entry.name.lower().endswith(IMAGE_EXTENSIONS)}
+        except OSError:
+            return set()
+
+    def count_pending_images(self, current_filename):
+        """
+        统计批次目录中尚未处理的图片数。
+
+        不含当前帧、已处理（含提取失败保留在目录中、等待备份提交后删除）的图片，
+        也不含处理器创建前已在目录中的图片（收不到创建事件，永远不会被处理）。
+        """
+        count = 0
+        for name in self.list_images():
+            if (name != current_filename and name not in self.processed_files
+                    and name not in self.preexisting_files):
+                count += 1
+        return count
+
+    def backup_path(self, timestamp, filename):
+        """备份图片路径 img/<时间戳><扩展名>，与正常处理的备份命名一致"""
+        return os.path.join(self.img_dir, f"{timestamp}{os.path.splitext(filename)[1]}")
+
+    def skip_frame(self, src_path, filename):
+        """仅最新帧模式下跳过积压帧：不提取坐标，原始图片按正常备份的命名移入备份目录保留"""
+        try:
+            shutil.move(src_path, self.backup_path(self.get_image_timestamp(src_path), filename))
+            self.load_shedder.count('skipped_frames')
+            self.logger.info(f"处理积压，跳过帧并保留原图: {filename}")
+        except Exception as e:
+            self.logger.error(f"跳过帧时移动原图失败: {filename} - 错误: {e}")
+
+    def process_image(self, src_path, filename, ex_pixel_coord_obj=None, history=False):
         """
         对新图片执行业务流程：提取像素->落盘->备份绘制->删除源文件。
+
+        配置了负载降级时，按积压情况跳过标注、备份、过程日志或非最新帧；
+        配置了图像质量门限时，提取前评分，低质量帧按配置跳过提取（原图保留到备份目录）或仅标记。
+
+        Args:
+            ex_pixel_coord_obj: 使用的跟踪器，默认为相机的 ExPixelCoord（最新帧优先模式下历史帧使用独立跟踪器）
+            history: 是否为历史补处理帧；历史帧不参与降级判定，也不复用/登记近似帧坐标
+
+        Returns:
+            list: 本帧像素坐标（多 ROI 相机为 {ROI 名称: 坐标}），未完成处理时返回 None
         """
+        if ex_pixel_coord_obj is None and self.camera_registry is not None:
+            # 按需创建的相机：处理期间持有跟踪器，处理完成后才可能被回收
+            try:
+                tracker = self.camera_registry.checkout(self.camera_name)
+            except (OSError, KeyError, ValueError) as e:
+                self.logger.error(f"相机 {self.camera_name} 像素提取器创建失败，跳过处理: {filename} - 错误: {e}")
+                return None
+            try:
+                return self.process_image(src_path, filename, tracker, history)
+            finally:
+                self.camera_registry.release(self.camera_name)
+        if self.memory_monitor is None:
+            return self._process_image(src_path, filename, ex_pixel_coord_obj, history)
+        with self.memory_monitor.track_frame(filename):
+            return self._process_image(src_path, filename, ex_pixel_coord_obj, history)
+
+    def _process_image(self, src_path, filename, ex_pixel_coord_obj, history):
+        """process_image 的处理流程"""
+        tracker = ex_pixel_coord_obj or self.ex_pixel_coord_obj
+        shedder = self.load_shedder
+        # 帧排队时间：文件写完（修改时间）到开始处理
+        frame_age = None
+        if (shedder is not None and not history) or self.freshness_monitor is not None:
+            try:
+                frame_age = time.time() - os.path.getmtime(src_path)
+            except OSError:
+                frame_age = 0.0
+        if shedder is not None and not history:
+            if self.frame_scheduler is not None:
+                queue_depth = self.frame_scheduler.backlog()
+            else:
+                queue_depth = self.count_pending_images(filename)
+            shedder.observe(queue_depth, frame_age)
+            # 最新帧优先模式下实时路径本就只取最新帧，积压帧由调度器转入历史路径
+            if shedder.latest_only and queue_depth > 0 and self.frame_scheduler is None:
+                self.skip_frame(src_path, filename)
+                return
+            if not shedder.verbose:
+                shedder.count('quiet_frames')
+
+        # 过程日志在降级时改为 DEBUG，耗时与结果日志保持 INFO（供 log_report.py 统计）
+        verbose = shedder is None or shedder.verbose
+        detail = self.logger.info if verbose else self.logger.debug
+
         self.logger.info(f"开始处理图片: {filename}")
-        print(f"处理图片: {src_path}")
+        if verbose:
+            print(f"处理图片: {src_path}")
 
-        # 记录文件信息
+        # 一次性读入原始字节，EXIF、指纹、解码和备份共用，避免重复读取上传卷
         try:
-            file_size = os.path.getsize(src_path)
-            self.logger.info(f"图片文件信息 - 大小: {file_size} bytes")
+            with open(src_path, 'rb') as f:
+                image_data = f.read()
+            file_size = len(image_data)
+            detail(f"图片文件信息 - 大小: {file_size} bytes")
         except Exception as e:
-            self.logger.warning(f"无法获取文件信息: {e}")
+            self.logger.error(f"图片读取失败: {filename} - 错误: {e}")
+            return
 
-        timestamp = self.get_image_timestamp(src_path)
+        timestamp = self.get_image_timestamp(src_path, image_data)
 
         try:
-            # 开始像素坐标提取
-            self.logger.info(f"开始提取像素坐标: {filename}")
-            start_time = time.time()
-            pixelpoints = self.ex_pixel_coord_obj.mark_pixel_coords_ex(src_path)
-            extract_time = time.time() - start_time
-
-            if pixelpoints is None:
-                self.logger.warning(f"像素坐标提取失败: {filename}")
-                print(f"警告: 无法提取像素坐标，跳过处理 {filename}")
+            # 计算帧指纹，字节完全相同的重复上传直接跳过
+            fingerprint = None
+            pixelpoints = None
+            if self.frame_deduplicator is not None:
+                fingerprint = self.frame_deduplicator.fingerprint(image_data, tracker.polygon_pts)
+                if self.frame_deduplicator.is_exact_duplicate(fingerprint):
+                    os.remove(src_path)
+                    self.logger.info(f"重复上传，跳过处理并删除: {filename} - "
+                                     f"{self.frame_deduplicator.format_stats()}")
+                    return
+                # 历史帧与上一帧不相邻，不复用其坐标
+                if not history:
+                    pixelpoints = self.frame_deduplicator.reusable_points(fingerprint)
+                if pixelpoints is not None:
+                    self.logger.info(f"与上一帧近似，复用像素坐标: {filename} - "
+                                     f"{self.frame_deduplicator.format_stats()}")
+
+            # 只解码一次，提取与标注共用同一帧
+            img = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                self.logger.warning(f"图片读取失败: {filename}")
                 return
 
-            self.logger.info(f"像素坐标提取成功 - 点数: {len(pixelpoints)}, 耗时: {extract_time:.3f}秒")
+            if pixelpoints is None and self.quality_gate is not None:
+                # 在缩小的 ROI 上快速评估质量，雾、模糊、过暗等帧不必跑完整提取
+                scores = self.quality_gate.assess(img, tracker)
+                self.quality_gate.append_record(self.quality_path, timestamp, filename, scores)
+                if scores['passed']:
+                    detail(f"图像质量评分: {filename} - {self.quality_gate.format_scores(scores)}")
+                elif self.quality_gate.skip:
+                    shutil.move(src_path, self.backup_path(timestamp, filename))
+                    self.quality_gate.count_skipped()
+                    self.logger.warning(f"图像质量过低，跳过提取并保留原图: {filename} - "
+                                        f"{self.quality_gate.format_scores(scores)}")
+                    return
+                else:
+                    self.logger.warning(f"图像质量过低: {filename} - {self.quality_gate.format_scores(scores)}")
 
-            # 将pixelpoints转换为排序后的列表
-            sorted_points = pixelpoints.tolist() if hasattr(pixelpoints, 'tolist') else list(pixelpoints)
+            if pixelpoints is None:
+                # 开始像素坐标提取
+                detail(f"开始提取像素坐标: {filename}")
+                start_time = time.time()
+                if self.extraction_pool is not None:
+                    pixelpoints = self.extraction_pool.extract(self.camera_name, tracker, img)
+                else:
+                    pixelpoints = tracker.mark_pixel_coords_ex(img)
+                extract_time = time.time() - start_time
+
+                if pixelpoints is None:
+                    self.logger.warning(f"像素坐标提取失败: {filename}")
+                    print(f"警告: 无法提取像素坐标，跳过处理 {filename}")
+                    return
+
+                if isinstance(pixelpoints, dict):
+                    point_count = sum(len(points) for points in pixelpoints.values() if points is not None)
+                else:
+                    point_count = len(pixelpoints)
+                self.logger.info(f"像素坐标提取成功 - 点数: {point_count}, 耗时: {extract_time:.3f}秒")
+                if fingerprint is not None and not history:
+                    self.frame_deduplicator.record(fingerprint, pixelpoints, extract_time)
+
+            # 将pixelpoints转换为排序后的列表；多 ROI 相机为 {ROI 名称: 坐标}，单 ROI 记为 {None: 坐标}
+            roi_points = pixelpoints if isinstance(pixelpoints, dict) else {None: pixelpoints}
+            roi_results = {}
+            for roi_name, points in roi_points.items():
+                if points is None:
+                    self.logger.warning(f"像素坐标提取失败: {filename} - ROI: {roi_name}")
+                    continue
+                roi_results[roi_name] = points.tolist() if hasattr(points, 'tolist') else list(points)
+
+            # 位移统计与阈值告警在写出结果之前完成，告警不等待文件落盘
+            for roi_name, sorted_points in roi_results.items():
+                stream_name = result_stream_name(self.camera_name, roi_name)
+                displacement_tracker = self.displacement_trackers.get(roi_name)
+                if displacement_tracker is not None and not history:
+                    displacement_tracker.update(timestamp, sorted_points)
+                if self.result_cache is not None:
+                    self.result_cache.add(stream_name, timestamp, sorted_points,
+                                          batch=self.target_folder_name, filename=filename)
+                if self.result_publisher is not None:
+                    self.result_publisher.publish(stream_name, timestamp, sorted_points,
+                                                  batch=self.target_folder_name, filename=filename, history=history)
+            if self.freshness_monitor is not None and roi_results:
+                self.freshness_monitor.record_result(self.camera_name, timestamp, queue_age=frame_age, history=history)
 
             # 使用时间戳作为文件名前缀
             timestamp_filename = timestamp
-            pixel_result_path = os.path.join(self.pixel_dir, f"{timestamp_filename}.txt")
-            self.logger.info(f"保存像素坐标文件: {pixel_result_path} - {len(sorted_points)}个点")
-            start_time = time.time()
-            with open(pixel_result_path, 'w') as f:
-                for idx, (x, y) in enumerate(sorted_points, 1):
-                    f.write(f"{idx} {x} {y}\n")
-            save_time = time.time() - start_time
-            self.logger.info(f"像素坐标文件保存完成，耗时: {save_time:.3f}秒")
-
-            # 备份图片
             file_extension = os.path.splitext(filename)[1]
+
+            # 像素坐标、备份、标注均提交给输出写入器，后台原子写出，不阻塞下一帧提取
+            # 多 ROI 的坐标文件全部提交完成后记录一条保存日志（耗时取最慢的一个）
+            pending_saves = [len(roi_results), 0.0]
+            save_lock = threading.Lock()
+
+            def on_pixel_saved(path, save_time):
+                with save_lock:
+                    pending_saves[0] -= 1
+                    pending_saves[1] = max(pending_saves[1], save_time)
+                    if pending_saves[0]:
+                        return
+                self.logger.info(f"像素坐标文件保存完成: {filename}，耗时: {pending_saves[1]:.3f}秒")
+
+            for roi_name, sorted_points in roi_results.items():
+                roi_pixel_dir = self.pixel_dir if roi_name is None else os.path.join(self.pixel_dir, roi_name)
+                pixel_result_path = os.path.join(roi_pixel_dir, f"{timestamp_filename}.txt")
+                detail(f"保存像素坐标文件: {pixel_result_path} - {len(sorted_points)}个点")
+                pixel_text = ''.join(f"{idx} {x} {y}\n" for idx, (x, y) in enumerate(sorted_points, 1))
+                self.output_writer.submit_text(pixel_result_path, pixel_text, on_commit=on_pixel_saved)
+
+            # 备份图片（直接写出已读入的原始字节），备份提交后才删除原始图片
             img_backup_path = os.path.join(self.img_dir, f"{timestamp_filename}{file_extension}")
-            self.logger.info(f"开始备份图片: {img_backup_path}")
-            start_time = time.time()
-            shutil.copy2(src_path, img_backup_path)
-            backup_time=time.time()-start_time
-            self.logger.info(f"备份图片生成完成，耗时: {backup_time:.3f}秒")
+            backup_moved = False
+            if shedder is not None and not shedder.backup:
+                # 降级时不复制备份，原始图片直接重命名进备份目录（跨文件系统失败时仍按原方式复制）
+                try:
+                    os.replace(src_path, img_backup_path)
+                    backup_moved = True
+                    shedder.count('skipped_backups')
+                    detail(f"原始图片已移入备份目录: {img_backup_path}")
+                except OSError:
+                    pass
+
+            if not backup_moved:
+                detail(f"开始备份图片: {img_backup_path}")
+
+                def on_backup_saved(path, backup_time):
+                    self.logger.info(f"备份图片生成完成: {filename}，耗时: {backup_time:.3f}秒")
+                    # 删除原始图片
+                    os.remove(src_path)
+                    detail(f"原始图片已删除: {src_path} ({file_size} bytes)")
+                    # TODO: 为 os.remove 增加异常回退，比如移动到 quarantine 目录。
+                self.output_writer.submit_bytes(img_backup_path, image_data, copystat_src=src_path,
+                                                on_commit=on_backup_saved)
 
             # 标注图片
-            file_extension = os.path.splitext(filename)[1]
-            img_draw_path = os.path.join(self.draw_img_dir, f"{timestamp_filename}{file_extension}")
-            self.logger.info(f"开始生成标注图片: {img_draw_path}")
-            start_time = time.time()
-            img = cv2.imread(src_path)
-            img_draw = img.copy()
-            for idx, (x, y) in enumerate(sorted_points, 1):
-                cv2.circle(img_draw, (int(x), int(y)), 2, (255, 0, 0), -1)
-                cv2.putText(img_draw, str(idx), (int(x + 10), int(y - 10)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 0, 0), 2)
-            cv2.imwrite(img_draw_path, img_draw, [cv2.IMWRITE_JPEG_QUALITY, 25])
-            draw_time = time.time() - start_time
-            self.logger.info(f"标注图片生成完成，耗时: {draw_time:.3f}秒")
-
-            # 删除原始图片
-            original_size = os.path.getsize(src_path)
-            os.remove(src_path)
-            self.logger.info(f"原始图片已删除: {src_path} ({original_size} bytes)")
+            if shedder is not None and not shedder.annotate:
+                shedder.count('skipped_annotations')
+            else:
+                img_draw_path = os.path.join(self.draw_img_dir, f"{timestamp_filename}{file_extension}")
+                detail(f"开始生成标注图片: {img_draw_path}")
+                start_time = time.time()
+                # 提取已完成，解码帧不再使用，直接在原图上绘制，省去整帧拷贝；多 ROI 绘制在同一张标注图上
+                img_draw = img
+                for roi_name, sorted_points in roi_results.items():
+                    if roi_name is not None:
+                        polygon_pts = np.asarray(tracker.trackers[roi_name].polygon_pts, dtype=np.int32)
+                        cv2.polylines(img_draw, [polygon_pts], True, (0, 255, 255), 2)
+                        cv2.putText(img_draw, roi_name, (int(polygon_pts[0][0]), int(polygon_pts[0][1]) - 10),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 255), 2)
+                    for idx, (x, y) in enumerate(sorted_points, 1):
+                        cv2.circle(img_draw, (int(x), int(y)), 2, (255, 0, 0), -1)
+                        cv2.putText(img_draw, str(idx), (int(x + 10), int(y - 10)),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 0, 0), 2)
+                draw_time = time.time() - start_time
+
+                def on_draw_saved(path, encode_time):
+                    self.logger.info(f"标注图片生成完成: {filename}，耗时: {draw_time + encode_time:.3f}秒")
+                self.output_writer.submit_image(img_draw_path, img_draw, [cv2.IMWRITE_JPEG_QUALITY, 25],
+                                                on_commit=on_draw_saved)
+                del img_draw
+            del img
+
             self.logger.info(f"图片处理完成: {filename} -> 坐标文件: {timestamp_filename}.txt, 备份图片: {filename}")
-            # TODO: 为 os.remove 增加异常回退，比如移动到 quarantine 目录。
+            if isinstance(pixelpoints, dict):
+                return roi_results
+            return roi_results[None]
 
         except Exception as e:
             self.logger.error(f"处理图片异常: {filename} - 错误: {str(e)}")
@@ -388,6 +1045,9 @@ class TimeFolderHandler(FileSystemEventHandler):
 if __name__ == "__main__":
     # 从配置文件加载配置
     try:
+        startup_timer = StartupTimer()
+        startup_timer.mark("导入模块")
+
         # 初始化日志系统
         logger = setup_logging()
         logger.info("=== ATLI 相机监控系统启动 ===")
@@ -400,14 +1060,31 @@ if __name__ == "__main__":
         base_upload_path = config.get_base_upload_path()
         base_processed_path = config.get_base_processed_path()
 
-        # 从配置获取相机配置
-        camera_configs = config.get_camera_configs()
+        # 从配置获取相机配置（按需创建时只列出相机，初始坐标在第一次上传时读取）
+        camera_cache_config = config.get_camera_cache_config()
+        camera_configs = config.get_camera_configs(lazy=camera_cache_config.get('lazy', False))
 
         # 从配置获取处理参数
         wait_time = config.get_file_wait_time()
+        dedup_config = config.get_dedup_config()
+        load_shedding_config = config.get_load_shedding_config()
+        scheduling_config = config.get_scheduling_config()
+        displacement_config = config.get_displacement_config()
+        query_api_config = config.get_query_api_config()
+        publisher_config = config.get_publisher_config()
+        ingest_config = config.get_ingest_config()
+        quality_gate_config = config.get_quality_gate_config()
+        memory_config = config.get_memory_config()
+        freshness_config = config.get_freshness_config()
+        extraction_config = config.get_extraction_config()
+        profiler_config = config.get_profiler_config()
+        output_config = config.get_output_config()
+        retention_config = config.get_retention_config()
+        startup_config = config.get_startup_config()
 
         # 确保必要的目录存在
         config.ensure_directories()
+        startup_timer.mark("加载配置")
 
         # 控制台显示关键信息
         print(f"运行环境: {config.env}")
@@ -427,17 +1104,139 @@ if __name__ == "__main__":
             logger.info(f"  - {camera_name}")
         logger.info("=" * 40)
 
+        output_writer = OutputWriter(logger=logger, **output_config)
+
+        # 数据新鲜度：按相机跟踪上传、提取与延迟，相机超过预期间隔或批次目录监控失效时告警
+        freshness_monitor = None
+        if freshness_config.get('enabled', False):
+            from freshness import FreshnessMonitor
+            freshness_monitor = FreshnessMonitor(
+                list(camera_configs.keys()),
+                expected_interval=freshness_config.get('expected_interval', 600),
+                camera_intervals={camera_name: camera_config['expected_interval']
+                                  for camera_name, camera_config in freshness_config.get('cameras', {}).items()
+                                  if camera_config and 'expected_interval' in camera_config},
+                max_lag=freshness_config.get('max_lag', 0),
+                missed_grace=freshness_config.get('missed_grace', 60),
+                check_interval=freshness_config.get('check_interval', 30),
+                logger=logger
+            )
+
+        # 本地查询接口：内存缓存最近结果，供看板查询最新坐标
+        result_cache = None
+        if query_api_config.get('enabled', False):
+            from query_api import QueryServer, ResultCache
+            result_cache = ResultCache(cache_size=query_api_config.get('cache_size', 1000))
+            query_server = QueryServer(
+                result_cache,
+                host=query_api_config.get('host', '127.0.0.1'),
+                port=query_api_config.get('port', 8765),
+                freshness_monitor=freshness_monitor,
+                logger=logger
+            )
+            try:
+                query_server.start()
+            except OSError as e:
+                # 查询接口是可选功能，端口被占用等情况不影响监控运行
+                logger.error(f"查询接口启动失败，不提供查询接口继续运行: {e}")
+                result_cache = None
+                query_server = None
+
+        # 结果推送：每帧结果计算完成即推送给本地套接字订阅者
+        result_publisher = None
+        if publisher_config.get('enabled', False):
+            from result_publisher import ResultPublisher
+            result_publisher = ResultPublisher(
+                address=publisher_config.get('address', '127.0.0.1:8766'),
+                buffer_size=publisher_config.get('buffer_size', 1000),
+                logger=logger
+            )
+            try:
+                result_publisher.start()
+            except OSError as e:
+                # 结果推送是可选功能，地址被占用等情况不影响监控运行
+                logger.error(f"结果推送启动失败，不推送结果继续运行: {e}")
+                result_publisher = None
+
+        # 内存监控：定期报告 RSS、线程与各组件规模，可选 tracemalloc 分配增长排行
+        memory_monitor = None
+        if memory_config.get('enabled', False):
+            from memory_monitor import MemoryMonitor
+            memory_monitor = MemoryMonitor(
+                interval=memory_config.get('interval', 600),
+                tracemalloc_frames=memory_config.get('tracemalloc_frames', 0),
+                top_n=memory_config.get('top_n', 10),
+                rss_warning_mb=memory_config.get('rss_warning_mb', 0),
+                thread_warning=memory_config.get('thread_warning', 0),
+                logger=logger
+            )
+
         monitor = CameraMonitor(
             base_upload_path,
             base_processed_path,
             camera_configs=camera_configs,
             wait_time=wait_time,
-            logger=logger
+            logger=logger,
+            dedup_config=dedup_config,
+            output_writer=output_writer,
+            load_shedding_config=load_shedding_config,
+            scheduling_config=scheduling_config,
+            displacement_config=displacement_config,
+            result_cache=result_cache,
+            result_publisher=result_publisher,
+            ingest_config=ingest_config,
+            quality_gate_config=quality_gate_config,
+            memory_monitor=memory_monitor,
+            freshness_monitor=freshness_monitor,
+            extraction_config=extraction_config,
+            camera_cache_config=camera_cache_config
         )
+        startup_timer.mark("初始化")
+
+        # 预热查找表、编解码器与帧缓冲区，第一帧不再承担这些开销
+        if startup_config.get('warm_up', True):
+            monitor.warm_up()
+            startup_timer.mark("预热")
 
         logger.info("开始启动监控服务...")
         monitor.start_monitoring()
         logger.info("所有相机监控已启动成功")
+        if memory_monitor is not None:
+            memory_monitor.start()
+        if freshness_monitor is not None:
+            freshness_monitor.start()
+
+        # 按需性能采样：收到 SIGUSR1 时对全部线程采样，结果写到日志文件所在目录；未触发时没有额外开销
+        if profiler_config.get('enabled', False):
+            import signal
+            if hasattr(signal, 'SIGUSR1'):
+                from sampling_profiler import SamplingProfiler
+                log_file = next((handler.baseFilename for handler in logging.getLogger().handlers
+                                 if isinstance(handler, logging.FileHandler)), None)
+                profiler = SamplingProfiler(
+                    profiler_config.get('output_dir') or (os.path.dirname(log_file) if log_file else 'logs'),
+                    duration=profiler_config.get('duration', 30),
+                    interval=profiler_config.get('interval', 0.005),
+                    top_n=profiler_config.get('top_n', 30),
+                    logger=logger
+                )
+                signal.signal(signal.SIGUSR1, profiler.handle_signal)
+                logger.info(f"性能采样已就绪: kill -USR1 {os.getpid()}，结果目录: {profiler.output_dir}")
+            else:
+                logger.warning("当前平台不支持 SIGUSR1，性能采样未启用")
+
+        # 归档与保留策略在后台低速运行，输出写入队列非空时让路
+        if retention_config.get('enabled', False):
+            from retention import RetentionService
+            retention_service = RetentionService(
+                base_processed_path,
+                retention_config,
+                busy_check=lambda: output_writer.stats()['queued'] > 0,
+                logger=logger
+            )
+            retention_service.start()
+        startup_timer.mark("启动监控")
+        startup_timer.report(logger, budget=startup_config.get('budget_seconds', 0))
         print("✅ 监控系统已启动，按 Ctrl+C 停止...")
 
         # 主循环
@@ -459,9 +1258,19 @@ if __name__ == "__main__":
         print("\n停止监控...")
         if 'logger' in locals():
             logger.info("用户手动停止监控")
+        if 'retention_service' in locals():
+            retention_service.stop()
+        if locals().get('query_server') is not None:
+            query_server.stop()
         if 'monitor' in locals():
             monitor.stop_monitoring()
             logger.info("监控服务已停止")
+        if locals().get('result_publisher') is not None:
+            result_publisher.stop()
+        if locals().get('memory_monitor') is not None:
+            memory_monitor.stop()
+        if locals().get('freshness_monitor') is not None:
+            freshness_monitor.stop()
         print("监控已停止")
     except Exception as e:
         error_msg = f"系统运行异常: {str(e)}"
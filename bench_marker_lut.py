@@ -0,0 +1,123 @@
+"""
+标志物掩膜查找表基准测试
+对比原 HSV 流程（整图 cvtColor + 双 inRange + bitwise_or）与 ROI 位查找表流程：
+逐像素校验两套阈值下的掩膜完全一致，并输出单帧耗时。
+
+用法:
+    python bench_marker_lut.py [图片路径 ...] [--repeat 20] [--polygon x1,y1,x2,y2,...]
+"""
+
+import argparse
+import glob
+import time
+
+import cv2
+import numpy as np
+
+from Ex_Pixel import ExPixelCoord
+from marker_lut import DARK_RED_RANGES, NORMAL_RED_RANGES, get_marker_lut, apply_marker_lut
+
+DEFAULT_IMAGES = 'RT_text/atli_processed/*/TLS_*/draw_img/*.jpg'
+DEFAULT_POLYGON = [(1190, 550), (2450, 550), (2450, 2030), (1190, 2030)]
+
+
+def legacy_mask(img, polygon_pts, hsv_ranges):
+    """原始实现：整图 HSV 转换 + 双区间 inRange + 多边形掩膜 + 闭运算"""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    (lower1, upper1), (lower2, upper2) = hsv_ranges
+    mask_red1 = cv2.inRange(hsv, np.array(lower1), np.array(upper1))
+    mask_red2 = cv2.inRange(hsv, np.array(lower2), np.array(upper2))
+    mask_red = cv2.bitwise_or(mask_red1, mask_red2)
+
+    mask_poly = np.zeros_like(mask_red)
+    cv2.fillPoly(mask_poly, [polygon_pts], 255)
+    mask_combined = cv2.bitwise_and(mask_red, mask_poly)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    return cv2.morphologyEx(mask_combined, cv2.MORPH_CLOSE, kernel)
+
+
+def lut_mask(img, extractor, hsv_ranges):
+    """查找表实现：与 ExPixelCoord.mark_pixel_coords_ex 相同的 ROI 查表流程，结果还原到整图尺寸"""
+    x0, y0, x1, y1 = extractor.roi_bounds(img.shape)
+    roi = img[y0:y1, x0:x1]
+    mask_red = apply_marker_lut(roi, get_marker_lut(hsv_ranges))
+
+    mask_poly = np.zeros_like(mask_red)
+    cv2.fillPoly(mask_poly, [extractor.polygon_pts - np.array([x0, y0], dtype=np.int32)], 255)
+    mask_combined = cv2.bitwise_and(mask_red, mask_poly)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    mask_closed = cv2.morphologyEx(mask_combined, cv2.MORPH_CLOSE, kernel)
+
+    full = np.zeros(img.shape[:2], dtype=np.uint8)
+    full[y0:y1, x0:x1] = mask_closed
+    return full
+
+
+def time_call(func, repeat):
+    """返回多次调用的平均耗时（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='标志物掩膜查找表基准测试')
+    parser.add_argument('images', nargs='*', help='测试图片路径，默认使用 RT_text 下的样例图片')
+    parser.add_argument('--repeat', type=int, default=20, help='每张图片重复次数')
+    parser.add_argument('--polygon', help='ROI 多边形，格式 x1,y1,x2,y2,...')
+    args = parser.parse_args()
+
+    image_paths = args.images or sorted(glob.glob(DEFAULT_IMAGES))
+    if not image_paths:
+        print("未找到测试图片")
+        return 1
+
+    if args.polygon:
+        values = [int(v) for v in args.polygon.split(',')]
+        polygon = list(zip(values[0::2], values[1::2]))
+    else:
+        polygon = DEFAULT_POLYGON
+    polygon_pts = np.array(polygon, dtype=np.int32)
+    extractor = ExPixelCoord(polygon_pts)
+
+    start = time.perf_counter()
+    get_marker_lut(DARK_RED_RANGES)
+    get_marker_lut(NORMAL_RED_RANGES)
+    print(f"查找表编译耗时（两套阈值）: {time.perf_counter() - start:.3f}秒")
+
+    all_equal = True
+    legacy_total = 0.0
+    lut_total = 0.0
+    for path in image_paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"无法读取图片: {path}")
+            continue
+
+        for name, hsv_ranges in (('dark', DARK_RED_RANGES), ('normal', NORMAL_RED_RANGES)):
+            expected = legacy_mask(img, polygon_pts, hsv_ranges)
+            actual = lut_mask(img, extractor, hsv_ranges)
+            equal = np.array_equal(expected, actual)
+            all_equal = all_equal and equal
+
+            legacy_time = time_call(lambda: legacy_mask(img, polygon_pts, hsv_ranges), args.repeat)
+            lut_time = time_call(lambda: lut_mask(img, extractor, hsv_ranges), args.repeat)
+            legacy_total += legacy_time
+            lut_total += lut_time
+
+            print(f"{path} [{name}] 掩膜一致: {equal}, 前景像素: {int(np.count_nonzero(expected))}, "
+                  f"原流程: {legacy_time * 1000:.2f}ms, 查找表: {lut_time * 1000:.2f}ms, "
+                  f"加速比: {legacy_time / lut_time:.2f}x")
+
+    print("=" * 60)
+    print(f"掩膜全部一致: {all_equal}")
+    if lut_total > 0:
+        print(f"总体加速比: {legacy_total / lut_total:.2f}x")
+    return 0 if all_equal else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""
+分块分割一致性基准测试
+随机生成含实心标志物、圆环（内含小标志物）和跨越块边界的横条/斜条的帧，
+对比 tiles=0（整块）与 tiles=N（按行分块并行后合并跨块轮廓）两条路径：
+逐个校验轮廓完全一致、最终坐标（含顺序）完全一致，并输出单帧耗时。
+
+用法:
+    python bench_tiles.py [--frames 300] [--tiles 2 3 4 8] [--size 1600x1200] [--seed 0]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import cv2
+import numpy as np
+
+from Ex_Pixel import ExPixelCoord
+from marker_lut import NORMAL_RED_RANGES, apply_marker_lut, get_marker_lut
+
+RED = (0, 0, 255)
+
+
+def random_frame(rng, width, height, tiles):
+    """随机帧与 ROI 多边形；部分横条/斜条刻意跨越各分块数下的块边界"""
+    img = rng.integers(0, 120, size=(height, width, 3), dtype=np.uint8)
+    margin = 20
+    x0, y0 = (int(v) for v in rng.integers(0, margin * 4, size=2))
+    x1, y1 = width - int(rng.integers(0, margin * 4)), height - int(rng.integers(0, margin * 4))
+    jitter = rng.integers(-margin, margin + 1, size=(4, 2))
+    polygon = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]) + jitter
+    polygon = np.clip(polygon, 0, [width - 1, height - 1]).astype(np.int32)
+
+    for _ in range(int(rng.integers(10, 40))):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(img, center, int(rng.integers(3, 25)), RED, -1)
+    for _ in range(int(rng.integers(2, 8))):
+        # 圆环内的小标志物在整块处理时属于内层轮廓，不应出现在结果中
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(30, 90))
+        cv2.circle(img, center, radius, RED, int(rng.integers(2, 6)))
+        cv2.circle(img, center, int(rng.integers(3, radius // 3)), RED, -1)
+
+    roi_height = int(polygon[:, 1].max()) + 1 - int(polygon[:, 1].min())
+    roi_top = int(polygon[:, 1].min())
+    for count in tiles:
+        for seam in np.linspace(0, roi_height, count + 1).astype(int)[1:-1]:
+            y = roi_top + int(seam) + int(rng.integers(-3, 4))
+            x = int(rng.integers(0, width - 100))
+            if rng.random() < 0.5:
+                cv2.rectangle(img, (x, y - int(rng.integers(1, 12))), (x + int(rng.integers(20, 300)),
+                              y + int(rng.integers(1, 12))), RED, -1)
+            else:
+                cv2.line(img, (x, y - 40), (x + int(rng.integers(-60, 60)) + 60, y + 40), RED,
+                         int(rng.integers(1, 6)))
+    return img, polygon
+
+
+def untiled_contours(extractor, img, lut):
+    """整块路径的轮廓：与 ExPixelCoord.mark_pixel_coords_ex 在 tiles=0 时的查表、掩膜、闭运算与轮廓查找相同"""
+    x0, y0, x1, y1 = extractor.roi_bounds(img.shape)
+    roi = img[y0:y1, x0:x1]
+    mask_poly = np.zeros(roi.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(mask_poly, [extractor.polygon_pts - np.array([x0, y0], dtype=np.int32)], 255)
+    mask_red = apply_marker_lut(roi, lut)
+    cv2.bitwise_and(mask_red, mask_poly, dst=mask_red)
+    mask_closed = cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, ExPixelCoord.CLOSE_KERNEL)
+    contours, _ = cv2.findContours(mask_closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE, offset=(x0, y0))
+    return list(contours), roi, mask_poly
+
+
+def extract_quietly(extractor, img, too_dark):
+    """提取坐标，屏蔽提取过程中的调试输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return extractor.mark_pixel_coords_ex(img, too_dark=too_dark)
+
+
+def same_contours(expected, actual):
+    return len(expected) == len(actual) and all(np.array_equal(a, b) for a, b in zip(expected, actual))
+
+
+def same_points(expected, actual):
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return np.array_equal(expected, actual)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分块分割一致性基准测试')
+    parser.add_argument('--frames', type=int, default=300, help='随机帧数')
+    parser.add_argument('--tiles', type=int, nargs='+', default=[2, 3, 4, 8], help='对比的分块数')
+    parser.add_argument('--size', default='1600x1200', help='帧尺寸，格式 宽x高')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    rng = np.random.default_rng(args.seed)
+    lut = get_marker_lut(NORMAL_RED_RANGES)
+    # 随机背景的平均亮度较低，固定按正常光照的阈值提取，两条路径使用同一查找表
+    too_dark = False
+
+    mismatches = 0
+    untiled_total = 0.0
+    tiled_total = {count: 0.0 for count in args.tiles}
+    for frame_index in range(args.frames):
+        img, polygon = random_frame(rng, width, height, args.tiles)
+        reference = ExPixelCoord(polygon)
+        expected_contours, roi, mask_poly = untiled_contours(reference, img, lut)
+        x0, y0, _, _ = reference.roi_bounds(img.shape)
+
+        started = time.perf_counter()
+        expected_points = extract_quietly(reference, img, too_dark)
+        untiled_total += time.perf_counter() - started
+
+        for count in args.tiles:
+            tiled = ExPixelCoord(polygon, tiles=count)
+            if roi.shape[0] < count * tiled.TILE_MIN_ROWS:
+                continue
+            actual_contours = tiled._find_contours_tiled(roi, lut, mask_poly, x0, y0)
+            started = time.perf_counter()
+            actual_points = extract_quietly(tiled, img, too_dark)
+            tiled_total[count] += time.perf_counter() - started
+
+            contours_equal = same_contours(expected_contours, actual_contours)
+            points_equal = same_points(expected_points, actual_points)
+            if not (contours_equal and points_equal):
+                mismatches += 1
+                print(f"帧 {frame_index} [tiles={count}] 轮廓一致: {contours_equal} "
+                      f"({len(expected_contours)}/{len(actual_contours)}), 坐标一致: {points_equal}")
+
+    print("=" * 60)
+    print(f"帧数: {args.frames}, 尺寸: {width}x{height}, 不一致: {mismatches}")
+    print(f"整块平均耗时: {untiled_total / args.frames * 1000:.2f}ms")
+    for count, total in tiled_total.items():
+        print(f"tiles={count} 平均耗时: {total / args.frames * 1000:.2f}ms")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+"""
+相机跟踪器按需创建与回收模块
+相机数量很多（数百台）时，启动时不为每台相机读取初始坐标、创建 ExPixelCoord 和缓冲区，
+而是在该相机第一次上传图片时才创建；跟踪器缓冲区（ROI 尺寸的灰度图、查表中间量、多边形掩膜等）
+总量超过内存预算（或常驻相机数超过上限）时，回收空闲最久的相机，回收前把跟踪状态（各 ROI 的 pre_points）保存到 state_dir，
+该相机下次上传时重新创建并恢复，坐标编号保持连续。
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from Ex_Pixel import ExPixelCoord, RoiGroup
+from config_loader import ROI_THRESHOLD_KEYS
+from frame_buffers import FrameBufferPool
+
+
+def create_tracker(camera_config):
+    """
+    按相机配置创建跟踪器：单 ROI 为 ExPixelCoord，配置了多个 ROI 时为 RoiGroup（各 ROI 共用一个缓冲池）。
+
+    缺少 polygon_pts 时返回 None。
+    """
+    if camera_config.get('rois'):
+        buffer_pool = FrameBufferPool()
+        trackers = {
+            roi_name: ExPixelCoord(roi_config['polygon_pts'], roi_config.get('pre_points'),
+                                   buffer_pool=buffer_pool.scoped(roi_name),
+                                   **{key: roi_config[key] for key in ROI_THRESHOLD_KEYS if key in roi_config})
+            for roi_name, roi_config in camera_config['rois'].items()
+        }
+        return RoiGroup(trackers, buffer_pool)
+    if camera_config.get('polygon_pts') is None:
+        return None
+    return ExPixelCoord(camera_config['polygon_pts'], camera_config.get('pre_points', None),
+                        **{key: camera_config[key] for key in ROI_THRESHOLD_KEYS if key in camera_config})
+
+
+def tracker_bytes(tracker):
+    """跟踪器常驻的缓冲区字节数（帧缓冲池与分块缓冲池）"""
+    roi_trackers = tracker.trackers.values() if isinstance(tracker, RoiGroup) else (tracker,)
+    return tracker.buffer_pool.nbytes() + sum(pool.nbytes() for roi_tracker in roi_trackers
+                                              for pool in roi_tracker.tile_pools)
+
+
+class _CameraEntry:
+    """一台已创建的相机：实时跟踪器、按需克隆的历史跟踪器、使用计数与最后使用时间"""
+
+    __slots__ = ('tracker', 'history_tracker', 'in_use', 'last_used')
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.history_tracker = None
+        self.in_use = 0
+        self.last_used = time.time()
+
+    def nbytes(self):
+        total = tracker_bytes(self.tracker)
+        if self.history_tracker is not None:
+            # 历史跟踪器与实时跟踪器共用帧缓冲池，只另计分块缓冲池
+            total += tracker_bytes(self.history_tracker) - self.history_tracker.buffer_pool.nbytes()
+        return total
+
+
+class CameraRegistry:
+    """
+    全部相机的跟踪器注册表，由 CameraMonitor 在启用 camera_cache.lazy 时创建。
+
+    处理线程通过 acquire 取得相机的跟踪器（不存在时创建），使用期间不会被回收；
+    每次归还后检查缓冲区总量与常驻相机数，超过预算时回收空闲超过 idle_seconds 的相机（最久未使用的优先）。
+    进程提取模式下缓冲区在工作进程中，主进程统计不到，可用 max_cameras 限制常驻相机数。
+    """
+
+    def __init__(self, camera_configs, state_dir='tracker_state', memory_budget_mb=0, max_cameras=0,
+                 idle_seconds=300, on_create=None, on_evict=None, logger=None):
+        """
+        Args:
+            camera_configs: {相机名称: 配置}，可为 LazyCameraConfigs（首次取值时才读取初始坐标）
+            state_dir: 回收时保存跟踪状态的目录，每台相机一个 JSON 文件
+            memory_budget_mb: 跟踪器缓冲区总预算（MB），0 不限制
+            max_cameras: 常驻相机数上限，0 不限制
+            idle_seconds: 空闲超过该时间（秒）的相机才可回收
+            on_create: 可选回调 on_create(相机名称, 配置)，相机第一次创建跟踪器时调用（回收后重建不再调用）
+            on_evict: 可选回调 on_evict(相机名称)，相机被回收后调用（如通知提取进程释放对应跟踪器）
+        """
+        self.camera_configs = camera_configs
+        self.state_dir = state_dir
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_cameras = max_cameras
+        self.idle_seconds = idle_seconds
+        self.on_create = on_create
+        self.on_evict = on_evict
+        self.logger = logger or logging.getLogger('atli_monitor.camera_registry')
+        self._entries = {}
+        # 正在创建的相机 -> 创建完成（成功或失败）时置位的事件，同一相机同时只有一个线程创建
+        self._creating = {}
+        self._initialized = set()
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.restored = 0
+        self.evicted = 0
+        self.create_seconds = 0.0
+
+    def roi_names(self, camera_name):
+        """相机的 ROI 名称列表（单 ROI 相机为 [None]），不创建跟踪器"""
+        if hasattr(self.camera_configs, 'roi_names'):
+            return self.camera_configs.roi_names(camera_name)
+        rois = self.camera_configs[camera_name].get('rois')
+        return list(rois) if rois else [None]
+
+    def _state_path(self, camera_name):
+        return os.path.join(self.state_dir, f"{camera_name}.json")
+
+    def _create(self, camera_name):
+        """
+        创建相机的跟踪器并恢复跟踪状态。不持有注册表锁（读取初始坐标、分配缓冲区较慢），
+        由 acquire 保证同一相机同时只有一个线程创建，其他相机不受影响。
+        """
+        started = time.perf_counter()
+        camera_config = self.camera_configs[camera_name]
+        tracker = create_tracker(camera_config)
+        if tracker is None:
+            raise ValueError(f"相机 {camera_name} 缺少 polygon_pts 配置")
+        restored = self._restore_state(camera_name, tracker)
+        with self._lock:
+            first = camera_name not in self._initialized
+        if first:
+            if self.on_create is not None:
+                self.on_create(camera_name, camera_config)
+            with self._lock:
+                self._initialized.add(camera_name)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.created += 1
+            self.create_seconds += elapsed
+            if restored:
+                self.restored += 1
+            resident = len(self._entries) + 1
+        self.logger.info(f"相机 {camera_name} 像素提取器已创建{'（已恢复跟踪状态）' if restored else ''} - "
+                         f"耗时: {elapsed:.3f}秒, 已创建相机: {resident}")
+        return _CameraEntry(tracker)
+
+    def _restore_state(self, camera_name, tracker):
+        """读取回收时保存的 pre_points，返回是否恢复"""
+        path = self._state_path(camera_name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"相机 {camera_name} 跟踪状态读取失败，使用初始坐标: {e}")
+            return False
+        for roi_name, points in state.get('pre_points', []):
+            if points is None:
+                continue
+            if roi_name is None and not isinstance(tracker, RoiGroup):
+                tracker.set_pre_points(points)
+            elif isinstance(tracker, RoiGroup) and roi_name in tracker.trackers:
+                tracker.trackers[roi_name].set_pre_points(points)
+        return True
+
+    def _save_state(self, camera_name, tracker):
+        """原子写出相机的 pre_points"""
+        pre_points = tracker.pre_points if isinstance(tracker, RoiGroup) else {None: tracker.pre_points}
+        state = {
+            'saved': time.time(),
+            'pre_points': [[roi_name, None if points is None else np.asarray(points).tolist()]
+                           for roi_name, points in pre_points.items()],
+        }
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(camera_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def acquire(self, camera_name, history=False):
+        """
+        取得相机的跟踪器（不存在时创建），with 块结束前不会被回收。
+
+        Args:
+            history: 取最新帧优先模式的历史跟踪器（首次使用时由实时跟踪器克隆）
+        """
+        tracker = self.checkout(camera_name, history)
+        try:
+            yield tracker
+        finally:
+            self.release(camera_name)
+
+    def checkout(self, camera_name, history=False):
+        """
+        取得相机的跟踪器（不存在时创建）并增加使用计数，必须与 release 成对调用。
+        创建在锁外进行，同一相机的其他线程等待创建完成；创建失败时抛出异常，不增加使用计数。
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(camera_name)
+                if entry is not None:
+                    if history and entry.history_tracker is None:
+                        entry.history_tracker = entry.tracker.clone()
+                    entry.in_use += 1
+                    return entry.history_tracker if history else entry.tracker
+                creating = self._creating.get(camera_name)
+                if creating is None:
+                    creating = self._creating[camera_name] = threading.Event()
+                    break
+            # 其他线程正在创建该相机，完成后重新查找（创建失败时由本线程重试并抛出异常）
+            creating.wait()
+
+        entry = None
+        try:
+            entry = self._create(camera_name)
+        finally:
+            with self._lock:
+                del self._creating[camera_name]
+                if entry is not None:
+                    self._entries[camera_name] = entry
+                    if history:
+                        entry.history_tracker = entry.tracker.clone()
+                    entry.in_use += 1
+            creating.set()
+        return entry.history_tracker if history else entry.tracker
+
+    def release(self, camera_name):
+        """归还 checkout 取得的跟踪器，超过预算时回收空闲相机"""
+        with self._lock:
+            entry = self._entries[camera_name]
+            entry.in_use -= 1
+            entry.last_used = time.time()
+        if self.memory_budget or self.max_cameras:
+            self.evict_idle()
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.nbytes() for entry in self._entries.values())
+
+    def resident_cameras(self):
+        with self._lock:
+            return len(self._entries)
+
+    def evict_idle(self, now=None):
+        """缓冲区总量或常驻相机数超过限制时按最久未使用的顺序回收空闲相机，返回回收的相机列表"""
+        now = now or time.time()
+        evicted = []
+        with self._lock:
+            sizes = {camera_name: entry.nbytes() for camera_name, entry in self._entries.items()}
+            total = sum(sizes.values())
+
+            def over_limit():
+                return ((self.memory_budget and total > self.memory_budget)
+                        or (self.max_cameras and len(self._entries) > self.max_cameras))
+
+            if not over_limit():
+                return evicted
+            candidates = sorted((entry.last_used, camera_name) for camera_name, entry in self._entries.items()
+                                if entry.in_use == 0 and now - entry.last_used >= self.idle_seconds)
+            for _, camera_name in candidates:
+                if not over_limit():
+                    break
+                entry = self._entries.pop(camera_name)
+                try:
+                    self._save_state(camera_name, entry.tracker)
+                except OSError as e:
+                    self.logger.error(f"相机 {camera_name} 跟踪状态保存失败: {e}")
+                entry.tracker.buffer_pool.release()
+                total -= sizes[camera_name]
+                evicted.append(camera_name)
+                self.evicted += 1
+                self.logger.info(f"回收空闲相机: {camera_name} - 释放: {sizes[camera_name] / 1024 / 1024:.1f}MB, "
+                                 f"空闲: {now - entry.last_used:.0f}秒, 剩余: {total / 1024 / 1024:.1f}MB")
+        if self.on_evict is not None:
+            for camera_name in evicted:
+                self.on_evict(camera_name)
+        return evicted
+
+    def close(self):
+        """保存全部已创建相机的跟踪状态（停止监控时调用），重启后从上次的坐标继续匹配"""
+        with self._lock:
+            for camera_name, entry in self._entries.items():
+                try:
+                    self._save_state(camera_name, entry.tracker)
+                except OSError as e:
+                    self.logger.error(f"相机 {camera_name} 跟踪状态保存失败: {e}")
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            resident = len(self._entries)
+            resident_bytes = sum(entry.nbytes() for entry in self._entries.values())
+        return (f"常驻相机: {resident}/{len(self.camera_configs)}, 缓冲区: {resident_bytes / 1024 / 1024:.1f}MB, "
+                f"创建: {self.created}次（恢复状态 {self.restored}次，累计 {self.create_seconds:.2f}秒）, "
+                f"回收: {self.evicted}次")
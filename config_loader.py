@@ -3,11 +3,18 @@
 支持从 YAML 文件加载系统配置，并提供默认值
 """
 
+import collections.abc
+import threading
 import yaml
 import os
 import platform
 import numpy as np
 
+# 每个 ROI 可单独配置的标志物阈值与分块数（对应 ExPixelCoord 的同名参数）
+ROI_THRESHOLD_KEYS = ('hsv_ranges', 'dark_hsv_ranges', 'min_area', 'dark_threshold', 'tiles')
+# 监控处理的上传图片扩展名（主程序与新鲜度检查共用）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
 
 class ConfigLoader:
     """配置加载器，负责读取和解析 YAML 配置文件"""
@@ -111,34 +118,354 @@ class ConfigLoader:
                     points.append([x, y])
         return np.array(points, dtype=np.float32)
 
-    def get_camera_configs(self):
+    @staticmethod
+    def _load_roi_config(roi_info):
+        """读取单个 ROI 的多边形、初始坐标与可选的标志物阈值"""
+        # 修改，增加初始像素点坐标
+        polygon_pts = np.array(roi_info['polygon_pts'], dtype=np.int32)
+        init_points_path = roi_info['init_points_path']
+        roi_config = {
+            'polygon_pts': polygon_pts,
+            'pre_points': ConfigLoader.load_init_points(init_points_path)
+        }
+        for key in ROI_THRESHOLD_KEYS:
+            if roi_info.get(key) is not None:
+                roi_config[key] = roi_info[key]
+        return roi_config
+
+    def _load_camera_config(self, camera_info):
+        """读取单台相机的 ROI 配置（含初始坐标文件）"""
+        if camera_info.get('rois'):
+            return {
+                'rois': {str(roi_name): self._load_roi_config(roi_info)
+                         for roi_name, roi_info in camera_info['rois'].items()}
+            }
+        return self._load_roi_config(camera_info)
+
+    def get_camera_configs(self, lazy=False):
         """
         获取所有相机的配置信息
 
+        Args:
+            lazy: 为 True 时返回 LazyCameraConfigs，只列出相机名称，各相机的多边形与初始坐标在首次访问时才读取
+
         Returns:
-            dict: 相机配置字典，格式为 {camera_name: config}
+            dict: 相机配置字典，格式为 {camera_name: config}；
+                单 ROI 相机的 config 为 {polygon_pts, pre_points, [阈值]}，
+                多 ROI 相机为 {'rois': {ROI 名称: {polygon_pts, pre_points, [阈值]}}}
         """
         cameras = self.config['cameras']
+        if lazy:
+            return LazyCameraConfigs(self, [camera_name for camera_name, camera_info in cameras.items()
+                                            if camera_info.get('enabled', True)])
+
         camera_configs = {}
 
         for camera_name, camera_info in cameras.items():
             if not camera_info.get('enabled', True):
                 continue
-
-            # 修改，增加初始像素点坐标
-            polygon_pts = np.array(camera_info['polygon_pts'], dtype=np.int32)
-            init_points_path= camera_info['init_points_path']
-            camera_configs[camera_name] = {
-                'polygon_pts': polygon_pts,
-                'pre_points': ConfigLoader.load_init_points(init_points_path)
-            }
+            camera_configs[camera_name] = self._load_camera_config(camera_info)
 
         return camera_configs
 
+    def get_camera_roi_names(self, camera_name):
+        """相机的 ROI 名称列表（不读取初始坐标）；单 ROI 相机为 [None]"""
+        rois = self.config['cameras'][camera_name].get('rois')
+        return [str(roi_name) for roi_name in rois] if rois else [None]
+
     def get_file_wait_time(self):
         """获取文件写入等待时间"""
         return self.config['processing'].get('file_wait_time', 2)
 
+    def get_startup_config(self):
+        """
+        获取启动配置
+
+        Returns:
+            dict: 启动配置字典（warm_up 是否预热，budget_seconds 启动耗时预算）
+        """
+        startup_config = {
+            'warm_up': True,
+            'budget_seconds': 0
+        }
+        startup_config.update(self.config.get('processing', {}).get('startup', {}) or {})
+        return startup_config
+
+    def get_dedup_config(self):
+        """
+        获取重复帧检测配置
+
+        Returns:
+            dict: 重复帧检测配置字典
+        """
+        dedup_config = {
+            'enabled': False,
+            'near_duplicate_distance': -1,
+            'max_reuse': 5,
+            'history_size': 256
+        }
+        dedup_config.update(self.config.get('processing', {}).get('dedup', {}) or {})
+        return dedup_config
+
+    def get_quality_gate_config(self):
+        """
+        获取图像质量门限配置
+
+        Returns:
+            dict: 质量门限配置字典（各 min_* 阈值为 0 时不检查该项，action: flag 仅标记 / skip 跳过提取）
+        """
+        quality_gate_config = {
+            'enabled': False,
+            'reduce_factor': 4,
+            'min_sharpness': 0.0,
+            'min_contrast': 0.0,
+            'min_red_ratio': 0.0,
+            'min_marker_ratio': 0.0,
+            'action': 'flag'
+        }
+        quality_gate_config.update(self.config.get('processing', {}).get('quality_gate', {}) or {})
+        return quality_gate_config
+
+    def get_load_shedding_config(self):
+        """
+        获取负载降级配置
+
+        Returns:
+            dict: 负载降级配置字典（queue_depth / frame_age 为 1~4 级阈值）
+        """
+        load_shedding_config = {
+            'enabled': False,
+            'queue_depth': [3, 6, 10, 20],
+            'frame_age': [30, 60, 120, 300],
+            'recover_ratio': 0.5
+        }
+        load_shedding_config.update(self.config.get('processing', {}).get('load_shedding', {}) or {})
+        return load_shedding_config
+
+    def get_scheduling_config(self):
+        """
+        获取帧调度配置
+
+        Returns:
+            dict: 调度配置字典（mode: fifo 按到达顺序 / latest_first 最新帧优先）
+        """
+        scheduling_config = {
+            'mode': 'fifo',
+            'timeline_size': 512
+        }
+        scheduling_config.update(self.config.get('processing', {}).get('scheduling', {}) or {})
+        return scheduling_config
+
+    def get_displacement_config(self):
+        """
+        获取位移统计与告警配置
+
+        Returns:
+            dict: 位移告警配置字典（sinks 为告警输出列表）
+        """
+        displacement_config = {
+            'enabled': False,
+            'displacement_threshold': 20.0,
+            'rate_threshold': 0.0,
+            'zscore_threshold': 0.0,
+            'ewma_alpha': 0.1,
+            'clear_ratio': 0.8,
+            'sinks': [{'type': 'log'}]
+        }
+        displacement_config.update(self.config.get('displacement', {}) or {})
+        return displacement_config
+
+    def get_ingest_config(self):
+        """
+        获取新文件发现方式配置
+
+        Returns:
+            dict: 文件发现配置字典
+        """
+        ingest_config = {
+            'mode': 'watchdog',
+            'min_interval': 0.5,
+            'max_interval': 5.0,
+            'dispatch_workers': 8
+        }
+        ingest_config.update(self.config.get('processing', {}).get('ingest', {}) or {})
+        return ingest_config
+
+    def get_extraction_config(self):
+        """
+        获取坐标提取方式配置
+
+        Returns:
+            dict: 提取配置字典（mode: thread 在处理线程内提取 / process 在工作进程中提取）
+        """
+        extraction_config = {
+            'mode': 'thread',
+            'workers': 2,
+            'slots': 4,
+            'slot_mb': 32,
+            'timeout': 60,
+            'max_restarts': 5
+        }
+        extraction_config.update(self.config.get('processing', {}).get('extraction', {}) or {})
+        return extraction_config
+
+    def get_camera_cache_config(self):
+        """
+        获取相机状态按需创建与回收配置
+
+        Returns:
+            dict: lazy 首次上传时才创建相机跟踪器，memory_budget_mb 跟踪器缓冲区总预算、max_cameras 常驻相机数上限
+                （均为 0 时不回收），idle_seconds 可回收的最短空闲时间，state_dir 回收时保存跟踪状态的目录
+        """
+        camera_cache_config = {
+            'lazy': False,
+            'memory_budget_mb': 0,
+            'max_cameras': 0,
+            'idle_seconds': 300,
+            'state_dir': 'tracker_state'
+        }
+        camera_cache_config.update(self.config.get('processing', {}).get('camera_cache', {}) or {})
+        return camera_cache_config
+
+    def get_query_api_config(self):
+        """
+        获取本地查询接口配置
+
+        Returns:
+            dict: 查询接口配置字典
+        """
+        query_api_config = {
+            'enabled': False,
+            'host': '127.0.0.1',
+            'port': 8765,
+            'cache_size': 1000
+        }
+        query_api_config.update(self.config.get('query_api', {}) or {})
+        return query_api_config
+
+    def get_publisher_config(self):
+        """
+        获取结果推送配置
+
+        Returns:
+            dict: 结果推送配置字典
+        """
+        publisher_config = {
+            'enabled': False,
+            'address': '127.0.0.1:8766',
+            'buffer_size': 1000
+        }
+        publisher_config.update(self.config.get('publisher', {}) or {})
+        return publisher_config
+
+    def get_memory_config(self):
+        """
+        获取内存监控配置
+
+        Returns:
+            dict: 内存监控配置字典（tracemalloc_frames 为 0 时不开启 tracemalloc）
+        """
+        memory_config = {
+            'enabled': False,
+            'interval': 600,
+            'tracemalloc_frames': 0,
+            'top_n': 10,
+            'rss_warning_mb': 0,
+            'thread_warning': 0
+        }
+        memory_config.update(self.config.get('memory_monitor', {}) or {})
+        return memory_config
+
+    def get_freshness_config(self):
+        """
+        获取数据新鲜度监控配置
+
+        Returns:
+            dict: 新鲜度监控配置字典，cameras 下可按相机覆盖 expected_interval
+        """
+        freshness_config = {
+            'enabled': False,
+            'check_interval': 30,
+            'expected_interval': 600,
+            'max_lag': 0,
+            'missed_grace': 60,
+            'cameras': {}
+        }
+        freshness_config.update(self.config.get('freshness', {}) or {})
+        return freshness_config
+
+    def get_profiler_config(self):
+        """
+        获取按需性能采样配置
+
+        Returns:
+            dict: 性能采样配置字典（output_dir 为空时写到日志文件所在目录）
+        """
+        profiler_config = {
+            'enabled': False,
+            'duration': 30,
+            'interval': 0.005,
+            'top_n': 30,
+            'output_dir': None
+        }
+        profiler_config.update(self.config.get('profiler', {}) or {})
+        return profiler_config
+
+    def get_output_config(self):
+        """
+        获取输出写入配置
+
+        Returns:
+            dict: 可直接作为 OutputWriter 关键字参数的配置字典
+        """
+        output_config = {
+            'async_write': True,
+            'writer_threads': 2,
+            'durability': 'batch',
+            'batch_size': 32,
+            'batch_interval': 1.0,
+            'max_pending': 16
+        }
+        output_config.update(self.config.get('output', {}) or {})
+        return output_config
+
+    def get_retention_config(self):
+        """
+        获取归档与保留策略配置
+
+        Returns:
+            dict: 保留策略配置字典，cameras 下可按相机覆盖 max_age_days / max_size_gb
+        """
+        retention_config = {
+            'enabled': False,
+            'interval_minutes': 60,
+            'close_after_minutes': 60,
+            'max_age_days': None,
+            'max_size_gb': None,
+            'delete_workers': 4,
+            'io_rate_mb': 20,
+            'cameras': {}
+        }
+        retention_config.update(self.config.get('retention', {}) or {})
+        return retention_config
+
+    def get_trend_chart_config(self):
+        """
+        获取位移趋势图配置
+
+        Returns:
+            dict: 趋势图配置字典（cache_dir 增量缓存目录，output_dir 图片目录，days 绘制最近天数）
+        """
+        trend_config = {
+            'cache_dir': 'trend_cache',
+            'output_dir': 'trend_charts',
+            'days': 0,
+            'columns': 4,
+            'dpi': 100
+        }
+        trend_config.update(self.config.get('trend_charts', {}) or {})
+        return trend_config
+
     def get_log_config(self):
         """
         获取日志配置
@@ -193,6 +520,40 @@ class ConfigLoader:
                     logger.error(f"创建日志目录失败: {log_dir} - {e}")
 
 
+class LazyCameraConfigs(collections.abc.Mapping):
+    """
+    按需读取的相机配置映射（ConfigLoader.get_camera_configs(lazy=True) 的返回值）。
+
+    键为已启用的相机名称；某台相机的配置在第一次取值时才解析多边形并读取 init_points_path，之后缓存。
+    相机数量很多时启动耗时与相机数无关，只有实际上传过图片的相机才读取配置。
+    """
+
+    def __init__(self, loader, camera_names):
+        self._loader = loader
+        self._camera_names = list(camera_names)
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, camera_name):
+        with self._lock:
+            camera_config = self._configs.get(camera_name)
+            if camera_config is None:
+                if camera_name not in self._camera_names:
+                    raise KeyError(camera_name)
+                camera_config = self._loader._load_camera_config(self._loader.config['cameras'][camera_name])
+                self._configs[camera_name] = camera_config
+            return camera_config
+
+    def __iter__(self):
+        return iter(self._camera_names)
+
+    def __len__(self):
+        return len(self._camera_names)
+
+    def roi_names(self, camera_name):
+        return self._loader.get_camera_roi_names(camera_name)
+
+
 def load_config(config_path='config.yaml', env=None):
     """
     便捷函数：加载配置文件
@@ -0,0 +1,284 @@
+"""
+位移统计与告警模块
+每帧以 O(1) 增量更新各标志点相对初始坐标（init_Pixel/pixel/*.txt）的位移统计：
+累计均值/方差（Welford）、滑动均值/方差（EWMA）与位移变化速率，
+越过阈值时立即通过可插拔的告警输出（日志 / 文件 / 本地套接字）发出告警，恢复时发出解除通知。
+"""
+
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+# 计算 z 分数前至少需要的帧数（滑动方差尚未稳定时不判定）
+ZSCORE_WARMUP = 10
+
+
+def parse_frame_time(timestamp):
+    """将 EXIF 时间戳文件名（YYYYmmddHHMMSS）转换为秒，无法解析时返回当前时间"""
+    if timestamp:
+        try:
+            return datetime.strptime(timestamp, '%Y%m%d%H%M%S').timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class PointStats:
+    """单个标志点的位移增量统计"""
+
+    __slots__ = ('base_x', 'base_y', 'count', 'mean', 'm2', 'ewma_mean', 'ewma_var', 'rate',
+                 'last_displacement', 'last_time', 'max_displacement', 'alarms')
+
+    def __init__(self, base_x, base_y):
+        self.base_x = base_x
+        self.base_y = base_y
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma_mean = 0.0
+        self.ewma_var = 0.0
+        self.rate = 0.0
+        self.last_displacement = None
+        self.last_time = None
+        self.max_displacement = 0.0
+        self.alarms = set()
+
+    def update(self, x, y, frame_time, alpha):
+        """
+        加入一帧坐标，返回 (dx, dy, 位移, 更新前的 z 分数)。
+
+        速率（像素/小时）由 EWMA 平滑后的位移计算，抑制单帧抖动。
+        """
+        dx = x - self.base_x
+        dy = y - self.base_y
+        displacement = math.hypot(dx, dy)
+
+        zscore = 0.0
+        if self.count >= ZSCORE_WARMUP and self.ewma_var > 0:
+            zscore = (displacement - self.ewma_mean) / math.sqrt(self.ewma_var)
+
+        # Welford 累计均值/方差
+        self.count += 1
+        delta = displacement - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (displacement - self.mean)
+
+        # EWMA 滑动均值/方差；速率取平滑位移的变化率，再做一次 EWMA
+        if self.count == 1:
+            self.ewma_mean = displacement
+        else:
+            diff = displacement - self.ewma_mean
+            increment = alpha * diff
+            self.ewma_mean += increment
+            self.ewma_var = (1 - alpha) * (self.ewma_var + diff * increment)
+            if frame_time > self.last_time:
+                instant_rate = increment * 3600.0 / (frame_time - self.last_time)
+                self.rate += alpha * (instant_rate - self.rate)
+        self.last_displacement = displacement
+        self.last_time = frame_time
+        self.max_displacement = max(self.max_displacement, displacement)
+        return dx, dy, displacement, zscore
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+class LogAlertSink:
+    """告警写入监控日志"""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger('atli_monitor.displacement')
+
+    def emit(self, alert):
+        if alert['state'] == 'alarm':
+            self.logger.warning(f"位移告警: 相机 {alert['camera']} 点 {alert['point']} - {alert['kind']} "
+                                f"{alert['value']:.2f} 超过阈值 {alert['threshold']} "
+                                f"(位移: {alert['displacement']:.2f}px, 帧: {alert['timestamp']})")
+        else:
+            self.logger.info(f"位移告警解除: 相机 {alert['camera']} 点 {alert['point']} - {alert['kind']} "
+                             f"{alert['value']:.2f} (帧: {alert['timestamp']})")
+
+    def close(self):
+        pass
+
+
+class FileAlertSink:
+    """告警以 JSON Lines 追加写入文件，便于其他程序跟踪读取"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def emit(self, alert):
+        with self._lock:
+            self._file.write(json.dumps(alert, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SocketAlertSink:
+    """
+    告警以 JSON 数据报发送到本地套接字：以 / 开头的地址为 Unix 数据报套接字，否则为 host:port（UDP）。
+
+    非阻塞尽力发送，接收方未启动或缓冲区满时丢弃，不影响帧处理。
+    """
+
+    def __init__(self, address):
+        if address.startswith('/'):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._address = address
+        else:
+            host, port = address.rsplit(':', 1)
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._address = (host, int(port))
+        self._socket.setblocking(False)
+
+    def emit(self, alert):
+        try:
+            self._socket.sendto(json.dumps(alert, ensure_ascii=False).encode('utf-8'), self._address)
+        except OSError:
+            pass
+
+    def close(self):
+        self._socket.close()
+
+
+def build_alert_sinks(sink_configs, logger=None):
+    """按配置列表创建告警输出，如 [{'type': 'log'}, {'type': 'file', 'path': ...}]"""
+    sinks = []
+    for sink_config in sink_configs or []:
+        sink_type = sink_config.get('type')
+        if sink_type == 'log':
+            sinks.append(LogAlertSink(logger))
+        elif sink_type == 'file':
+            sinks.append(FileAlertSink(sink_config['path']))
+        elif sink_type == 'socket':
+            sinks.append(SocketAlertSink(sink_config['address']))
+        else:
+            raise ValueError(f"不支持的告警输出类型: {sink_type}，可选: log, file, socket")
+    return sinks
+
+
+class DisplacementTracker:
+    """
+    单台相机全部标志点的位移统计与阈值告警。
+
+    由 CameraMonitor 按相机创建，跨 TLS_* 批次传递给各 TimeFolderHandler，告警输出由各相机共用；
+    只接收按时间顺序到达的帧（最新帧优先模式下的历史补处理帧不参与）。
+    """
+
+    def __init__(self, camera_name, baseline_points, sinks, displacement_threshold=20.0, rate_threshold=0.0,
+                 zscore_threshold=0.0, ewma_alpha=0.1, clear_ratio=0.8):
+        """
+        Args:
+            camera_name: 相机名称
+            baseline_points: 初始坐标（load_init_points 的结果），第 i 行对应编号 i+1 的点
+            sinks: 告警输出列表（见 build_alert_sinks）
+            displacement_threshold: 相对初始坐标的位移阈值（像素），0 关闭
+            rate_threshold: 位移变化速率阈值（像素/小时），0 关闭
+            zscore_threshold: 偏离滑动均值的标准差倍数阈值，0 关闭
+            ewma_alpha: 滑动统计的平滑系数
+            clear_ratio: 指标回落到阈值的该比例以下时解除告警
+        """
+        self.camera_name = camera_name
+        self.points = [PointStats(float(x), float(y)) for x, y in baseline_points]
+        self.sinks = sinks
+        self.thresholds = {
+            'displacement': displacement_threshold,
+            'rate': rate_threshold,
+            'zscore': zscore_threshold,
+        }
+        self.ewma_alpha = ewma_alpha
+        self.clear_ratio = clear_ratio
+        self.frames = 0
+        self.alerts = 0
+        self._lock = threading.Lock()
+
+    def update(self, timestamp, points):
+        """
+        加入一帧像素坐标并检查阈值，返回本帧产生的告警/解除记录列表。
+
+        Args:
+            timestamp: 帧时间戳（EXIF，YYYYmmddHHMMSS）
+            points: 按编号排序的 [(x, y), ...]
+        """
+        frame_time = parse_frame_time(timestamp)
+        events = []
+        with self._lock:
+            self.frames += 1
+            for index, (stats, (x, y)) in enumerate(zip(self.points, points), 1):
+                dx, dy, displacement, zscore = stats.update(float(x), float(y), frame_time, self.ewma_alpha)
+                values = {'displacement': displacement, 'rate': abs(stats.rate), 'zscore': abs(zscore)}
+                for kind, threshold in self.thresholds.items():
+                    if not threshold:
+                        continue
+                    value = values[kind]
+                    if kind not in stats.alarms and value >= threshold:
+                        stats.alarms.add(kind)
+                        state = 'alarm'
+                    elif kind in stats.alarms and value < threshold * self.clear_ratio:
+                        stats.alarms.discard(kind)
+                        state = 'clear'
+                    else:
+                        continue
+                    events.append({
+                        'camera': self.camera_name,
+                        'point': index,
+                        'timestamp': timestamp,
+                        'state': state,
+                        'kind': kind,
+                        'value': round(value, 3),
+                        'threshold': threshold,
+                        'dx': round(dx, 3),
+                        'dy': round(dy, 3),
+                        'displacement': round(displacement, 3),
+                        'mean': round(stats.ewma_mean, 3),
+                        'std': round(math.sqrt(stats.ewma_var), 3),
+                        'rate': round(stats.rate, 3),
+                    })
+            self.alerts += sum(1 for event in events if event['state'] == 'alarm')
+
+        for event in events:
+            for sink in self.sinks:
+                try:
+                    sink.emit(event)
+                except Exception as e:
+                    logging.getLogger('atli_monitor.displacement').error(f"告警输出失败: {e}")
+        return events
+
+    def snapshot(self):
+        """各点当前统计：[{point, displacement, mean, std, ewma_mean, ewma_std, rate, max, alarms}, ...]"""
+        with self._lock:
+            return [{
+                'point': index,
+                'displacement': stats.last_displacement,
+                'mean': stats.mean,
+                'std': math.sqrt(stats.variance),
+                'ewma_mean': stats.ewma_mean,
+                'ewma_std': math.sqrt(stats.ewma_var),
+                'rate': stats.rate,
+                'max': stats.max_displacement,
+                'alarms': sorted(stats.alarms),
+            } for index, stats in enumerate(self.points, 1)]
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            if not self.points or not self.frames:
+                return f"帧数: {self.frames}, 告警: {self.alerts}"
+            index, stats = max(enumerate(self.points, 1), key=lambda item: item[1].max_displacement)
+            active = sum(1 for p in self.points if p.alarms)
+            return (f"帧数: {self.frames}, 告警: {self.alerts}, 当前告警点: {active}, "
+                    f"最大位移: 点 {index} {stats.max_displacement:.2f}px")
@@ -0,0 +1,301 @@
+"""
+坐标时间序列导出工具
+按时间顺序遍历 atli_processed/<相机>/TLS_*/pixel/（多 ROI 相机为 pixel/<ROI 名称>/）下的坐标文件，
+每个点输出一对 x/y 列，逐行流式写出 Excel（openpyxl 只写模式）或 CSV，
+内存占用只与单个批次的文件数有关，与归档总量无关。
+
+用法:
+    python export_coords.py --output coords.xlsx                           # 全部相机，每个相机/ROI 一个工作表
+    python export_coords.py --camera camera1 --since 2025-12-01 --until 2025-12-31 --output camera1.xlsx
+    python export_coords.py --format csv --output coords_csv/              # 每个相机/ROI 一个 CSV 文件
+"""
+
+import argparse
+import csv
+import heapq
+import os
+import re
+import time
+from datetime import datetime
+
+from retention import tls_number
+
+# Excel 单个工作表的最大行数，超过后续写到下一个工作表
+EXCEL_MAX_ROWS = 1048576
+# 工作表名称最长 31 个字符，且不能包含 : \ / ? * [ ]
+_SHEET_INVALID = re.compile(r'[:\\/?*\[\]]')
+
+
+def normalize_bound(value, upper=False):
+    """YYYY-MM-DD / YYYYmmddHHMMSS 等格式的时间界限补齐为 14 位数字字符串，下界补 0，上界补 9"""
+    if not value:
+        return None
+    digits = re.sub(r'\D', '', value)[:14]
+    return digits.ljust(14, '9' if upper else '0')
+
+
+def parse_timestamp(timestamp):
+    """文件名时间戳转为 datetime，无法解析时原样返回字符串"""
+    try:
+        return datetime.strptime(timestamp, '%Y%m%d%H%M%S')
+    except ValueError:
+        return timestamp
+
+
+def read_points(path):
+    """读取坐标文件（每行 "编号 x y"），返回 {编号: (x, y)}"""
+    points = {}
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3:
+                points[int(parts[0])] = (float(parts[1]), float(parts[2]))
+    return points
+
+
+def list_streams(base_processed_path, cameras=None):
+    """
+    查找全部坐标序列。
+
+    Returns:
+        list: [(相机名称, ROI 名称或 None, [批次目录...])]，批次按 TLS 编号升序
+    """
+    streams = []
+    if not os.path.isdir(base_processed_path):
+        return streams
+    with os.scandir(base_processed_path) as it:
+        camera_names = sorted(entry.name for entry in it if entry.is_dir())
+    for camera_name in camera_names:
+        if cameras and camera_name not in cameras:
+            continue
+        camera_path = os.path.join(base_processed_path, camera_name)
+        with os.scandir(camera_path) as it:
+            batches = sorted((entry.path for entry in it if entry.is_dir() and tls_number(entry.name) >= 0),
+                             key=lambda path: tls_number(os.path.basename(path)))
+        rois = set()
+        has_plain = False
+        for batch_path in batches:
+            pixel_dir = os.path.join(batch_path, 'pixel')
+            if not os.path.isdir(pixel_dir):
+                continue
+            with os.scandir(pixel_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        rois.add(entry.name)
+                    elif entry.name.endswith('.txt'):
+                        has_plain = True
+        if has_plain:
+            streams.append((camera_name, None, batches))
+        for roi in sorted(rois):
+            streams.append((camera_name, roi, batches))
+    return streams
+
+
+def _batch_timestamps(pixel_dir, since=None, until=None):
+    """批次内时间范围内的时间戳（未排序）"""
+    try:
+        with os.scandir(pixel_dir) as it:
+            names = [entry.name[:-4] for entry in it if entry.name.endswith('.txt') and entry.is_file()]
+    except FileNotFoundError:
+        return []
+    return [name for name in names if (since is None or name >= since) and (until is None or name <= until)]
+
+
+def iter_frames(batches, roi=None, since=None, until=None):
+    """
+    按时间戳顺序逐帧产出 (时间戳, 批次名称, 坐标文件路径)。
+
+    先逐批次取得时间范围（只保留首尾时间戳），时间范围互相重叠的相邻批次（相机时钟回拨、
+    TLS 编号回绕等）归为一组归并输出，其余批次依次输出；同时只在内存中保留一组批次的文件名。
+    """
+    spans = []
+    for batch_path in batches:
+        pixel_dir = os.path.join(batch_path, 'pixel')
+        if roi is not None:
+            pixel_dir = os.path.join(pixel_dir, roi)
+        timestamps = _batch_timestamps(pixel_dir, since, until)
+        if timestamps:
+            spans.append((min(timestamps), max(timestamps), os.path.basename(batch_path), pixel_dir))
+    spans.sort()
+
+    group = []
+    group_end = None
+    for first, last, batch_name, pixel_dir in spans:
+        if group and first > group_end:
+            yield from _merge_group(group, since, until)
+            group = []
+        group_end = last if not group else max(group_end, last)
+        group.append((batch_name, pixel_dir))
+    if group:
+        yield from _merge_group(group, since, until)
+
+
+def _merge_group(group, since, until):
+    def frames(batch_name, pixel_dir):
+        for timestamp in sorted(_batch_timestamps(pixel_dir, since, until)):
+            yield timestamp, batch_name, os.path.join(pixel_dir, f"{timestamp}.txt")
+
+    if len(group) == 1:
+        yield from frames(*group[0])
+    else:
+        yield from heapq.merge(*(frames(batch_name, pixel_dir) for batch_name, pixel_dir in group))
+
+
+def stream_rows(frames):
+    """
+    坐标文件逐帧转为行 [时间, 批次, P1_x, P1_y, ...]，点数固定为第一帧的最大编号（与表头一致），
+    缺失的点留空，编号超出的点丢弃（与 trend_charts.py 相同）。
+
+    Returns:
+        (点数, 行迭代器)；没有帧时点数为 None
+    """
+    frames = iter(frames)
+    for timestamp, batch_name, path in frames:
+        try:
+            first = read_points(path)
+        except (OSError, ValueError):
+            continue
+        point_count = max(first, default=0)
+
+        def rows():
+            points = first
+            row_timestamp, row_batch = timestamp, batch_name
+            while True:
+                row = [parse_timestamp(row_timestamp), row_batch]
+                for idx in range(1, point_count + 1):
+                    row.extend(points.get(idx, (None, None)))
+                yield row
+                for row_timestamp, row_batch, next_path in frames:
+                    try:
+                        points = read_points(next_path)
+                        break
+                    except (OSError, ValueError):
+                        continue
+                else:
+                    return
+
+        return point_count, rows()
+    return None, iter(())
+
+
+def header_row(point_count):
+    header = ['时间', '批次']
+    for idx in range(1, point_count + 1):
+        header.extend((f"P{idx}_x", f"P{idx}_y"))
+    return header
+
+
+def stream_label(camera_name, roi):
+    return camera_name if roi is None else f"{camera_name}:{roi}"
+
+
+def _sheet_title(label, part, used):
+    title = _SHEET_INVALID.sub('-', label)
+    suffix = f"_{part}" if part > 1 else ''
+    title = title[:31 - len(suffix)] + suffix
+    base, index = title, 1
+    while title.lower() in used:
+        index += 1
+        title = f"{base[:31 - len(str(index)) - 1]}~{index}"
+    used.add(title.lower())
+    return title
+
+
+def export_xlsx(streams, output_path, since=None, until=None):
+    """写出 Excel，每个相机/ROI 一个工作表（只写模式逐行落盘）；返回 {序列名称: 行数}"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    counts = {}
+    used_titles = set()
+    for camera_name, roi, batches in streams:
+        label = stream_label(camera_name, roi)
+        point_count, rows = stream_rows(iter_frames(batches, roi, since, until))
+        if point_count is None:
+            continue
+        header = header_row(point_count)
+        part = 1
+        sheet = workbook.create_sheet(_sheet_title(label, part, used_titles))
+        sheet.freeze_panes = 'C2'
+        sheet.append(header)
+        sheet_rows = 1
+        count = 0
+        for row in rows:
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                part += 1
+                sheet = workbook.create_sheet(_sheet_title(label, part, used_titles))
+                sheet.freeze_panes = 'C2'
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+            count += 1
+        counts[label] = count
+    if not counts:
+        workbook.create_sheet('empty')
+    workbook.save(output_path)
+    return counts
+
+
+def export_csv(streams, output_dir, since=None, until=None):
+    """写出 CSV，每个相机/ROI 一个文件 <相机>[_<ROI>].csv；返回 {序列名称: 行数}"""
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for camera_name, roi, batches in streams:
+        label = stream_label(camera_name, roi)
+        point_count, rows = stream_rows(iter_frames(batches, roi, since, until))
+        if point_count is None:
+            continue
+        file_name = camera_name if roi is None else f"{camera_name}_{roi}"
+        count = 0
+        with open(os.path.join(output_dir, f"{file_name}.csv"), 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(header_row(point_count))
+            for row in rows:
+                if isinstance(row[0], datetime):
+                    row[0] = row[0].strftime('%Y-%m-%d %H:%M:%S')
+                writer.writerow(row)
+                count += 1
+        counts[label] = count
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出像素坐标时间序列（Excel/CSV 流式写出）')
+    parser.add_argument('--config', default='config.yaml', help='配置文件路径（取处理结果根路径）')
+    parser.add_argument('--processed', help='处理结果根路径，默认取配置文件中的 base_processed_path')
+    parser.add_argument('--camera', action='append', help='仅导出指定相机，可重复指定')
+    parser.add_argument('--roi', action='append', help='仅导出指定 ROI（多 ROI 相机），可重复指定')
+    parser.add_argument('--since', help='起始时间（含），格式 YYYY-MM-DD 或 YYYYmmddHHMMSS')
+    parser.add_argument('--until', help='结束时间（含），格式 YYYY-MM-DD 或 YYYYmmddHHMMSS')
+    parser.add_argument('--format', choices=('xlsx', 'csv'), default='xlsx', help='输出格式')
+    parser.add_argument('--output', required=True, help='xlsx 为输出文件路径，csv 为输出目录')
+    args = parser.parse_args()
+
+    base_processed_path = args.processed
+    if not base_processed_path:
+        from config_loader import load_config
+        base_processed_path = load_config(args.config).get_base_processed_path()
+
+    streams = list_streams(base_processed_path, args.camera)
+    if args.roi:
+        streams = [stream for stream in streams if stream[1] is None or stream[1] in args.roi]
+    if not streams:
+        print(f"未找到坐标文件: {base_processed_path}")
+        return
+
+    since = normalize_bound(args.since)
+    until = normalize_bound(args.until, upper=True)
+    started = time.time()
+    if args.format == 'xlsx':
+        counts = export_xlsx(streams, args.output, since, until)
+    else:
+        counts = export_csv(streams, args.output, since, until)
+
+    for label, count in counts.items():
+        print(f"  {label}: {count}帧")
+    print(f"导出完成: {args.output}（{sum(counts.values())}帧，耗时 {time.time() - started:.1f}秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+帧缓冲池模块
+为单个处理线程预分配并复用大尺寸 NumPy 缓冲区（灰度图、查表中间量、掩膜等），
+缓冲区按首帧尺寸分配，仅在尺寸或类型变化时重新分配，稳态处理不再产生大块临时内存。
+"""
+
+import numpy as np
+
+
+class FrameBufferPool:
+    """
+    按名称管理的可复用缓冲区集合。
+
+    非线程安全：每个池只应由一个处理线程使用（与 ExPixelCoord.pre_points 的串行约束一致）。
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def get(self, name, shape, dtype=np.uint8, init=None):
+        """
+        获取指定名称的缓冲区，必要时按 shape/dtype 重新分配。
+
+        Args:
+            name: 缓冲区名称
+            shape: 所需形状
+            dtype: 数据类型
+            init: 可选回调 init(buffer)，仅在（重新）分配时调用，用于填充只与尺寸相关的常量内容
+
+        Returns:
+            np.ndarray: 内容未定义（或由 init 初始化）的缓冲区
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+            if init is not None:
+                init(buffer)
+        return buffer
+
+    def release(self):
+        """释放全部缓冲区（如相机长时间空闲时）"""
+        self._buffers.clear()
+
+    def nbytes(self):
+        """当前池内缓冲区总字节数"""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def scoped(self, namespace):
+        """返回以 namespace 区分缓冲区名称的视图，同一相机的多个 ROI 共用一个池而互不覆盖"""
+        return ScopedBufferPool(self, namespace)
+
+    def stats(self):
+        """返回缓冲池统计：缓冲区数、常驻字节数、累计分配次数与字节数"""
+        return {
+            'buffers': len(self._buffers),
+            'resident_bytes': self.nbytes(),
+            'allocations': self.allocations,
+            'allocated_bytes': self.allocated_bytes,
+        }
+
+
+class ScopedBufferPool:
+    """FrameBufferPool 的命名空间视图：缓冲区登记在底层池中，名称加上命名空间前缀"""
+
+    def __init__(self, pool, namespace):
+        self.pool = pool
+        self.namespace = namespace
+
+    def get(self, name, shape, dtype=np.uint8, init=None):
+        return self.pool.get((self.namespace, name), shape, dtype=dtype, init=init)
+
+    def scoped(self, namespace):
+        return ScopedBufferPool(self.pool, (self.namespace, namespace))
+
+    def release(self):
+        self.pool.release()
+
+    def nbytes(self):
+        return self.pool.nbytes()
+
+    def stats(self):
+        return self.pool.stats()
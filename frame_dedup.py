@@ -0,0 +1,155 @@
+"""
+重复帧检测模块
+为每帧计算内容指纹（文件字节哈希 + ROI 感知哈希）：
+字节完全相同的重复上传直接跳过，与上一帧几乎一致的画面复用上一帧像素坐标结果。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import cv2
+import numpy as np
+
+FrameFingerprint = namedtuple('FrameFingerprint', ['byte_hash', 'perceptual_hash'])
+
+# 感知哈希在 1/8 缩小解码的灰度图上计算，JPEG 可直接按 DCT 缩放解码，开销很小
+_REDUCE_FACTOR = 8
+
+
+def content_hash(image_data):
+    """计算图片原始字节的哈希（blake2b-128），用于识别完全相同的重复上传"""
+    return hashlib.blake2b(image_data, digest_size=16).hexdigest()
+
+
+def roi_perceptual_hash(image_data, polygon_pts, hash_size=16):
+    """
+    计算 ROI 区域的差值哈希（dHash），返回 hash_size*hash_size 位整数。
+
+    直接从内存中的原始字节缩小解码灰度图，裁剪多边形外接矩形，
+    缩放到 (hash_size+1)xhash_size 后比较相邻像素亮度。解码失败或 ROI 为空时返回 None。
+    """
+    gray = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+
+    x, y, w, h = cv2.boundingRect(np.asarray(polygon_pts, dtype=np.int32))
+    x0, y0 = x // _REDUCE_FACTOR, y // _REDUCE_FACTOR
+    x1, y1 = -(-(x + w) // _REDUCE_FACTOR), -(-(y + h) // _REDUCE_FACTOR)
+    roi = gray[y0:y1, x0:x1]
+    if roi.size == 0:
+        return None
+
+    small = cv2.resize(roi, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(hash_a, hash_b):
+    """两个感知哈希之间不同的位数"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class FrameDeduplicator:
+    """
+    单台相机的重复帧判定与节省统计。
+
+    跨 TLS_* 批次保留状态，由 CameraMonitor 按相机创建并传递给各批次的 TimeFolderHandler。
+    """
+
+    def __init__(self, near_duplicate_distance=-1, max_reuse=5, history_size=256, hash_size=16):
+        """
+        Args:
+            near_duplicate_distance: 感知哈希汉明距离不超过该值视为近似帧，小于 0 时关闭近似帧复用（默认）；
+                复用期间位移不会被检测到，需按场景显式开启
+            max_reuse: 连续复用上限，达到后强制完整提取一次，避免缓慢位移被长期掩盖
+            history_size: 记忆的最近字节哈希数量
+            hash_size: 感知哈希边长（位数为其平方）
+        """
+        self.near_duplicate_distance = near_duplicate_distance
+        self.max_reuse = max_reuse
+        self.history_size = history_size
+        self.hash_size = hash_size
+
+        self._seen_hashes = OrderedDict()
+        self._last_perceptual_hash = None
+        self._last_points = None
+        self._reuse_count = 0
+        self._mean_extract_time = 0.0
+        self._lock = threading.Lock()
+
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.full_extractions = 0
+        self.saved_seconds = 0.0
+
+    def fingerprint(self, image_data, polygon_pts):
+        """由已读入内存的图片字节计算帧指纹，感知哈希仅在启用近似帧复用时计算"""
+        byte_hash = content_hash(image_data)
+        perceptual_hash = None
+        if self.near_duplicate_distance >= 0:
+            perceptual_hash = roi_perceptual_hash(image_data, polygon_pts, self.hash_size)
+        return FrameFingerprint(byte_hash, perceptual_hash)
+
+    def is_exact_duplicate(self, fingerprint):
+        """字节哈希已出现过则计为重复上传"""
+        with self._lock:
+            if fingerprint.byte_hash in self._seen_hashes:
+                self._seen_hashes.move_to_end(fingerprint.byte_hash)
+                self.exact_duplicates += 1
+                self.saved_seconds += self._mean_extract_time
+                return True
+            return False
+
+    def reusable_points(self, fingerprint):
+        """
+        若与上一帧 ROI 感知哈希足够接近，返回可复用的上一帧坐标，否则返回 None。
+        """
+        with self._lock:
+            if (fingerprint.perceptual_hash is None
+                    or self._last_perceptual_hash is None
+                    or self._last_points is None
+                    or self._reuse_count >= self.max_reuse):
+                return None
+
+            distance = hamming_distance(fingerprint.perceptual_hash, self._last_perceptual_hash)
+            if distance > self.near_duplicate_distance:
+                return None
+
+            self._reuse_count += 1
+            self.near_duplicates += 1
+            self.saved_seconds += self._mean_extract_time
+            self._remember(fingerprint.byte_hash)
+            return self._last_points
+
+    def record(self, fingerprint, points, extract_time):
+        """登记完成完整提取的帧，更新参考哈希、坐标和平均提取耗时"""
+        with self._lock:
+            self._remember(fingerprint.byte_hash)
+            self._last_perceptual_hash = fingerprint.perceptual_hash
+            self._last_points = points
+            self._reuse_count = 0
+            self.full_extractions += 1
+            self._mean_extract_time += (extract_time - self._mean_extract_time) / self.full_extractions
+
+    def _remember(self, byte_hash):
+        self._seen_hashes[byte_hash] = True
+        self._seen_hashes.move_to_end(byte_hash)
+        while len(self._seen_hashes) > self.history_size:
+            self._seen_hashes.popitem(last=False)
+
+    def stats(self):
+        """返回节省工作量统计"""
+        with self._lock:
+            return {
+                'exact_duplicates': self.exact_duplicates,
+                'near_duplicates': self.near_duplicates,
+                'full_extractions': self.full_extractions,
+                'saved_seconds': self.saved_seconds,
+            }
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        stats = self.stats()
+        return (f"重复跳过: {stats['exact_duplicates']}, 近似复用: {stats['near_duplicates']}, "
+                f"完整提取: {stats['full_extractions']}, 估计节省: {stats['saved_seconds']:.3f}秒")
@@ -0,0 +1,174 @@
+"""
+最新帧优先调度模块
+单台相机的待处理帧先进入调度器，由专用线程按优先级处理：
+
+- 实时路径（高优先级）：每次取最新到达的帧，用实时跟踪器提取，尽快产出预警所需的最新坐标；
+- 历史路径（低优先级）：被越过的旧帧进入历史队列，仅在没有新帧时按拍摄先后顺序补处理，
+  用独立的历史跟踪器，并以时间线上紧邻的前一帧结果作为 pre_points 重新匹配，保证编号一致。
+
+帧的先后以到达顺序为准（相机按拍摄顺序逐张上传）。
+"""
+
+import bisect
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class _ScheduledFrame:
+    """一帧待处理图片：所属批次处理器、路径及到达顺序"""
+
+    __slots__ = ('order', 'handler', 'src_path', 'filename', 'arrival_time')
+
+    def __init__(self, order, handler, src_path, filename):
+        self.order = order
+        self.handler = handler
+        self.src_path = src_path
+        self.filename = filename
+        self.arrival_time = time.time()
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+class LatestFirstScheduler:
+    """
+    单台相机的最新帧优先调度器。
+
+    由 CameraMonitor 按相机创建，跨 TLS_* 批次传递给各 TimeFolderHandler；
+    处理在调度线程中串行进行，实时与历史跟踪器共用相机的帧缓冲池。
+    """
+
+    def __init__(self, camera_name, ex_pixel_coord_obj, wait_time=2, timeline_size=512, camera_registry=None,
+                 logger=None):
+        """
+        Args:
+            camera_name: 相机名称（用于日志与线程名）
+            ex_pixel_coord_obj: 相机的 ExPixelCoord（或多 ROI 的 RoiGroup），作为实时跟踪器；
+                按需创建相机时为 None，历史跟踪器每帧从 camera_registry 取得
+            wait_time: 帧到达后等待文件写完的时间（秒）
+            timeline_size: 保留的最近结果数量，用于为历史帧选取前一帧坐标
+        """
+        self.camera_name = camera_name
+        self.live_tracker = ex_pixel_coord_obj
+        self.history_tracker = ex_pixel_coord_obj.clone() if ex_pixel_coord_obj is not None else None
+        self.camera_registry = camera_registry
+        self.wait_time = wait_time
+        self.timeline_size = timeline_size
+        self.logger = logger or logging.getLogger('atli_monitor.frame_scheduler')
+
+        self._order = itertools.count()
+        self._arrived = []
+        self._history = []
+        self._timeline_orders = []
+        self._timeline_points = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.live_frames = 0
+        self.history_frames = 0
+        self.max_backlog = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"Scheduler-{self.camera_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """处理完当前帧后停止，未处理的帧留在上传目录中"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        remaining = self.backlog()
+        if remaining:
+            self.logger.warning(f"相机 {self.camera_name} 调度器停止，剩余未处理帧: {remaining}")
+
+    def submit(self, handler, src_path, filename):
+        """登记新到达的帧（在 watchdog 事件线程中调用，立即返回）"""
+        frame = _ScheduledFrame(next(self._order), handler, src_path, filename)
+        with self._cond:
+            self._arrived.append(frame)
+            self.max_backlog = max(self.max_backlog, len(self._arrived) + len(self._history))
+            self._cond.notify()
+
+    def backlog(self):
+        """等待处理的帧数（不含正在处理的帧）"""
+        with self._cond:
+            return len(self._arrived) + len(self._history)
+
+    def _next_frame(self):
+        """
+        取下一帧：有新到达的帧时取最新一帧走实时路径，其余转入历史队列；
+        否则按到达顺序取最早的历史帧。返回 (frame, is_history)，停止时返回 (None, False)。
+        """
+        with self._cond:
+            while self._running and not self._arrived and not self._history:
+                self._cond.wait()
+            if not self._running:
+                return None, False
+            if self._arrived:
+                frame = self._arrived.pop()
+                for older in self._arrived:
+                    heapq.heappush(self._history, older)
+                self._arrived = []
+                return frame, False
+            return heapq.heappop(self._history), True
+
+    def _seed_history_tracker(self, history_tracker, order):
+        """以时间线上紧邻该帧之前的结果作为历史跟踪器的 pre_points"""
+        index = bisect.bisect_left(self._timeline_orders, order)
+        if index > 0:
+            history_tracker.set_pre_points(self._timeline_points[index - 1])
+
+    def _process_history(self, frame):
+        if self.history_tracker is not None:
+            self._seed_history_tracker(self.history_tracker, frame.order)
+            return frame.handler.process_image(frame.src_path, frame.filename,
+                                               ex_pixel_coord_obj=self.history_tracker, history=True)
+        with self.camera_registry.acquire(self.camera_name, history=True) as history_tracker:
+            self._seed_history_tracker(history_tracker, frame.order)
+            return frame.handler.process_image(frame.src_path, frame.filename,
+                                               ex_pixel_coord_obj=history_tracker, history=True)
+
+    def _record(self, order, points):
+        index = bisect.bisect_left(self._timeline_orders, order)
+        self._timeline_orders.insert(index, order)
+        self._timeline_points.insert(index, points)
+        if len(self._timeline_orders) > self.timeline_size:
+            del self._timeline_orders[0]
+            del self._timeline_points[0]
+
+    def _run(self):
+        while True:
+            frame, is_history = self._next_frame()
+            if frame is None:
+                return
+
+            # 等待文件完全写入（自到达起算，积压帧通常早已写完）
+            remaining = self.wait_time - (time.time() - frame.arrival_time)
+            if remaining > 0:
+                time.sleep(remaining)
+
+            try:
+                if is_history:
+                    points = self._process_history(frame)
+                    self.history_frames += 1
+                else:
+                    points = frame.handler.process_image(frame.src_path, frame.filename)
+                    self.live_frames += 1
+            except Exception as e:
+                self.logger.error(f"相机 {self.camera_name} 调度处理异常: {frame.filename} - 错误: {e}")
+                continue
+
+            if points is not None:
+                self._record(frame.order, points)
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        return (f"实时处理: {self.live_frames}, 历史补处理: {self.history_frames}, "
+                f"当前积压: {self.backlog()}, 最大积压: {self.max_backlog}")
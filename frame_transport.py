@@ -0,0 +1,478 @@
+"""
+共享内存帧传输模块
+坐标提取中排序、匹配等 Python 代码持有 GIL，多相机同时上传时各处理线程实际上串行执行；
+提取改在工作进程中运行即可并行，但 24MB 的解码帧经 pickle 队列传递的开销会抵消大部分收益。
+
+本模块用 multiprocessing.shared_memory 建立固定数量、固定大小槽位的帧缓冲环：
+处理线程把已解码帧复制进空闲槽位，只向工作进程发送很小的描述（槽位、形状、类型）与跟踪状态，
+工作进程直接在共享内存上提取并返回坐标，结果回到主进程后槽位归还复用；
+全部槽位占用时处理线程阻塞等待（背压），不会无限堆积帧。
+
+工作进程意外退出或超时未返回时终止并按指数退避重启；连续失败超过 max_restarts 次后停用进程池，
+之后全部帧在本进程提取，避免启动即失败的工作进程无限重启。
+"""
+
+import collections
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import queue
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config_loader import ROI_THRESHOLD_KEYS
+
+FrameDescriptor = collections.namedtuple('FrameDescriptor', ['slot', 'shape', 'dtype'])
+
+# 工作进程重建跟踪器所需的参数（polygon_pts 之外）
+TRACKER_PARAMS = ROI_THRESHOLD_KEYS
+# 工作进程重启的退避时间（秒）：首次等待 RESTART_BACKOFF，之后每次加倍，最长 RESTART_BACKOFF_MAX
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 60.0
+
+
+class SharedFrameRing:
+    """
+    单块共享内存划分的帧槽位环。
+
+    创建方（主进程）负责分配与归还槽位；工作进程以 attach 按名称映射同一块内存，只读取描述指向的槽位。
+    """
+
+    def __init__(self, slots=4, slot_bytes=32 * 1024 * 1024, name=None):
+        """
+        Args:
+            slots: 槽位数（同时在途的帧数上限）
+            slot_bytes: 单个槽位字节数，需不小于最大解码帧
+            name: 已有共享内存的名称，None 时新建
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._free = queue.Queue()
+        if self.owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(slots, slot_bytes, name=name)
+
+    def fits(self, img):
+        return img.nbytes <= self.slot_bytes
+
+    def acquire(self, timeout=None):
+        """取得一个空闲槽位，全部占用时阻塞；超时返回 None"""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def busy(self):
+        """当前占用的槽位数"""
+        return self.slots - self._free.qsize()
+
+    def write(self, slot, img):
+        """把帧复制进槽位，返回传给工作进程的描述"""
+        descriptor = FrameDescriptor(slot, img.shape, img.dtype.str)
+        np.copyto(self.view(descriptor), img)
+        return descriptor
+
+    def view(self, descriptor):
+        """槽位内容的数组视图（不复制）；关闭前需释放全部视图"""
+        return np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype), buffer=self.shm.buf,
+                          offset=descriptor.slot * self.slot_bytes)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def tracker_spec(tracker):
+    """跟踪器的可序列化参数 {ROI 名称: 参数}，单 ROI 相机为 {None: 参数}"""
+    trackers = getattr(tracker, 'trackers', None) or {None: tracker}
+    return {
+        roi_name: dict({key: getattr(roi_tracker, key) for key in TRACKER_PARAMS},
+                       polygon_pts=np.asarray(roi_tracker.polygon_pts, dtype=np.int32))
+        for roi_name, roi_tracker in trackers.items()
+    }
+
+
+def tracker_state(tracker):
+    """跟踪器当前的 pre_points {ROI 名称: 坐标}，随每个请求发送，工作进程不保留跨帧状态"""
+    pre_points = tracker.pre_points
+    return pre_points if isinstance(pre_points, dict) else {None: pre_points}
+
+
+def build_tracker(spec):
+    """在工作进程中按参数重建跟踪器（多 ROI 为 RoiGroup）"""
+    from Ex_Pixel import ExPixelCoord, RoiGroup
+    from frame_buffers import FrameBufferPool
+    if list(spec) == [None]:
+        params = dict(spec[None])
+        return ExPixelCoord(params.pop('polygon_pts'), **params)
+    buffer_pool = FrameBufferPool()
+    trackers = {}
+    for roi_name, params in spec.items():
+        params = dict(params)
+        trackers[roi_name] = ExPixelCoord(params.pop('polygon_pts'), buffer_pool=buffer_pool.scoped(roi_name), **params)
+    return RoiGroup(trackers, buffer_pool)
+
+
+def _apply_state(tracker, state):
+    for roi_name, pre_points in state.items():
+        roi_tracker = tracker if roi_name is None else tracker.trackers[roi_name]
+        roi_tracker.pre_points = None if pre_points is None else np.array(pre_points, dtype=np.float32)
+
+
+def _worker_main(shm_name, slots, slot_bytes, specs, warm_up, conn):
+    """
+    工作进程：按相机重建跟踪器，循环处理 (请求编号, 帧描述, 相机, pre_points, 跟踪器参数)，None 表示退出。
+
+    跟踪器参数只在该进程第一次处理某相机时随请求发送；请求编号为 None 时表示释放该相机的跟踪器。
+    """
+    # Ctrl+C 由主进程处理，主进程停止时发送退出请求
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = SharedFrameRing.attach(shm_name, slots, slot_bytes)
+    try:
+        trackers = {key: build_tracker(spec) for key, spec in specs.items()}
+        if warm_up:
+            for tracker in trackers.values():
+                tracker.warm_up()
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            request_id, descriptor, key, state, spec = request
+            if request_id is None:
+                trackers.pop(key, None)
+                continue
+            try:
+                if spec is not None:
+                    trackers[key] = build_tracker(spec)
+                tracker = trackers[key]
+                _apply_state(tracker, state)
+                img = ring.view(descriptor)
+                try:
+                    result = tracker.mark_pixel_coords_ex(img)
+                finally:
+                    del img
+                conn.send((request_id, result, None))
+            except Exception:
+                conn.send((request_id, None, traceback.format_exc()))
+    finally:
+        ring.close()
+
+
+class WorkerLost(Exception):
+    """处理请求的工作进程在返回结果前退出"""
+
+
+class _Worker:
+    """主进程中一个工作进程的句柄：进程、专用管道与在途请求"""
+
+    __slots__ = ('process', 'conn', 'send_lock', 'inflight', 'known')
+
+    def __init__(self, process, conn, known):
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.inflight = set()
+        # 工作进程中已有跟踪器的相机，其余相机的参数随第一个请求发送
+        self.known = set(known)
+
+
+class ProcessExtractionPool:
+    """
+    坐标提取工作进程池，全部相机共用。
+
+    处理线程调用 extract 后阻塞到结果返回（同一相机的帧仍按顺序提取），不同相机的帧在多个进程中并行；
+    跟踪状态（pre_points）随请求发送、随结果写回主进程的跟踪器，历史跟踪器与实时跟踪器可共用同一进程池。
+    每个工作进程使用专用管道，请求发给在途请求最少的进程；进程意外退出或超时时其在途帧退回本进程提取，
+    该进程按指数退避重启，连续失败超过 max_restarts 次后停用进程池。
+    """
+
+    def __init__(self, trackers, workers=2, slots=4, slot_mb=32, timeout=60, max_restarts=5, warm_up=True,
+                 logger=None):
+        """
+        Args:
+            trackers: {相机名称: ExPixelCoord 或 RoiGroup}，工作进程启动时据此重建各相机的跟踪器；
+                未列出的相机（按需创建的相机）在第一次提取时把参数随请求发给工作进程
+            workers: 工作进程数
+            slots: 共享内存槽位数（同时在途的帧数上限）
+            slot_mb: 单个槽位大小（MB），超过的帧退回本进程提取
+            timeout: 单帧等待结果的上限（秒），超时后终止该工作进程并退回本进程提取
+            max_restarts: 工作进程连续失败（期间没有任何进程返回结果）的重启次数上限，超过后停用进程池
+            warm_up: 工作进程启动时预热各相机的查找表与缓冲区
+        """
+        self.specs = {key: tracker_spec(tracker) for key, tracker in trackers.items()}
+        self.workers = workers
+        self.slots = slots
+        self.slot_bytes = int(slot_mb * 1024 * 1024)
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.warm_up = warm_up
+        self.logger = logger or logging.getLogger('atli_monitor.frame_transport')
+
+        self.ring = None
+        self._context = None
+        self._workers = []
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._collector = None
+        # 等待重启的工作进程 {序号: 重启时间}；连续失败次数，任一进程返回结果时清零
+        self._respawn_at = {}
+        self._failures = 0
+        self.disabled = False
+
+        self.frames = 0
+        self.fallbacks = 0
+        self.restarts = 0
+        self.wait_seconds = 0.0
+        self.copy_seconds = 0.0
+        self.roundtrip_seconds = 0.0
+        self._oversize_logged = False
+
+    def start(self):
+        # 监控进程中已有写出、查询等后台线程，fork 可能复制到被持有的锁，工作进程使用 spawn 启动
+        self._context = multiprocessing.get_context('spawn')
+        self.ring = SharedFrameRing(self.slots, self.slot_bytes)
+        self._workers = [self._spawn(index) for index in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, name="ExtractionResults", daemon=True)
+        self._collector.start()
+        self.logger.info(f"提取进程池已启动 - 进程: {self.workers}, 共享内存槽位: {self.slots} x "
+                         f"{self.slot_bytes / 1024 / 1024:.0f}MB")
+
+    def _spawn(self, index):
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.ring.name, self.slots, self.slot_bytes, self.specs, self.warm_up, child_conn),
+            name=f"ExtractionWorker-{index}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, conn, self.specs)
+
+    def extract(self, key, tracker, img):
+        """
+        在工作进程中提取一帧，返回值与 tracker.mark_pixel_coords_ex(img) 相同，并同样更新 tracker 的 pre_points。
+
+        Args:
+            key: 相机名称
+            tracker: 主进程中的跟踪器（实时或历史），提供并接收跟踪状态
+            img: 已解码的帧（复制进共享内存，调用方可继续使用）
+        """
+        if not self.ring.fits(img):
+            if not self._oversize_logged:
+                self._oversize_logged = True
+                self.logger.warning(f"帧大小 {img.nbytes / 1024 / 1024:.1f}MB 超过共享内存槽位 "
+                                    f"{self.slot_bytes / 1024 / 1024:.0f}MB，改在本进程提取")
+            return self._extract_locally(tracker, img)
+        if self.disabled:
+            return self._extract_locally(tracker, img)
+
+        started = time.perf_counter()
+        slot = self.ring.acquire()
+        acquired = time.perf_counter()
+        descriptor = self.ring.write(slot, img)
+        copied = time.perf_counter()
+
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            live_workers = [candidate for candidate in self._workers if candidate is not None]
+            if not live_workers:
+                # 全部工作进程都在等待重启
+                self.ring.release(slot)
+                worker = None
+            else:
+                worker = min(live_workers, key=lambda candidate: len(candidate.inflight))
+                worker.inflight.add(request_id)
+                self._pending[request_id] = (future, slot, worker)
+        if worker is None:
+            return self._extract_locally(tracker, img)
+        try:
+            with worker.send_lock:
+                spec = None if key in worker.known else tracker_spec(tracker)
+                worker.conn.send((request_id, descriptor, key, tracker_state(tracker), spec))
+                worker.known.add(key)
+            result, error = future.result(timeout=self.timeout)
+        except (OSError, WorkerLost, FutureTimeoutError) as e:
+            if isinstance(e, FutureTimeoutError):
+                # 卡住的进程可能仍在读取槽位：先终止再归还槽位，收集线程随后按意外退出重启该进程
+                worker.process.terminate()
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    worker.process.join()
+            self._finish(request_id)
+            reason = f"{self.timeout}秒 未返回结果" if isinstance(e, FutureTimeoutError) else f"不可用（{e}）"
+            self.logger.error(f"提取进程{reason}，改在本进程提取: {key}")
+            return self._extract_locally(tracker, img)
+        if error is not None:
+            raise RuntimeError(f"提取进程异常: {error}")
+
+        if result is not None:
+            if isinstance(result, dict):
+                tracker.set_pre_points(result)
+            else:
+                tracker.pre_points = result
+        with self._lock:
+            self.frames += 1
+            self.wait_seconds += acquired - started
+            self.copy_seconds += copied - acquired
+            self.roundtrip_seconds += time.perf_counter() - copied
+        return result
+
+    def _extract_locally(self, tracker, img):
+        with self._lock:
+            self.fallbacks += 1
+        return tracker.mark_pixel_coords_ex(img)
+
+    def _finish(self, request_id):
+        """结束一个请求并归还槽位，返回其 Future（已结束时返回 None）"""
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+            if pending is None:
+                return None
+            future, slot, worker = pending
+            worker.inflight.discard(request_id)
+            self.ring.release(slot)
+        return future
+
+    def _collect(self):
+        """收集线程：把结果交给等待的处理线程并归还槽位，同时检查退出的工作进程并按退避时间重启"""
+        while not self._stop_event.is_set():
+            workers = {worker.conn: worker for worker in self._workers if worker is not None}
+            if workers:
+                ready = multiprocessing.connection.wait(list(workers), timeout=1.0)
+            else:
+                ready = []
+                self._stop_event.wait(1.0)
+            for conn in ready:
+                try:
+                    request_id, result, error = conn.recv()
+                except (EOFError, OSError):
+                    self._lost(workers[conn])
+                    continue
+                self._failures = 0
+                future = self._finish(request_id)
+                if future is not None:
+                    future.set_result((result, error))
+            for worker in list(self._workers):
+                if worker is not None and not worker.process.is_alive():
+                    self._lost(worker)
+            self._respawn_due()
+
+    def _lost(self, worker):
+        """工作进程退出：在途请求立即退回本进程提取，按退避时间安排重启，连续失败过多时停用进程池"""
+        if self._stop_event.is_set() or worker not in self._workers:
+            return
+        worker.process.join(timeout=1)
+        index = self._workers.index(worker)
+        with self._lock:
+            self._workers[index] = None
+        for request_id in list(worker.inflight):
+            future = self._finish(request_id)
+            if future is not None:
+                future.set_exception(WorkerLost(worker.process.name))
+        worker.conn.close()
+
+        self._failures += 1
+        if self._failures > self.max_restarts:
+            if not self.disabled:
+                self.disabled = True
+                self.logger.error(f"提取进程连续失败 {self._failures} 次（退出码 {worker.process.exitcode}），"
+                                  f"停用进程池，之后全部帧在本进程提取")
+            return
+        delay = min(RESTART_BACKOFF * 2 ** (self._failures - 1), RESTART_BACKOFF_MAX)
+        self._respawn_at[index] = time.time() + delay
+        self.logger.error(f"提取进程意外退出（退出码 {worker.process.exitcode}），{delay:.0f}秒后重新启动: "
+                          f"{worker.process.name}（连续失败 {self._failures}/{self.max_restarts}）")
+
+    def _respawn_due(self):
+        """启动已到退避时间的替代进程"""
+        now = time.time()
+        for index, respawn_at in list(self._respawn_at.items()):
+            if now < respawn_at:
+                continue
+            del self._respawn_at[index]
+            if self.disabled:
+                continue
+            replacement = self._spawn(index)
+            with self._lock:
+                self._workers[index] = replacement
+                self.restarts += 1
+
+    def forget(self, key):
+        """通知各工作进程释放相机的跟踪器（相机被回收时调用，该相机不应有在途请求）"""
+        self.specs.pop(key, None)
+        with self._lock:
+            workers = [worker for worker in self._workers if worker is not None]
+        for worker in workers:
+            with worker.send_lock:
+                if key not in worker.known:
+                    continue
+                worker.known.discard(key)
+                try:
+                    worker.conn.send((None, None, key, None, None))
+                except OSError:
+                    pass
+
+    def busy_slots(self):
+        return self.ring.busy() if self.ring is not None else 0
+
+    def stop(self):
+        """通知工作进程退出并释放共享内存（处理线程应已停止）"""
+        if self.ring is None:
+            return
+        self._stop_event.set()
+        self._collector.join()
+        self._workers = [worker for worker in self._workers if worker is not None]
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self.ring.close()
+        self.ring = None
+        self.logger.info(f"提取进程池已停止 - {self.format_stats()}")
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            frames = self.frames or 1
+            return (f"进程提取: {self.frames}帧, 本进程提取: {self.fallbacks}帧, 进程重启: {self.restarts}"
+                    f"{'（已停用）' if self.disabled else ''}, "
+                    f"平均等待槽位: {self.wait_seconds / frames * 1000:.2f}ms, "
+                    f"平均复制: {self.copy_seconds / frames * 1000:.2f}ms, "
+                    f"平均往返: {self.roundtrip_seconds / frames * 1000:.1f}ms")
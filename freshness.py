@@ -0,0 +1,280 @@
+"""
+数据新鲜度与处理延迟模块
+按相机跟踪最后一次上传、最后一次成功提取、EXIF 拍摄时间到结果产出的延迟和帧排队时间，
+后台线程定期检查并在以下情况记录警告（恢复时记录解除）：
+
+- 超过预期上传间隔未收到新图片（相机停止上传或网络中断）；
+- 有新图片到达但超过预期间隔没有成功提取（处理停滞）；
+- EXIF 到结果的延迟超过上限（处理跟不上）；
+- 当前批次目录中有超过宽限时间、却从未收到文件事件的图片（TLS_* 目录的 Observer 停止工作）。
+
+各项指标可通过 snapshot 取得，本地查询接口启用时以 GET /health 提供。
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from config_loader import IMAGE_EXTENSIONS
+
+# 记忆的最近收到事件的文件名数量（用于识别未收到事件的图片）
+SEEN_HISTORY = 1024
+# EXIF 延迟的 EWMA 平滑系数
+LAG_ALPHA = 0.2
+
+WARNING_NAMES = {
+    'upload': '未收到上传',
+    'processing': '处理停滞',
+    'lag': '处理延迟过高',
+    'missed': '批次目录有图片未收到文件事件',
+}
+
+
+def exif_time(timestamp):
+    """EXIF 时间戳（YYYYmmddHHMMSS）转换为秒，无法解析时返回 None"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.strptime(timestamp, '%Y%m%d%H%M%S').timestamp()
+    except ValueError:
+        return None
+
+
+def _format_time(value):
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S') if value else '无'
+
+
+class CameraFreshness:
+    """单台相机的新鲜度状态"""
+
+    __slots__ = ('expected_interval', 'last_upload', 'last_event', 'last_success', 'exif_lag', 'exif_lag_ewma',
+                 'exif_lag_max', 'queue_age', 'queue_age_max', 'frames', 'missed', 'seen', 'preexisting',
+                 'warnings', 'folder_getter')
+
+    def __init__(self, expected_interval):
+        self.expected_interval = expected_interval
+        self.last_upload = None
+        self.last_event = None
+        self.last_success = None
+        self.exif_lag = None
+        self.exif_lag_ewma = None
+        self.exif_lag_max = 0.0
+        self.queue_age = None
+        self.queue_age_max = 0.0
+        self.frames = 0
+        self.missed = 0
+        self.seen = collections.OrderedDict()
+        self.preexisting = frozenset()
+        self.warnings = set()
+        self.folder_getter = None
+
+
+class FreshnessMonitor:
+    """
+    全部相机的新鲜度跟踪与停滞告警。
+
+    由 CameraMonitor 创建并传给各 CameraHandler / TimeFolderHandler：
+    文件事件到达时调用 record_upload，帧处理完成时调用 record_result。
+    """
+
+    def __init__(self, cameras, expected_interval=600, camera_intervals=None, max_lag=0, missed_grace=60,
+                 check_interval=30, logger=None):
+        """
+        Args:
+            cameras: 相机名称列表
+            expected_interval: 预期最长上传间隔（秒），超过即告警
+            camera_intervals: {相机名称: 预期上传间隔}，按相机覆盖
+            max_lag: EXIF 拍摄时间到结果产出的延迟上限（秒），0 不检查
+            missed_grace: 批次目录中的图片超过该时间（秒）仍未收到事件、且相机空闲时视为漏事件
+            check_interval: 检查间隔（秒）
+        """
+        camera_intervals = camera_intervals or {}
+        self.cameras = {camera: CameraFreshness(camera_intervals.get(camera, expected_interval))
+                        for camera in cameras}
+        self.max_lag = max_lag
+        self.missed_grace = missed_grace
+        self.check_interval = check_interval
+        self.logger = logger or logging.getLogger('atli_monitor.freshness')
+        self.started_time = time.time()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def watch_folder(self, camera_name, folder_getter):
+        """登记取得相机当前批次目录的函数，用于检查未收到事件的图片"""
+        self.cameras[camera_name].folder_getter = folder_getter
+
+    def seed_folder(self, camera_name, names):
+        """
+        切换到新批次目录时调用，登记目录中已有的图片文件名。
+        这些图片在目录监控开始前写入，不会收到文件事件，不计为漏事件。
+        """
+        with self._lock:
+            state = self.cameras.get(camera_name)
+            if state is not None:
+                state.preexisting = frozenset(names)
+
+    def record_upload(self, camera_name, path):
+        """文件事件到达时调用；上传时间取文件修改时间（积压时事件分发晚于上传）"""
+        now = time.time()
+        try:
+            upload_time = min(os.path.getmtime(path), now)
+        except OSError:
+            upload_time = now
+        with self._lock:
+            state = self.cameras.get(camera_name)
+            if state is None:
+                return
+            state.last_upload = max(state.last_upload or 0.0, upload_time)
+            state.last_event = now
+            state.seen[os.path.basename(path)] = None
+            if len(state.seen) > SEEN_HISTORY:
+                state.seen.popitem(last=False)
+
+    def record_result(self, camera_name, timestamp, queue_age=None, history=False):
+        """
+        一帧处理成功时调用。
+
+        Args:
+            timestamp: 帧 EXIF 时间戳（YYYYmmddHHMMSS），用于计算拍摄到结果的延迟
+            queue_age: 文件写完到开始处理的等待时间（秒）
+            history: 历史补处理帧只更新最后成功时间，不计入延迟
+        """
+        now = time.time()
+        captured = exif_time(timestamp)
+        with self._lock:
+            state = self.cameras.get(camera_name)
+            if state is None:
+                return
+            state.last_success = now
+            state.frames += 1
+            if history:
+                return
+            if captured is not None:
+                lag = now - captured
+                state.exif_lag = lag
+                state.exif_lag_ewma = lag if state.exif_lag_ewma is None else \
+                    state.exif_lag_ewma + LAG_ALPHA * (lag - state.exif_lag_ewma)
+                state.exif_lag_max = max(state.exif_lag_max, lag)
+            if queue_age is not None:
+                state.queue_age = queue_age
+                state.queue_age_max = max(state.queue_age_max, queue_age)
+
+    def start(self):
+        self.started_time = time.time()
+        self._thread = threading.Thread(target=self._run, name="FreshnessMonitor", daemon=True)
+        self._thread.start()
+        self.logger.info(f"新鲜度监控已启动 - 检查间隔: {self.check_interval}秒")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"新鲜度检查失败: {e}")
+
+    def _count_missed(self, state, now):
+        """
+        当前批次目录中超过宽限时间且从未收到事件的图片数。
+        批次目录切换时已有的图片、以及监控启动前写入的图片不计入。
+        """
+        folder = state.folder_getter() if state.folder_getter else None
+        if not folder:
+            return 0
+        missed = 0
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if (entry.name in state.seen or entry.name in state.preexisting
+                            or not entry.name.lower().endswith(IMAGE_EXTENSIONS)):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                        if mtime >= self.started_time and now - mtime > self.missed_grace:
+                            missed += 1
+                    except OSError:
+                        continue
+        except OSError:
+            return 0
+        return missed
+
+    def check(self, now=None):
+        """检查全部相机，新出现的告警记录 WARNING，解除的记录 INFO；返回当前告警 {相机: [类型]}"""
+        now = now or time.time()
+        active = {}
+        for camera_name, state in self.cameras.items():
+            with self._lock:
+                last_upload = state.last_upload or self.started_time
+                last_success = state.last_success or self.started_time
+                last_activity = max(state.last_event or 0.0, last_success)
+                seen_any = state.last_upload is not None
+                exif_lag = state.exif_lag_ewma
+
+            # 相机空闲（既没有事件也没有处理完成）时才扫描目录，积压中的事件尚未分发不算漏事件
+            missed = self._count_missed(state, now) if now - last_activity > self.missed_grace else 0
+            conditions = {
+                'upload': (now - last_upload > state.expected_interval,
+                           f"最后上传: {_format_time(state.last_upload)}，已超过预期间隔 {state.expected_interval}秒"),
+                'processing': (seen_any and last_upload > last_success
+                               and now - last_success > state.expected_interval,
+                               f"最后成功提取: {_format_time(state.last_success)}，"
+                               f"最后上传: {_format_time(state.last_upload)}"),
+                'lag': (bool(self.max_lag) and exif_lag is not None and exif_lag > self.max_lag,
+                        f"拍摄到结果延迟 {exif_lag or 0:.1f}秒，上限 {self.max_lag}秒"),
+                'missed': (missed > 0, f"{missed}张图片超过 {self.missed_grace}秒 未收到文件事件，"
+                                       f"请检查批次目录监控"),
+            }
+            with self._lock:
+                state.missed = missed
+                for kind, (firing, detail) in conditions.items():
+                    if firing and kind not in state.warnings:
+                        state.warnings.add(kind)
+                        self.logger.warning(f"相机 {camera_name} {WARNING_NAMES[kind]} - {detail}")
+                    elif not firing and kind in state.warnings:
+                        state.warnings.discard(kind)
+                        self.logger.info(f"相机 {camera_name} {WARNING_NAMES[kind]}已解除")
+                if state.warnings:
+                    active[camera_name] = sorted(state.warnings)
+        return active
+
+    def snapshot(self):
+        """各相机当前指标（时间为秒级时间戳，年龄与延迟单位为秒）"""
+        now = time.time()
+        with self._lock:
+            return {
+                camera_name: {
+                    'expected_interval': state.expected_interval,
+                    'last_upload': state.last_upload,
+                    'last_success': state.last_success,
+                    'upload_age': now - state.last_upload if state.last_upload else None,
+                    'success_age': now - state.last_success if state.last_success else None,
+                    'exif_lag': state.exif_lag,
+                    'exif_lag_ewma': state.exif_lag_ewma,
+                    'exif_lag_max': state.exif_lag_max,
+                    'queue_age': state.queue_age,
+                    'queue_age_max': state.queue_age_max,
+                    'frames': state.frames,
+                    'missed': state.missed,
+                    'warnings': sorted(state.warnings),
+                }
+                for camera_name, state in self.cameras.items()
+            }
+
+    def format_stats(self, camera_name):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            state = self.cameras[camera_name]
+            lag = f"{state.exif_lag_ewma:.1f}秒" if state.exif_lag_ewma is not None else "-"
+            return (f"帧数: {state.frames}, 最后上传: {_format_time(state.last_upload)}, "
+                    f"最后成功: {_format_time(state.last_success)}, 拍摄到结果延迟: {lag} "
+                    f"(最大 {state.exif_lag_max:.1f}秒), 最大排队: {state.queue_age_max:.1f}秒")
@@ -0,0 +1,140 @@
+"""
+负载降级模块
+根据单台相机的积压帧数和帧等待时间逐级放弃可选工作，追上进度后逐级恢复：
+
+    0 正常:      全部处理
+    1 跳过标注:  不生成标注图片
+    2 跳过备份:  不再复制备份图片，原始图片直接重命名进备份目录（跨文件系统时仍复制）
+    3 精简日志:  逐帧的过程日志降为 DEBUG，仅保留耗时与结果日志
+    4 仅最新帧:  存在更新的待处理帧时跳过当前帧（原始图片移入备份目录）
+
+每次级别变化都记录日志并计数。
+"""
+
+import logging
+import threading
+
+LEVEL_NORMAL = 0
+LEVEL_SKIP_ANNOTATION = 1
+LEVEL_SKIP_BACKUP = 2
+LEVEL_QUIET_LOGGING = 3
+LEVEL_LATEST_ONLY = 4
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: '正常',
+    LEVEL_SKIP_ANNOTATION: '跳过标注',
+    LEVEL_SKIP_BACKUP: '跳过备份',
+    LEVEL_QUIET_LOGGING: '精简日志',
+    LEVEL_LATEST_ONLY: '仅最新帧',
+}
+
+
+class LoadShedder:
+    """
+    单台相机的降级状态机。
+
+    由 CameraMonitor 按相机创建，跨 TLS_* 批次传递给各 TimeFolderHandler（与 FrameDeduplicator 相同）。
+    """
+
+    def __init__(self, camera_name, queue_depth=(3, 6, 10, 20), frame_age=(30, 60, 120, 300),
+                 recover_ratio=0.5, logger=None):
+        """
+        Args:
+            camera_name: 相机名称（用于日志）
+            queue_depth: 升到第 1~4 级的积压帧数阈值
+            frame_age: 升到第 1~4 级的帧等待时间阈值（秒，自文件写完起算）
+            recover_ratio: 两项指标均低于当前级阈值的该比例时降一级（回滞，避免频繁抖动）
+        """
+        if len(queue_depth) != LEVEL_LATEST_ONLY or len(frame_age) != LEVEL_LATEST_ONLY:
+            raise ValueError(f"queue_depth 与 frame_age 需各提供 {LEVEL_LATEST_ONLY} 级阈值")
+        self.camera_name = camera_name
+        self.queue_depth = tuple(queue_depth)
+        self.frame_age = tuple(frame_age)
+        self.recover_ratio = recover_ratio
+        self.logger = logger or logging.getLogger('atli_monitor.load_shedding')
+
+        self.level = LEVEL_NORMAL
+        self.escalations = 0
+        self.recoveries = 0
+        self.skipped_annotations = 0
+        self.skipped_backups = 0
+        self.quiet_frames = 0
+        self.skipped_frames = 0
+        self._lock = threading.Lock()
+
+    def _target_level(self, queue_depth, frame_age):
+        level = LEVEL_NORMAL
+        for i in range(LEVEL_LATEST_ONLY):
+            if queue_depth >= self.queue_depth[i] or frame_age >= self.frame_age[i]:
+                level = i + 1
+        return level
+
+    def observe(self, queue_depth, frame_age):
+        """
+        每帧处理前调用，按当前积压帧数与帧等待时间更新并返回降级级别。
+
+        超过阈值时直接升到对应级别；恢复时每帧最多降一级。
+        """
+        with self._lock:
+            previous = self.level
+            target = self._target_level(queue_depth, frame_age)
+            if target > self.level:
+                self.level = target
+                self.escalations += 1
+            elif self.level > LEVEL_NORMAL:
+                index = self.level - 1
+                if (queue_depth < self.queue_depth[index] * self.recover_ratio
+                        and frame_age < self.frame_age[index] * self.recover_ratio):
+                    self.level -= 1
+                    self.recoveries += 1
+            level = self.level
+
+        if level > previous:
+            self.logger.warning(f"相机 {self.camera_name} 处理积压，降级: {LEVEL_NAMES[previous]} -> "
+                                f"{LEVEL_NAMES[level]} (积压: {queue_depth}帧, 等待: {frame_age:.1f}秒)")
+        elif level < previous:
+            self.logger.info(f"相机 {self.camera_name} 积压缓解，恢复: {LEVEL_NAMES[previous]} -> "
+                             f"{LEVEL_NAMES[level]} (积压: {queue_depth}帧, 等待: {frame_age:.1f}秒)")
+        return level
+
+    @property
+    def annotate(self):
+        return self.level < LEVEL_SKIP_ANNOTATION
+
+    @property
+    def backup(self):
+        return self.level < LEVEL_SKIP_BACKUP
+
+    @property
+    def verbose(self):
+        return self.level < LEVEL_QUIET_LOGGING
+
+    @property
+    def latest_only(self):
+        return self.level >= LEVEL_LATEST_ONLY
+
+    def count(self, counter):
+        """累加放弃的工作量：skipped_annotations / skipped_backups / quiet_frames / skipped_frames"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        """返回降级统计"""
+        with self._lock:
+            return {
+                'level': self.level,
+                'escalations': self.escalations,
+                'recoveries': self.recoveries,
+                'skipped_annotations': self.skipped_annotations,
+                'skipped_backups': self.skipped_backups,
+                'quiet_frames': self.quiet_frames,
+                'skipped_frames': self.skipped_frames,
+            }
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        stats = self.stats()
+        return (f"当前级别: {LEVEL_NAMES[stats['level']]}, 降级: {stats['escalations']}次, "
+                f"恢复: {stats['recoveries']}次, 跳过标注: {stats['skipped_annotations']}, "
+                f"跳过备份: {stats['skipped_backups']}, 精简日志: {stats['quiet_frames']}, "
+                f"跳过帧: {stats['skipped_frames']}")
@@ -0,0 +1,429 @@
+"""
+日志统计报告工具
+流式解析 atli_monitor 日志（支持 .gz 轮转文件），不把日志整体读入内存，
+按相机统计提取、像素坐标保存、备份、标注及端到端耗时分位数、帧率、失败次数和按天趋势。
+
+用法:
+    python log_report.py                                   # 默认分析 logs/atli_monitor_*.log 与 /var/log/atli_monitor/
+    python log_report.py /var/log/atli_monitor --since 2025-12-01 --csv daily.csv
+"""
+
+import argparse
+import csv
+import glob
+import gzip
+import math
+import os
+import re
+import time
+from collections import defaultdict
+
+DEFAULT_LOG_PATTERNS = (
+    'logs/atli_monitor_*.log',
+    '/var/log/atli_monitor/*.log*',
+)
+
+STAGES = ('extract', 'save', 'backup', 'annotate', 'end_to_end')
+STAGE_NAMES = {
+    'extract': '坐标提取',
+    'save': '坐标保存',
+    'backup': '图片备份',
+    'annotate': '标注图片',
+    'end_to_end': '端到端',
+}
+FAILURES = ('read_failed', 'extract_failed', 'exception', 'write_failed')
+FAILURE_NAMES = {
+    'read_failed': '读取失败',
+    'extract_failed': '提取失败',
+    'exception': '处理异常',
+    'write_failed': '写入失败',
+}
+
+# 非相机的日志记录器名称后缀；处理相关记录器名称形如 atli_monitor.camera_handler.camera1
+NON_CAMERA_LOGGERS = {'atli_monitor', 'camera_monitor', 'camera_handler', 'time_folder_handler',
+                      'output_writer', 'retention', 'load_shedding'}
+UNKNOWN_CAMERA = '未知'
+
+# 帧开始后超过该时长（日志时间，秒）仍未收齐输出提交记录时，按已有记录结算
+FRAME_TIMEOUT = 600
+
+_DURATION_RE = re.compile(r'耗时: ([\d.]+)秒')
+_COMMIT_RE = re.compile(r'^(像素坐标文件保存完成|备份图片生成完成|标注图片生成完成)(?:: (.+?))?，耗时: ([\d.]+)秒')
+_COMMIT_STAGES = {
+    '像素坐标文件保存完成': 'save',
+    '备份图片生成完成': 'backup',
+    '标注图片生成完成': 'annotate',
+}
+
+
+class LatencyHistogram:
+    """
+    对数分桶直方图：内存占用与样本数无关，分位数相对误差约为桶宽的一半（约 2.5%）。
+    """
+
+    MIN_VALUE = 1e-4
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value):
+        index = 0 if value <= self.MIN_VALUE else int(math.log(value / self.MIN_VALUE, self.GROWTH)) + 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """返回分位数估计值（桶内几何中点，截断到实际最小/最大值之间）"""
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                if index == 0:
+                    estimate = self.MIN_VALUE
+                else:
+                    estimate = self.MIN_VALUE * self.GROWTH ** (index - 0.5)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+
+class CameraStats:
+    """单台相机（或单台相机单日）的累计统计"""
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.failures = defaultdict(int)
+        self.frames = 0
+        self.duplicates = 0
+        self.reused = 0
+        self.skipped = 0
+        self.first_time = None
+        self.last_time = None
+
+    def touch(self, timestamp):
+        if self.first_time is None or timestamp < self.first_time:
+            self.first_time = timestamp
+        if self.last_time is None or timestamp > self.last_time:
+            self.last_time = timestamp
+
+    def frame_rate(self):
+        """平均处理帧率（帧/分钟）"""
+        if not self.frames or self.first_time is None or self.last_time <= self.first_time:
+            return math.nan
+        return self.frames * 60.0 / (self.last_time - self.first_time)
+
+
+class _Frame:
+    """一帧图片从开始处理到各输出提交完成的日志记录"""
+
+    __slots__ = ('camera', 'start', 'day', 'stages', 'last_time', 'submitted')
+
+    def __init__(self, camera, start, day):
+        self.camera = camera
+        self.start = start
+        self.day = day
+        self.stages = {}
+        self.last_time = start
+        self.submitted = False
+
+
+def camera_from_logger(name):
+    """由日志记录器名称推断相机名，旧日志（无相机后缀）返回 None"""
+    suffix = name.rsplit('.', 1)[-1]
+    return None if suffix in NON_CAMERA_LOGGERS else suffix
+
+
+def camera_from_path(path):
+    """由输出路径 <processed>/<相机>/<批次>/<pixel|img|draw_img>/<文件> 推断相机名"""
+    parts = re.split(r'[\\/]+', path.strip())
+    return parts[-4] if len(parts) >= 4 else None
+
+
+def open_log(path):
+    """按文本流打开日志文件，.gz 轮转文件直接解压读取"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def collect_log_files(paths):
+    """展开文件、目录与通配符，按修改时间从旧到新排序（轮转文件在前）"""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = glob.glob(os.path.join(path, '*.log*'))
+        else:
+            candidates = glob.glob(path)
+        files.update(f for f in candidates if os.path.isfile(f))
+    return sorted(files, key=os.path.getmtime)
+
+
+class LogReport:
+    """
+    逐行消费日志并累计统计。
+
+    同一相机的图片串行处理，提取耗时等不带文件名的记录归属到该相机最近开始处理的图片；
+    输出提交记录（异步写出，可能与下一帧交错）带文件名时按文件名归属。
+    """
+
+    def __init__(self, since=None, until=None, cameras=None):
+        self.since = since
+        self.until = until
+        self.cameras = set(cameras) if cameras else None
+
+        self.totals = defaultdict(CameraStats)
+        self.daily = defaultdict(CameraStats)
+        self.lines = 0
+        self.parsed_lines = 0
+
+        self._frames = {}
+        self._current = {}
+        self._day_epochs = {}
+        self._latest_time = 0.0
+
+    def _parse_time(self, asctime):
+        """解析 'YYYY-MM-DD HH:MM:SS,mmm'，按日期缓存零点时间戳，避免逐行 strptime"""
+        day = asctime[:10]
+        midnight = self._day_epochs.get(day)
+        if midnight is None:
+            midnight = time.mktime(time.strptime(day, '%Y-%m-%d'))
+            self._day_epochs[day] = midnight
+        clock = asctime[11:19]
+        seconds = int(clock[0:2]) * 3600 + int(clock[3:5]) * 60 + int(clock[6:8])
+        millis = int(asctime[20:23]) if len(asctime) >= 23 else 0
+        return day, midnight + seconds + millis / 1000.0
+
+    def feed_file(self, path):
+        with open_log(path) as f:
+            for line in f:
+                self.feed_line(line)
+
+    def feed_line(self, line):
+        self.lines += 1
+        parts = line.rstrip('\n').split(' - ', 3)
+        if len(parts) != 4 or len(parts[0]) < 19 or not parts[0][:4].isdigit():
+            return  # 异常堆栈续行、print 输出等
+        asctime, logger_name, level, message = parts
+        try:
+            day, timestamp = self._parse_time(asctime)
+        except ValueError:
+            return
+        if (self.since and day < self.since) or (self.until and day > self.until):
+            return
+        self.parsed_lines += 1
+        self._latest_time = max(self._latest_time, timestamp)
+        self._dispatch(logger_name, level, message, day, timestamp)
+
+        if self.parsed_lines % 10000 == 0:
+            self._expire(self._latest_time - FRAME_TIMEOUT)
+
+    def _dispatch(self, logger_name, level, message, day, timestamp):
+        if message.startswith('开始处理图片: '):
+            filename = message[len('开始处理图片: '):].strip()
+            key = (logger_name, filename)
+            if key in self._frames:
+                self._finish(key)
+            self._frames[key] = _Frame(camera_from_logger(logger_name), timestamp, day)
+            self._current[logger_name] = key
+            return
+
+        commit = _COMMIT_RE.match(message)
+        if commit:
+            stage = _COMMIT_STAGES[commit.group(1)]
+            key = (logger_name, commit.group(2)) if commit.group(2) else self._current.get(logger_name)
+            frame = self._frames.get(key)
+            if frame is not None:
+                frame.stages[stage] = float(commit.group(3))
+                frame.last_time = max(frame.last_time, timestamp)
+                self._maybe_finish(key, frame)
+            return
+
+        frame_key = self._current.get(logger_name)
+        frame = self._frames.get(frame_key)
+
+        if message.startswith('像素坐标提取成功'):
+            duration = _DURATION_RE.search(message)
+            if frame is not None and duration:
+                frame.stages['extract'] = float(duration.group(1))
+        elif message.startswith('保存像素坐标文件: '):
+            if frame is not None and frame.camera is None:
+                frame.camera = camera_from_path(message[len('保存像素坐标文件: '):].rsplit(' - ', 1)[0])
+        elif message.startswith('图片处理完成: '):
+            if frame is not None:
+                frame.submitted = True
+                frame.last_time = max(frame.last_time, timestamp)
+                self._maybe_finish(frame_key, frame)
+        elif message.startswith('与上一帧近似，复用像素坐标'):
+            self._count(frame.camera if frame else camera_from_logger(logger_name), day, timestamp, 'reused')
+        elif message.startswith('处理积压，跳过帧'):
+            self._count(camera_from_logger(logger_name), day, timestamp, 'skipped')
+        elif message.startswith('重复上传，跳过处理并删除'):
+            self._count(camera_from_logger(logger_name), day, timestamp, 'duplicates')
+            self._frames.pop(frame_key, None)
+        elif message.startswith('像素坐标提取失败'):
+            self._fail(frame_key, frame, logger_name, day, timestamp, 'extract_failed')
+        elif message.startswith('处理图片异常'):
+            self._fail(frame_key, frame, logger_name, day, timestamp, 'exception')
+        elif message.startswith('图片读取失败'):
+            self._fail(frame_key, frame, logger_name, day, timestamp, 'read_failed')
+        elif message.startswith('输出写入失败: '):
+            path = message[len('输出写入失败: '):].rsplit(' - 错误', 1)[0]
+            self._fail(None, None, logger_name, day, timestamp, 'write_failed', camera_from_path(path))
+
+    def _selected(self, camera):
+        return self.cameras is None or camera in self.cameras
+
+    def _stats_for(self, camera, day):
+        camera = camera or UNKNOWN_CAMERA
+        return self.totals[camera], self.daily[(day, camera)]
+
+    def _count(self, camera, day, timestamp, counter):
+        if not self._selected(camera or UNKNOWN_CAMERA):
+            return
+        for stats in self._stats_for(camera, day):
+            setattr(stats, counter, getattr(stats, counter) + 1)
+            stats.touch(timestamp)
+
+    def _fail(self, frame_key, frame, logger_name, day, timestamp, failure, camera=None):
+        if frame is not None:
+            camera = frame.camera
+            self._frames.pop(frame_key, None)
+        camera = camera or camera_from_logger(logger_name)
+        if not self._selected(camera or UNKNOWN_CAMERA):
+            return
+        for stats in self._stats_for(camera, day):
+            stats.failures[failure] += 1
+            stats.touch(timestamp)
+
+    def _maybe_finish(self, key, frame):
+        if frame.submitted and all(stage in frame.stages for stage in ('save', 'backup', 'annotate')):
+            self._finish(key)
+
+    def _finish(self, key):
+        frame = self._frames.pop(key, None)
+        if frame is None or not frame.submitted or not self._selected(frame.camera or UNKNOWN_CAMERA):
+            return
+        frame.stages['end_to_end'] = frame.last_time - frame.start
+        for stats in self._stats_for(frame.camera, frame.day):
+            stats.frames += 1
+            stats.touch(frame.start)
+            for stage, value in frame.stages.items():
+                stats.histograms[stage].add(value)
+
+    def _expire(self, before):
+        """结算开始时间早于 before 的帧（提交记录缺失或日志被截断）"""
+        for key in [key for key, frame in self._frames.items() if frame.start < before]:
+            self._finish(key)
+
+    def close(self):
+        """结算全部未完成的帧"""
+        self._expire(math.inf)
+
+    def daily_rows(self):
+        """按天、相机展开的趋势数据"""
+        rows = []
+        for (day, camera), stats in sorted(self.daily.items()):
+            row = {
+                'date': day,
+                'camera': camera,
+                'frames': stats.frames,
+                'frames_per_minute': round(stats.frame_rate(), 3),
+                'duplicates': stats.duplicates,
+                'reused': stats.reused,
+                'skipped': stats.skipped,
+            }
+            for failure in FAILURES:
+                row[failure] = stats.failures[failure]
+            for stage in STAGES:
+                histogram = stats.histograms[stage]
+                row[f'{stage}_p50'] = round(histogram.percentile(0.50), 3)
+                row[f'{stage}_p95'] = round(histogram.percentile(0.95), 3)
+            rows.append(row)
+        return rows
+
+
+def _fmt(value):
+    return '-' if math.isnan(value) else f"{value:.3f}"
+
+
+def print_report(report, files):
+    print("=" * 78)
+    print(f"日志文件: {len(files)} 个, 总行数: {report.lines}, 有效记录: {report.parsed_lines}")
+    for camera, stats in sorted(report.totals.items()):
+        print("=" * 78)
+        span = ''
+        if stats.first_time is not None:
+            span = (f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(stats.first_time))} ~ "
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(stats.last_time))}")
+        print(f"相机: {camera}  {span}")
+        print(f"完成帧数: {stats.frames}, 平均帧率: {_fmt(stats.frame_rate())} 帧/分钟, "
+              f"重复跳过: {stats.duplicates}, 近似复用: {stats.reused}, 积压跳过: {stats.skipped}")
+        print("失败: " + ", ".join(f"{FAILURE_NAMES[f]} {stats.failures[f]}" for f in FAILURES))
+        print(f"  {'阶段':<8} {'样本':>8} {'平均':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'最大':>8}  (秒)")
+        for stage in STAGES:
+            histogram = stats.histograms[stage]
+            if not histogram.count:
+                continue
+            print(f"  {STAGE_NAMES[stage]:<8} {histogram.count:>8} {_fmt(histogram.mean()):>8} "
+                  f"{_fmt(histogram.percentile(0.50)):>8} {_fmt(histogram.percentile(0.95)):>8} "
+                  f"{_fmt(histogram.percentile(0.99)):>8} {_fmt(histogram.max):>8}")
+
+    rows = report.daily_rows()
+    if rows:
+        print("=" * 78)
+        print("按天趋势")
+        print(f"  {'日期':<10} {'相机':<10} {'帧数':>6} {'帧/分钟':>8} {'失败':>5} "
+              f"{'提取p50':>8} {'提取p95':>8} {'端到端p50':>9} {'端到端p95':>9}")
+        for row in rows:
+            failures = sum(row[f] for f in FAILURES)
+            print(f"  {row['date']:<10} {row['camera']:<10} {row['frames']:>6} {row['frames_per_minute']:>8} "
+                  f"{failures:>5} {row['extract_p50']:>8} {row['extract_p95']:>8} "
+                  f"{row['end_to_end_p50']:>9} {row['end_to_end_p95']:>9}")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ATLI 监控日志耗时与吞吐统计报告')
+    parser.add_argument('paths', nargs='*', help='日志文件、目录或通配符，默认分析 logs/ 与 /var/log/atli_monitor/')
+    parser.add_argument('--since', help='起始日期（含），格式 YYYY-MM-DD')
+    parser.add_argument('--until', help='结束日期（含），格式 YYYY-MM-DD')
+    parser.add_argument('--camera', action='append', help='仅统计指定相机，可重复指定')
+    parser.add_argument('--csv', help='按天趋势导出 CSV 路径')
+    args = parser.parse_args()
+
+    files = collect_log_files(args.paths or DEFAULT_LOG_PATTERNS)
+    if not files:
+        print("未找到日志文件")
+        return
+
+    report = LogReport(since=args.since, until=args.until, cameras=args.camera)
+    for path in files:
+        report.feed_file(path)
+    report.close()
+
+    print_report(report, files)
+
+    if args.csv:
+        rows = report.daily_rows()
+        if rows:
+            with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+            print(f"按天趋势已保存: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+标志物颜色查找表模块
+将 HSV 双红色区间阈值预编译为 24 位 BGR 位查找表（2 MB），
+单次向量化查表即可得到与 cvtColor(HSV) + 两次 inRange + bitwise_or 完全一致的掩膜。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+# 红色标志物阈值（H, S, V），每组为 [(lower, upper), ...]，各区间结果按位或
+# 暗图像：降低亮度下限、放宽高区间色调
+DARK_RED_RANGES = (
+    ((0, 180, 50), (10, 255, 255)),     # 红色低区间（H: 0-10）
+    ((140, 180, 50), (180, 255, 255)),  # 红色高区间（H: 140-180）
+)
+# 正常亮度图像
+NORMAL_RED_RANGES = (
+    ((0, 150, 180), (10, 255, 255)),    # 红色低区间（H: 0-10）
+    ((160, 90, 180), (180, 255, 255)),  # 红色高区间（H: 160-180）
+)
+
+_lut_cache = {}
+_lut_lock = threading.Lock()
+
+
+def _normalize_ranges(hsv_ranges):
+    """将阈值区间规整为可哈希的整数元组，作为缓存键"""
+    return tuple(
+        (tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+        for lower, upper in hsv_ranges
+    )
+
+
+def build_marker_lut(hsv_ranges):
+    """
+    为一组 HSV 区间编译 BGR 位查找表。
+
+    枚举全部 2^24 种 BGR 颜色（排列为 4096x4096 图像），用与逐帧处理相同的
+    cvtColor/inRange 计算掩膜，再按位压缩。表项下标为 b | g << 8 | r << 16，
+    与 BGRA 像素按小端 uint32 读取后的低 24 位一致。
+
+    Returns:
+        np.ndarray: 长度 2^21 的 uint8 位表（bitorder='little'）
+    """
+    channel = np.arange(256, dtype=np.uint8)
+    r, g, b = np.meshgrid(channel, channel, channel, indexing='ij')
+    cube = np.stack([b, g, r], axis=-1).reshape(4096, 4096, 3)
+    del r, g, b
+
+    hsv = cv2.cvtColor(cube, cv2.COLOR_BGR2HSV)
+    del cube
+
+    mask = np.zeros((4096, 4096), dtype=np.uint8)
+    for lower, upper in hsv_ranges:
+        cv2.bitwise_or(mask, cv2.inRange(hsv, np.array(lower), np.array(upper)), dst=mask)
+
+    return np.packbits(mask.reshape(-1) > 0, bitorder='little')
+
+
+def get_marker_lut(hsv_ranges):
+    """获取（必要时编译并缓存）阈值区间对应的位查找表，每组阈值只编译一次"""
+    key = _normalize_ranges(hsv_ranges)
+    lut = _lut_cache.get(key)
+    if lut is None:
+        with _lut_lock:
+            lut = _lut_cache.get(key)
+            if lut is None:
+                lut = build_marker_lut(key)
+                _lut_cache[key] = lut
+    return lut
+
+
+def apply_marker_lut(bgr, lut, pool=None):
+    """
+    对 BGR 图像（或 ROI 视图）查表，返回 0/255 的 uint8 掩膜。
+
+    Args:
+        bgr: HxWx3 uint8 BGR 图像
+        lut: build_marker_lut/get_marker_lut 返回的位表
+        pool: 可选 FrameBufferPool，提供时所有中间量及返回的掩膜均写入池内缓冲区
+
+    Returns:
+        np.ndarray: HxW uint8 掩膜，与 HSV 双区间 inRange 的并集逐像素相同
+    """
+    height, width = bgr.shape[:2]
+    if pool is None:
+        bgra = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+        index = bgra.view(np.uint32)[..., 0]
+        index &= 0x00FFFFFF
+
+        mask = lut.take(index >> 3)
+        mask >>= (index & 7).astype(np.uint8)
+    else:
+        bgra = pool.get('lut_bgra', (height, width, 4))
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA, dst=bgra)
+        index = bgra.view(np.uint32)[..., 0]
+        index &= 0x00FFFFFF
+
+        scratch = pool.get('lut_scratch', (height, width), np.intp)  # take 需要 intp 下标，避免内部转换拷贝
+        shift = pool.get('lut_shift', (height, width))
+        mask = pool.get('lut_mask', (height, width))
+        np.right_shift(index, 3, out=scratch)
+        lut.take(scratch, out=mask, mode='clip')  # 下标必在表内，clip 模式避免 out 的隐式缓冲
+        np.bitwise_and(index, 7, out=scratch)
+        np.copyto(shift, scratch, casting='unsafe')
+        mask >>= shift
+
+    mask &= 1
+    mask *= 255
+    return mask
+
+
+def warm_up():
+    """预编译两套默认阈值的查找表，避免首帧承担编译开销"""
+    get_marker_lut(DARK_RED_RANGES)
+    get_marker_lut(NORMAL_RED_RANGES)
@@ -0,0 +1,228 @@
+"""
+内存监控模块
+监控服务在 systemd 下连续运行数周，本模块定期记录内存与资源使用情况，用于发现缓慢增长与泄漏：
+
+- 进程 RSS 与峰值 RSS（Linux 读 /proc/self/status，其他平台安装了 psutil 时使用 psutil），以及自启动的增长速率；
+- 线程数及按类型的分布（批次切换后未回收的 watchdog Observer 线程会在这里持续增长）；
+- 各组件登记的计数（如已处理文件名集合大小、活跃 Observer 数、缓冲池常驻字节、调度积压）；
+- 可选的 tracemalloc：按代码行统计分配，每次报告列出相对上次报告与相对启动增长最多的分配位置，
+  并记录单帧处理期间的峰值内存（NumPy/OpenCV 数组的分配同样计入）。
+  Python 3.8 没有 tracemalloc.reset_peak，无法得到单帧峰值，改为记录单帧结束时相对开始的内存增量与跟踪峰值。
+"""
+
+import collections
+import contextlib
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+# tracemalloc 统计中忽略的文件（自身开销与导入系统）
+_TRACEMALLOC_IGNORED = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+                        '<unknown>', tracemalloc.__file__)
+
+
+def read_rss():
+    """返回 (当前 RSS, 峰值 RSS) 字节数；无法获取时为 (None, None)"""
+    try:
+        values = {}
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key, value = line.split(':', 1)
+                    values[key] = int(value.split()[0]) * 1024
+        return values.get('VmRSS'), values.get('VmHWM')
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None, None
+    info = psutil.Process().memory_info()
+    return info.rss, getattr(info, 'peak_wset', None)
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.1f}MB" if value is not None else "-"
+
+
+class MemoryMonitor:
+    """
+    后台线程定期输出内存报告。
+
+    由主程序创建，CameraMonitor 通过 register_gauge 登记各组件的计数；
+    传给各 TimeFolderHandler 后以 track_frame 记录单帧峰值内存（需开启 tracemalloc，多相机并发处理时为近似值；
+    Python 3.8 下为单帧内存增量）。
+    """
+
+    def __init__(self, interval=600, tracemalloc_frames=0, top_n=10, rss_warning_mb=0, thread_warning=0,
+                 logger=None):
+        """
+        Args:
+            interval: 报告间隔（秒）
+            tracemalloc_frames: tracemalloc 记录的调用栈深度，0 不开启（开启后分配开销明显增加）
+            top_n: 每次报告列出的分配位置数
+            rss_warning_mb: RSS 超过该值（MB）时记录警告，0 不检查
+            thread_warning: 线程数超过该值时记录警告，0 不检查
+        """
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top_n = top_n
+        self.rss_warning_mb = rss_warning_mb
+        self.thread_warning = thread_warning
+        self.logger = logger or logging.getLogger('atli_monitor.memory_monitor')
+
+        self._gauges = collections.OrderedDict()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.started_time = None
+        self.start_rss = None
+        self.start_threads = 0
+        self._baseline_snapshot = None
+        self._previous_snapshot = None
+
+        self.frames = 0
+        self.frame_peak_total = 0
+        self.frame_peak_max = 0
+        self.frame_peak_name = None
+        # Python 3.9+ 可逐帧重置 tracemalloc 峰值；否则只能记录单帧增量
+        self.frame_peak_exact = hasattr(tracemalloc, 'reset_peak')
+        self.traced_peak = 0
+
+    def register_gauge(self, name, func):
+        """登记一个计数，报告时调用 func() 取值（名称以 _bytes 结尾时按 MB 显示）"""
+        self._gauges[name] = func
+
+    def start(self):
+        if self.tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self.started_time = time.time()
+        self.start_rss, _ = read_rss()
+        self.start_threads = threading.active_count()
+        if tracemalloc.is_tracing():
+            self._baseline_snapshot = self._take_snapshot()
+            self._previous_snapshot = self._baseline_snapshot
+        self._thread = threading.Thread(target=self._run, name="MemoryMonitor", daemon=True)
+        self._thread.start()
+        self.logger.info(f"内存监控已启动 - 间隔: {self.interval}秒, RSS: {_mb(self.start_rss)}, "
+                         f"tracemalloc: {'开启' if tracemalloc.is_tracing() else '关闭'}")
+        if tracemalloc.is_tracing() and not self.frame_peak_exact:
+            self.logger.warning("当前 Python 版本不支持 tracemalloc.reset_peak（需 3.9+），无法记录单帧峰值内存，"
+                                "改为记录单帧内存增量与跟踪峰值")
+
+    def stop(self):
+        """停止后台线程并输出最后一次报告"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.report()
+        if self.tracemalloc_frames and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.report()
+            except Exception as e:
+                self.logger.error(f"内存报告失败: {e}")
+
+    @contextlib.contextmanager
+    def track_frame(self, name):
+        """
+        记录一帧处理期间 tracemalloc 的峰值增量（未开启 tracemalloc 时不记录）。
+
+        Python 3.8 不能重置峰值，记录的是帧结束时相对开始的增量（处理期间的临时分配不计入），
+        同时更新进程的跟踪峰值。
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        start, _ = tracemalloc.get_traced_memory()
+        if self.frame_peak_exact:
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            frame_peak = max((peak if self.frame_peak_exact else current) - start, 0)
+            with self._lock:
+                self.frames += 1
+                self.traced_peak = max(self.traced_peak, peak)
+                self.frame_peak_total += frame_peak
+                if frame_peak > self.frame_peak_max:
+                    self.frame_peak_max = frame_peak
+                    self.frame_peak_name = name
+
+    def _take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([tracemalloc.Filter(False, pattern) for pattern in _TRACEMALLOC_IGNORED])
+
+    def report(self):
+        """输出一次内存报告"""
+        rss, peak_rss = read_rss()
+        threads = threading.enumerate()
+        thread_types = collections.Counter(type(thread).__name__ for thread in threads)
+
+        growth = ""
+        if rss is not None and self.start_rss is not None:
+            delta = rss - self.start_rss
+            growth = f"（自启动 {delta / 1024 / 1024:+.1f}MB"
+            # 运行不足 1 小时时增长率主要反映启动后的缓冲区分配，不输出
+            hours = (time.time() - self.started_time) / 3600
+            if hours >= 1:
+                growth += f", {delta / 1024 / 1024 / hours:+.1f}MB/小时"
+            growth += "）"
+        self.logger.info(f"内存报告 - RSS: {_mb(rss)}{growth}, 峰值 RSS: {_mb(peak_rss)}, "
+                         f"线程: {len(threads)}（启动时 {self.start_threads}）")
+        self.logger.info("线程分布 - " + ", ".join(f"{name}: {count}" for name, count in thread_types.most_common()))
+
+        gauges = []
+        for name, func in self._gauges.items():
+            try:
+                value = func()
+            except Exception as e:
+                value = f"错误({e})"
+            if name.endswith('_bytes') and isinstance(value, (int, float)):
+                value = _mb(value)
+            gauges.append(f"{name}: {value}")
+        if gauges:
+            self.logger.info("组件计数 - " + ", ".join(gauges))
+
+        with self._lock:
+            if self.frames:
+                label = "单帧峰值内存" if self.frame_peak_exact else "单帧内存增量"
+                self.logger.info(f"{label} - 帧数: {self.frames}, 平均: {_mb(self.frame_peak_total / self.frames)}, "
+                                 f"最大: {_mb(self.frame_peak_max)} ({self.frame_peak_name})")
+
+        if tracemalloc.is_tracing() and self._baseline_snapshot is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                traced_peak = max(self.traced_peak, peak)
+            snapshot = self._take_snapshot()
+            self.logger.info(f"tracemalloc - 当前跟踪: {_mb(current)}, 跟踪峰值: {_mb(traced_peak)}, "
+                             f"开销: {_mb(tracemalloc.get_tracemalloc_memory())}")
+            self._log_top_diff(snapshot, self._previous_snapshot, "相对上次报告")
+            self._log_top_diff(snapshot, self._baseline_snapshot, "相对启动")
+            self._previous_snapshot = snapshot
+
+        if self.rss_warning_mb and rss is not None and rss > self.rss_warning_mb * 1024 * 1024:
+            self.logger.warning(f"RSS {_mb(rss)} 超过告警值 {self.rss_warning_mb}MB")
+        if self.thread_warning and len(threads) > self.thread_warning:
+            self.logger.warning(f"线程数 {len(threads)} 超过告警值 {self.thread_warning}，"
+                                f"最多的类型: {thread_types.most_common(1)[0][0]}")
+
+    def _log_top_diff(self, snapshot, reference, label):
+        """按代码行列出增长最多的分配位置"""
+        stats = [stat for stat in snapshot.compare_to(reference, 'lineno') if stat.size_diff > 0][:self.top_n]
+        if not stats:
+            return
+        self.logger.info(f"分配增长 Top {len(stats)}（{label}）")
+        for rank, stat in enumerate(stats, 1):
+            frame = stat.traceback[0]
+            self.logger.info(f"  #{rank} {os.path.basename(frame.filename)}:{frame.lineno} "
+                             f"+{stat.size_diff / 1024:.1f}KiB (共 {stat.size / 1024:.1f}KiB, {stat.count_diff:+d}个)")
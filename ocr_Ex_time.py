@@ -1,4 +1,3 @@
-import pytesseract
 import cv2
 import re
 from datetime import datetime
@@ -29,7 +28,17 @@ def _get_tesseract_cmd():
 
     return default_path
 
-pytesseract.pytesseract.tesseract_cmd = _get_tesseract_cmd()
+_pytesseract = None
+
+
+def _get_pytesseract():
+    """首次 OCR 时才导入 pytesseract 并确定 Tesseract 路径，导入本模块不读取配置文件"""
+    global _pytesseract
+    if _pytesseract is None:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = _get_tesseract_cmd()
+        _pytesseract = pytesseract
+    return _pytesseract
 
 
 def extract_timestamp_from_image(image_path, coord):
@@ -58,7 +67,7 @@ def extract_timestamp_from_image(image_path, coord):
             r'tessedit_char_whitelist=0123456789-: '
             r'tessedit_char_blacklist=abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
         )
-        text = pytesseract.image_to_string(processed_img, config=custom_config)
+        text = _get_pytesseract().image_to_string(processed_img, config=custom_config)
 
         return text.strip() if text.strip() else None
 
@@ -0,0 +1,279 @@
+"""
+输出写入模块
+后台线程池负责写出像素坐标文件、备份图片和标注图片，处理线程只需提交任务。
+每个文件先写入同目录临时文件再原子重命名，崩溃时不会留下写了一半的坐标文件。
+
+持久化级别（durability）：
+- file:  每个文件 fsync 后再重命名，并同步所在目录
+- batch: 多个文件（可跨相机）攒批后统一 fsync、重命名、同步目录（组提交）
+- none:  不做 fsync，仅保证重命名的原子性
+"""
+
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+import cv2
+
+DURABILITY_MODES = ('file', 'batch', 'none')
+
+_STOP = object()
+
+
+class OutputJob:
+    """单个待写出的文件"""
+
+    __slots__ = ('path', 'data', 'image', 'encode_params', 'copystat_src', 'on_commit',
+                 'tmp_path', 'submit_time', 'write_time')
+
+    def __init__(self, path, data=None, image=None, encode_params=None, copystat_src=None, on_commit=None):
+        self.path = path
+        self.data = data
+        self.image = image
+        self.encode_params = encode_params
+        self.copystat_src = copystat_src
+        self.on_commit = on_commit
+        self.tmp_path = None
+        self.submit_time = time.time()
+        self.write_time = 0.0
+
+
+def _fsync_path(path, directory=False):
+    """对文件或目录执行 fsync（Windows 不支持目录 fsync，直接跳过；文件需以可写方式打开）"""
+    if directory and os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY if directory else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OutputWriter:
+    """
+    输出写入器，全部相机共用一个实例以便跨相机组提交。
+
+    async_write=False 时在调用线程内同步完成写入（仍为原子提交），便于单独调试或测试。
+    """
+
+    def __init__(self, async_write=True, writer_threads=2, durability='batch', batch_size=32,
+                 batch_interval=1.0, max_pending=16, logger=None):
+        """
+        Args:
+            async_write: 是否使用后台线程写出
+            writer_threads: 后台写线程数
+            durability: 持久化级别，见 DURABILITY_MODES
+            batch_size: batch 模式下攒满多少个文件立即提交
+            batch_interval: batch 模式下最长提交间隔（秒）
+            max_pending: 排队任务上限，写盘跟不上时对提交方施加背压（图片任务可能占用数十 MB）
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"不支持的持久化级别: {durability}，可选: {', '.join(DURABILITY_MODES)}")
+
+        self.async_write = async_write
+        self.durability = durability
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.logger = logger or logging.getLogger('atli_monitor.output_writer')
+
+        self.committed = 0
+        self.failed = 0
+        self.batches = 0
+        self._stats_lock = threading.Lock()
+
+        self._pending = []
+        self._pending_cond = threading.Condition()
+        self._commit_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self._committer = None
+        self._closed = False
+
+        if self.async_write:
+            for i in range(max(1, writer_threads)):
+                thread = threading.Thread(target=self._worker_loop, name=f"OutputWriter-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.durability == 'batch':
+                self._committer = threading.Thread(target=self._committer_loop, name="OutputWriter-commit",
+                                                   daemon=True)
+                self._committer.start()
+
+    def submit_text(self, path, text, on_commit=None):
+        """提交文本文件（UTF-8）"""
+        self._submit(OutputJob(path, data=text.encode('utf-8'), on_commit=on_commit))
+
+    def submit_bytes(self, path, data, copystat_src=None, on_commit=None):
+        """提交原始字节文件，copystat_src 指定时复制其时间戳与权限"""
+        self._submit(OutputJob(path, data=data, copystat_src=copystat_src, on_commit=on_commit))
+
+    def submit_image(self, path, image, encode_params=None, on_commit=None):
+        """提交待编码图片，编码在写线程中完成；提交后调用方不得再修改 image"""
+        self._submit(OutputJob(path, image=image, encode_params=encode_params or [], on_commit=on_commit))
+
+    def _submit(self, job):
+        if self._closed:
+            raise RuntimeError("输出写入器已关闭")
+        if self.async_write:
+            self._queue.put(job)
+        else:
+            self._process(job)
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        """写临时文件，按持久化级别立即提交或加入组提交队列"""
+        try:
+            self._write_temp(job)
+        except Exception as e:
+            self._fail(job, e)
+            return
+
+        if self.durability == 'batch' and self.async_write:
+            with self._pending_cond:
+                self._pending.append(job)
+                if len(self._pending) >= self.batch_size:
+                    self._pending_cond.notify()
+            return
+
+        try:
+            if self.durability == 'file':
+                _fsync_path(job.tmp_path)
+            self._rename(job)
+            if self.durability == 'file':
+                _fsync_path(os.path.dirname(os.path.abspath(job.path)), directory=True)
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self._committed([job])
+
+    def _write_temp(self, job):
+        start_time = time.time()
+        directory, basename = os.path.split(job.path)
+        job.tmp_path = os.path.join(directory, f".{basename}.{uuid.uuid4().hex[:8]}.tmp")
+
+        data = job.data
+        if job.image is not None:
+            ext = os.path.splitext(job.path)[1] or '.jpg'
+            ok, encoded = cv2.imencode(ext, job.image, job.encode_params)
+            if not ok:
+                raise IOError(f"图片编码失败: {job.path}")
+            data = encoded.tobytes()
+            job.image = None
+
+        with open(job.tmp_path, 'wb') as f:
+            f.write(data)
+        job.data = None
+        job.write_time = time.time() - start_time
+
+    def _rename(self, job):
+        """（在 fsync 之后）复制元数据并原子替换目标文件"""
+        if job.copystat_src is not None:
+            shutil.copystat(job.copystat_src, job.tmp_path)
+        os.replace(job.tmp_path, job.path)
+
+    def _committer_loop(self):
+        while True:
+            with self._pending_cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._pending_cond.wait(self.batch_interval)
+                closed = self._closed
+            self._commit_pending()
+            if closed:
+                return
+
+    def _commit_pending(self):
+        """提交当前攒下的全部文件；持有提交锁，保证 flush 返回时没有进行中的批次"""
+        with self._commit_lock:
+            with self._pending_cond:
+                batch, self._pending = self._pending, []
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        """组提交：统一 fsync 临时文件 -> 重命名 -> 每个目录只同步一次"""
+        committed = []
+        directories = set()
+        for job in batch:
+            try:
+                _fsync_path(job.tmp_path)
+                self._rename(job)
+                directories.add(os.path.dirname(os.path.abspath(job.path)))
+                committed.append(job)
+            except Exception as e:
+                self._fail(job, e)
+        for directory in directories:
+            try:
+                _fsync_path(directory, directory=True)
+            except OSError as e:
+                self.logger.warning(f"目录同步失败: {directory} - {e}")
+        with self._stats_lock:
+            self.batches += 1
+        self._committed(committed)
+
+    def _committed(self, jobs):
+        with self._stats_lock:
+            self.committed += len(jobs)
+        for job in jobs:
+            if job.on_commit is None:
+                continue
+            try:
+                job.on_commit(job.path, job.write_time)
+            except Exception as e:
+                self.logger.error(f"输出提交回调异常: {job.path} - {e}")
+
+    def _fail(self, job, error):
+        with self._stats_lock:
+            self.failed += 1
+        self.logger.error(f"输出写入失败: {job.path} - 错误: {error}")
+        if job.tmp_path and os.path.exists(job.tmp_path):
+            try:
+                os.remove(job.tmp_path)
+            except OSError:
+                pass
+
+    def flush(self):
+        """等待已提交任务全部写出并提交"""
+        if not self.async_write:
+            return
+        self._queue.join()
+        if self.durability == 'batch':
+            self._commit_pending()
+
+    def close(self):
+        """写出剩余任务并停止后台线程"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self._committer is not None:
+            with self._pending_cond:
+                self._pending_cond.notify_all()
+            self._committer.join()
+        self.logger.info(f"输出写入器已关闭 - 已提交: {self.committed}, 失败: {self.failed}, 组提交批次: {self.batches}")
+
+    def stats(self):
+        """返回写入统计"""
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'committed': self.committed,
+                'failed': self.failed,
+                'batches': self.batches,
+            }
@@ -0,0 +1,228 @@
+"""
+轮询监控模块
+上传目录为 NFS/SMB 等网络挂载时，FTP 主机写入产生的 inotify 事件不会到达本机，watchdog 的 Observer 收不到任何事件。
+PollingWatcher 以单个轮询线程替代各相机的 Observer：
+
+- 每个被监控目录（相机目录与各相机当前的 TLS_* 批次目录）每次轮询只做一次 os.scandir，
+  以 (文件名, 大小, 修改时间) 记录快照，只对新出现、尚未确认的文件取 stat；
+- 文件大小与修改时间在相邻两次轮询间不变才视为写完，触发 on_created（目录立即触发）；
+- 轮询间隔按各目录的上传间隔自适应：有未写完的文件时最快，按上传节奏轮询，长时间无新文件时逐步放慢；
+- 事件交给小线程池分发给现有的 CameraHandler / TimeFolderHandler，同一目录的事件按顺序串行处理。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from watchdog.events import DirCreatedEvent, DirDeletedEvent, FileCreatedEvent
+
+# 按上传节奏轮询时，间隔取平均上传间隔的该比例
+ARRIVAL_POLL_RATIO = 0.25
+# 空闲时每次轮询间隔的放大倍数
+IDLE_BACKOFF = 1.5
+# 上传间隔的 EWMA 平滑系数
+GAP_ALPHA = 0.3
+
+
+class _Watch:
+    """单个被监控目录的快照与轮询节奏"""
+
+    __slots__ = ('path', 'handler', 'entries', 'pending', 'interval', 'next_poll',
+                 'last_arrival', 'gap', 'events', 'draining')
+
+    def __init__(self, path, handler, interval):
+        self.path = path
+        self.handler = handler
+        # 文件名 -> 是否目录（已确认的条目）
+        self.entries = {}
+        # 文件名 -> (大小, 修改时间)，等待下次轮询确认写完
+        self.pending = {}
+        self.interval = interval
+        self.next_poll = 0.0
+        self.last_arrival = None
+        self.gap = None
+        self.events = deque()
+        self.draining = False
+
+
+class PollingWatcher:
+    """
+    单线程轮询多个目录并向 watchdog 事件处理器分发事件，接口与 Observer 的 schedule/unschedule 对应。
+
+    由 CameraMonitor 在 ingest.mode 为 polling 时创建，传给各 CameraHandler 用于切换批次目录。
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=5.0, dispatch_workers=8, logger=None):
+        """
+        Args:
+            min_interval: 最短轮询间隔（秒），有未写完的文件时使用
+            max_interval: 最长轮询间隔（秒），长时间无新文件时放慢到此值
+            dispatch_workers: 分发事件的线程数（同一目录的事件始终串行）
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.logger = logger or logging.getLogger('atli_monitor.polling_watcher')
+        self._executor = ThreadPoolExecutor(max_workers=dispatch_workers, thread_name_prefix='PollDispatch')
+        self._watches = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self.polls = 0
+        self.stats_calls = 0
+        self.events_emitted = 0
+        self.scan_seconds = 0.0
+
+    def schedule(self, handler, path, emit_existing=False):
+        """
+        开始监控目录。
+
+        Args:
+            handler: watchdog FileSystemEventHandler
+            path: 目录路径（不递归）
+            emit_existing: 是否把目录中已有的条目也当作新条目触发（切换到新批次目录时使用，
+                避免发现目录之前已上传的图片被遗漏）
+        """
+        watch = _Watch(path, handler, self.min_interval)
+        if not emit_existing:
+            try:
+                with os.scandir(path) as entries:
+                    watch.entries = {entry.name: entry.is_dir() for entry in entries}
+            except OSError as e:
+                self.logger.warning(f"轮询监控初始快照失败: {path} - {e}")
+        with self._lock:
+            self._watches[path] = watch
+        self._wakeup.set()
+        self.logger.info(f"轮询监控目录: {path}")
+
+    def unschedule(self, path):
+        with self._lock:
+            self._watches.pop(path, None)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="PollingWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止轮询，并等待已分发的事件处理完"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
+        self.logger.info(f"轮询监控已停止 - {self.format_stats()}")
+
+    def _run(self):
+        while self._running:
+            now = time.time()
+            with self._lock:
+                watches = list(self._watches.values())
+            for watch in watches:
+                if watch.next_poll <= now:
+                    self._poll(watch, now)
+
+            next_poll = min((watch.next_poll for watch in watches), default=now + self.max_interval)
+            self._wakeup.wait(max(0.0, next_poll - time.time()))
+            self._wakeup.clear()
+
+    def _poll(self, watch, now):
+        started = time.perf_counter()
+        self.polls += 1
+        try:
+            with os.scandir(watch.path) as scanned:
+                current = {entry.name: entry for entry in scanned}
+        except FileNotFoundError:
+            # 批次目录被删除时由相机目录的删除事件切换，这里只等待下次轮询
+            current = {}
+        except OSError as e:
+            self.logger.warning(f"轮询目录失败: {watch.path} - {e}")
+            watch.next_poll = now + self.max_interval
+            return
+
+        arrived = 0
+        # 按文件名顺序触发，同一次轮询发现的多张图片按上传编号依次处理
+        for name in sorted(current):
+            if name in watch.entries:
+                continue
+            entry = current[name]
+            try:
+                if entry.is_dir():
+                    watch.entries[name] = True
+                    watch.pending.pop(name, None)
+                    self._dispatch(watch, DirCreatedEvent(entry.path))
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            self.stats_calls += 1
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if watch.pending.get(name) == signature:
+                # 两次轮询间大小与修改时间不变，视为写入完成
+                del watch.pending[name]
+                watch.entries[name] = False
+                self._dispatch(watch, FileCreatedEvent(entry.path))
+                arrived += 1
+            else:
+                watch.pending[name] = signature
+
+        for name in [name for name in watch.entries if name not in current]:
+            if watch.entries.pop(name):
+                self._dispatch(watch, DirDeletedEvent(os.path.join(watch.path, name)))
+        for name in [name for name in watch.pending if name not in current]:
+            del watch.pending[name]
+
+        self._adapt_interval(watch, now, arrived)
+        watch.next_poll = now + watch.interval
+        self.scan_seconds += time.perf_counter() - started
+
+    def _adapt_interval(self, watch, now, arrived):
+        """有未写完的文件时最快；近期有上传时按平均上传间隔轮询；空闲超过两个上传间隔后逐步放慢"""
+        if arrived:
+            if watch.last_arrival is not None:
+                gap = (now - watch.last_arrival) / arrived
+                watch.gap = gap if watch.gap is None else watch.gap + GAP_ALPHA * (gap - watch.gap)
+            watch.last_arrival = now
+
+        if watch.pending:
+            interval = self.min_interval
+        elif watch.gap is not None and now - watch.last_arrival < 2 * watch.gap:
+            interval = watch.gap * ARRIVAL_POLL_RATIO
+        else:
+            interval = watch.interval * IDLE_BACKOFF
+        watch.interval = min(max(interval, self.min_interval), self.max_interval)
+
+    def _dispatch(self, watch, event):
+        self.events_emitted += 1
+        with self._lock:
+            watch.events.append(event)
+            if watch.draining:
+                return
+            watch.draining = True
+        self._executor.submit(self._drain, watch)
+
+    def _drain(self, watch):
+        """在分发线程中按顺序处理该目录积累的事件"""
+        while True:
+            with self._lock:
+                if not watch.events:
+                    watch.draining = False
+                    return
+                event = watch.events.popleft()
+            try:
+                watch.handler.dispatch(event)
+            except Exception as e:
+                self.logger.error(f"轮询事件处理异常: {event.src_path} - 错误: {e}")
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            watches = len(self._watches)
+        average = self.scan_seconds / self.polls * 1000 if self.polls else 0.0
+        return (f"监控目录: {watches}, 轮询: {self.polls}次, 平均耗时: {average:.2f}ms, "
+                f"stat: {self.stats_calls}次, 事件: {self.events_emitted}")
@@ -0,0 +1,213 @@
+"""
+图像质量门限模块
+在坐标提取之前，把已解码帧的 ROI 外接矩形按 1/reduce_factor 缩小后快速评估帧质量：
+
+- 清晰度：ROI 灰度的拉普拉斯方差（运动模糊、镜头水滴、雾时显著下降）；
+- 对比度：ROI 灰度标准差（雾、逆光、夜间噪声时下降）；
+- 红色占比：多边形内落入标志物红色 HSV 区间的像素比例（雾或偏色时红色饱和度不足，不再落入区间）；
+- 标志物数：缩小图上红色连通域数与预期点数（初始坐标/上一帧点数）之比。
+
+任一指标低于阈值即判为低质量帧，由处理流程按配置跳过提取或仅标记，评分逐帧写入日志与批次目录的 quality.csv
+（评分行先在内存中缓存，攒满 RECORD_FLUSH_ROWS 行或超过 RECORD_FLUSH_SECONDS 秒才追加写出，不必每帧打开文件）。
+"""
+
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from marker_lut import apply_marker_lut, get_marker_lut
+
+QUALITY_FIELDS = ('sharpness', 'contrast', 'red_ratio', 'markers', 'expected')
+QUALITY_HEADER = 'timestamp,filename,' + ','.join(QUALITY_FIELDS) + ',passed,reasons\n'
+# quality.csv 评分行的缓存上限（行）与最长缓存时间（秒）
+RECORD_FLUSH_ROWS = 64
+RECORD_FLUSH_SECONDS = 30
+
+
+def roi_trackers(ex_pixel_coord_obj):
+    """相机的各 ROI 跟踪器（多 ROI 的 RoiGroup 展开为各 ExPixelCoord）"""
+    trackers = getattr(ex_pixel_coord_obj, 'trackers', None)
+    return list(trackers.values()) if trackers else [ex_pixel_coord_obj]
+
+
+class FrameQualityGate:
+    """
+    单台相机的帧质量评估与统计。
+
+    由 CameraMonitor 按相机创建，跨 TLS_* 批次传递给各 TimeFolderHandler；
+    各阈值为 0 时不检查该项，标志物数仅在跟踪器已有 pre_points 时检查。
+    """
+
+    def __init__(self, reduce_factor=4, min_sharpness=0.0, min_contrast=0.0, min_red_ratio=0.0,
+                 min_marker_ratio=0.0, action='flag', logger=None):
+        """
+        Args:
+            reduce_factor: ROI 缩小倍数（评分在缩小图上计算）
+            min_sharpness: 拉普拉斯方差下限（缩小图上计算）
+            min_contrast: 灰度标准差下限
+            min_red_ratio: 多边形内红色像素比例下限
+            min_marker_ratio: 检测到的标志物数与预期点数之比的下限
+            action: 低质量帧的处理方式，skip 跳过提取（原图保留到备份目录），flag 照常提取并标记
+        """
+        if reduce_factor < 1:
+            raise ValueError(f"缩小倍数必须不小于 1: {reduce_factor}")
+        if action not in ('skip', 'flag'):
+            raise ValueError(f"不支持的低质量帧处理方式: {action}，可选: skip, flag")
+        self.reduce_factor = reduce_factor
+        self.thresholds = {
+            'sharpness': min_sharpness,
+            'contrast': min_contrast,
+            'red_ratio': min_red_ratio,
+            'marker_ratio': min_marker_ratio,
+        }
+        self.action = action
+        self.logger = logger or logging.getLogger('atli_monitor.quality_gate')
+        self._poly_masks = {}
+        self._lock = threading.Lock()
+        # 待写出的评分行 {quality.csv 路径: [行...]}
+        self._records = {}
+        self._buffered = 0
+        self._last_flush = time.time()
+        self._records_lock = threading.Lock()
+
+        self.assessed = 0
+        self.low_quality = 0
+        self.skipped = 0
+        self.assess_seconds = 0.0
+
+    @property
+    def skip(self):
+        return self.action == 'skip'
+
+    def assess(self, img, ex_pixel_coord_obj):
+        """
+        评估一帧（已解码的 BGR 图像，只读使用）质量，返回评分字典:
+        {sharpness, contrast, red_ratio, markers, expected, passed, reasons}。
+        """
+        started = time.perf_counter()
+        trackers = roi_trackers(ex_pixel_coord_obj)
+        scale = 1.0 / self.reduce_factor
+
+        sharpness = []
+        contrast = []
+        red_pixels = 0
+        poly_pixels = 0
+        markers = 0
+        expected = 0
+        for tracker in trackers:
+            x0, y0, x1, y1 = tracker.roi_bounds(img.shape)
+            # ROI 外接矩形裁成缩小倍数的整数倍后按面积平均缩小（整数倍走 OpenCV 快速路径），多边形换算到缩小图坐标系
+            width = (x1 - x0) // self.reduce_factor
+            height = (y1 - y0) // self.reduce_factor
+            if width <= 0 or height <= 0:
+                continue
+            crop = img[y0:y0 + height * self.reduce_factor, x0:x0 + width * self.reduce_factor]
+            roi = cv2.resize(crop, (width, height), interpolation=cv2.INTER_AREA)
+            polygon_pts = np.round((np.asarray(tracker.polygon_pts, dtype=np.float64) - (x0, y0)) * scale)
+            mask_poly = self._poly_mask(polygon_pts.astype(np.int32), (height, width))
+
+            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+            laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+            sharpness.append(float(cv2.meanStdDev(laplacian, mask=mask_poly)[1][0, 0]) ** 2)
+            contrast.append(float(cv2.meanStdDev(gray, mask=mask_poly)[1][0, 0]))
+
+            # 与提取相同的明暗分档（按 ROI 平均亮度近似），选用对应的红色区间
+            dark = cv2.mean(gray)[0] < tracker.dark_threshold
+            mask_red = apply_marker_lut(roi, get_marker_lut(tracker.dark_hsv_ranges if dark else tracker.hsv_ranges))
+            cv2.bitwise_and(mask_red, mask_poly, dst=mask_red)
+            red_pixels += cv2.countNonZero(mask_red)
+            poly_pixels += cv2.countNonZero(mask_poly)
+
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mask_red, connectivity=8)
+            min_area = max(tracker.min_area * scale * scale, 1.0)
+            markers += int(np.count_nonzero(stats[1:, cv2.CC_STAT_AREA] >= min_area))
+            if tracker.pre_points is not None:
+                expected += len(tracker.pre_points)
+
+        scores = {
+            'sharpness': min(sharpness) if sharpness else 0.0,
+            'contrast': min(contrast) if contrast else 0.0,
+            'red_ratio': red_pixels / poly_pixels if poly_pixels else 0.0,
+            'markers': markers,
+            'expected': expected or None,
+        }
+        values = dict(scores, marker_ratio=markers / expected if expected else None)
+        reasons = [kind for kind, threshold in self.thresholds.items()
+                   if threshold and values[kind] is not None and values[kind] < threshold]
+        scores['passed'] = not reasons
+        scores['reasons'] = reasons
+
+        with self._lock:
+            self.assessed += 1
+            if reasons:
+                self.low_quality += 1
+            self.assess_seconds += time.perf_counter() - started
+        return scores
+
+    def _poly_mask(self, polygon_pts, shape):
+        """缩小图坐标系下的多边形掩膜，按顶点与尺寸缓存"""
+        key = (polygon_pts.tobytes(), shape)
+        mask = self._poly_masks.get(key)
+        if mask is None:
+            mask = np.zeros(shape, dtype=np.uint8)
+            cv2.fillPoly(mask, [polygon_pts], 255)
+            self._poly_masks[key] = mask
+        return mask
+
+    def append_record(self, path, timestamp, filename, scores):
+        """登记单帧评分，缓存满或超时后批量追加到批次目录的 quality.csv，供离线校准阈值"""
+        expected = scores['expected'] if scores['expected'] is not None else ''
+        line = (f"{timestamp or ''},{filename},{scores['sharpness']:.2f},{scores['contrast']:.2f},"
+                f"{scores['red_ratio']:.5f},{scores['markers']},{expected},"
+                f"{int(scores['passed'])},{'|'.join(scores['reasons'])}\n")
+        with self._records_lock:
+            self._records.setdefault(path, []).append(line)
+            self._buffered += 1
+            if self._buffered < RECORD_FLUSH_ROWS and time.time() - self._last_flush < RECORD_FLUSH_SECONDS:
+                return
+            self._flush_records()
+
+    def flush_records(self):
+        """写出缓存的全部评分行（停止监控时调用）"""
+        with self._records_lock:
+            self._flush_records()
+
+    def _flush_records(self):
+        records, self._records = self._records, {}
+        self._buffered = 0
+        self._last_flush = time.time()
+        for path, lines in records.items():
+            try:
+                write_header = not os.path.exists(path)
+                with open(path, 'a', encoding='utf-8') as f:
+                    if write_header:
+                        f.write(QUALITY_HEADER)
+                    f.writelines(lines)
+            except OSError as e:
+                self.logger.error(f"质量评分写入失败: {path} - {e}")
+
+    def count_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    @staticmethod
+    def format_scores(scores):
+        """单帧评分的日志文本"""
+        expected = scores['expected'] if scores['expected'] is not None else '-'
+        text = (f"清晰度: {scores['sharpness']:.1f}, 对比度: {scores['contrast']:.1f}, "
+                f"红色占比: {scores['red_ratio']:.4f}, 标志物: {scores['markers']}/{expected}")
+        if scores['reasons']:
+            text += f", 低于阈值: {', '.join(scores['reasons'])}"
+        return text
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            average = self.assess_seconds / self.assessed * 1000 if self.assessed else 0.0
+            return (f"评估: {self.assessed}帧, 低质量: {self.low_quality}, 跳过: {self.skipped}, "
+                    f"平均耗时: {average:.2f}ms")
+
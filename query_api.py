@@ -0,0 +1,222 @@
+"""
+本地查询接口模块
+监控进程在内存中保留每台相机最近 N 帧像素坐标，并通过轻量 HTTP 接口（仅本机）提供查询，
+看板等消费方无需再轮询 atli_processed/<相机>/<批次>/pixel/ 目录。
+
+接口（均返回 JSON）:
+    GET /cameras                                   各相机缓存帧数与最新时间戳
+    GET /cameras/<相机>/latest                      最新一帧
+    GET /cameras/<相机>/range?start=&end=&limit=    时间戳区间内的帧（YYYYmmddHHMMSS，含端点）
+    GET /cameras/<相机>/points/<编号>?start=&end=&limit=   单个点的历史坐标
+    GET /health                                    各相机数据新鲜度与处理延迟（启用新鲜度监控时）
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ResultCache:
+    """
+    每台相机按时间戳排序的最近 N 帧结果。
+
+    最新帧优先模式下历史帧可能晚于新帧到达，插入时按时间戳定位，超出容量时淘汰最早的帧。
+    """
+
+    def __init__(self, cache_size=1000, logger=None):
+        self.cache_size = cache_size
+        self.logger = logger or logging.getLogger('atli_monitor.query_api')
+        self._timestamps = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def add(self, camera_name, timestamp, points, batch=None, filename=None):
+        """登记一帧结果，points 为按编号排序的 [(x, y), ...]"""
+        if not timestamp:
+            return
+        frame = {
+            'camera': camera_name,
+            'timestamp': timestamp,
+            'batch': batch,
+            'filename': filename,
+            'points': [[index, float(x), float(y)] for index, (x, y) in enumerate(points, 1)],
+        }
+        with self._lock:
+            timestamps = self._timestamps.setdefault(camera_name, [])
+            frames = self._frames.setdefault(camera_name, [])
+            index = bisect.bisect_right(timestamps, timestamp)
+            if index > 0 and timestamps[index - 1] == timestamp:
+                frames[index - 1] = frame
+                return
+            timestamps.insert(index, timestamp)
+            frames.insert(index, frame)
+            if len(timestamps) > self.cache_size:
+                del timestamps[0]
+                del frames[0]
+
+    def load_recent(self, camera_name, camera_processed_path, roi=None):
+        """
+        从最近批次的 pixel/*.txt（多 ROI 相机为 pixel/<roi>/*.txt）预热缓存，返回载入的帧数。
+        截断或无法读取的文件记录警告后跳过。
+        """
+        if not os.path.isdir(camera_processed_path):
+            return 0
+        loaded = 0
+        batches = sorted(
+            (entry.name for entry in os.scandir(camera_processed_path) if entry.is_dir()),
+            reverse=True
+        )
+        for batch in batches:
+            pixel_dir = os.path.join(camera_processed_path, batch, 'pixel')
+            if roi is not None:
+                pixel_dir = os.path.join(pixel_dir, roi)
+            if not os.path.isdir(pixel_dir):
+                continue
+            names = sorted((name for name in os.listdir(pixel_dir) if name.endswith('.txt')), reverse=True)
+            for name in names[:self.cache_size - loaded]:
+                points = []
+                try:
+                    with open(os.path.join(pixel_dir, name), 'r') as f:
+                        for line in f:
+                            parts = line.split()
+                            if len(parts) >= 3:
+                                points.append((float(parts[1]), float(parts[2])))
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"跳过无法解析的结果文件 {os.path.join(pixel_dir, name)}: {e}")
+                    continue
+                self.add(camera_name, name[:-4], points, batch=batch)
+                loaded += 1
+            if loaded >= self.cache_size:
+                break
+        return loaded
+
+    def cameras(self):
+        with self._lock:
+            return {
+                camera: {
+                    'frames': len(timestamps),
+                    'oldest': timestamps[0] if timestamps else None,
+                    'latest': timestamps[-1] if timestamps else None,
+                }
+                for camera, timestamps in self._timestamps.items()
+            }
+
+    def latest(self, camera_name):
+        with self._lock:
+            frames = self._frames.get(camera_name)
+            return frames[-1] if frames else None
+
+    def range(self, camera_name, start=None, end=None, limit=None):
+        """时间戳区间内的帧（按时间升序）；指定 limit 时返回区间内最新的 limit 帧"""
+        with self._lock:
+            timestamps = self._timestamps.get(camera_name, [])
+            lo = bisect.bisect_left(timestamps, start) if start else 0
+            hi = bisect.bisect_right(timestamps, end) if end else len(timestamps)
+            if limit is not None:
+                lo = max(lo, hi - limit)
+            return list(self._frames.get(camera_name, [])[lo:hi])
+
+    def point_history(self, camera_name, point, start=None, end=None, limit=None):
+        """单个点的 [时间戳, x, y] 序列，缺少该编号的帧跳过"""
+        history = []
+        for frame in self.range(camera_name, start, end, limit):
+            if 0 < point <= len(frame['points']):
+                _, x, y = frame['points'][point - 1]
+                history.append([frame['timestamp'], x, y])
+        return history
+
+    def __contains__(self, camera_name):
+        with self._lock:
+            return camera_name in self._timestamps
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """解析路径并从 server.result_cache（/health 为 server.freshness_monitor）读取结果"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        cache = self.server.result_cache
+        try:
+            start = query.get('start')
+            end = query.get('end')
+            limit = int(query['limit']) if 'limit' in query else None
+
+            if parts == ['cameras']:
+                return self._send(200, cache.cameras())
+            if parts == ['health']:
+                freshness_monitor = self.server.freshness_monitor
+                if freshness_monitor is None:
+                    return self._send(404, {'error': "未启用新鲜度监控"})
+                cameras = freshness_monitor.snapshot()
+                status = 200 if not any(state['warnings'] for state in cameras.values()) else 503
+                return self._send(status, {'ok': status == 200, 'cameras': cameras})
+            if len(parts) < 3 or parts[0] != 'cameras':
+                return self._send(404, {'error': f"未知接口: {url.path}"})
+
+            camera_name = parts[1]
+            if camera_name not in cache:
+                return self._send(404, {'error': f"无此相机或暂无结果: {camera_name}"})
+            if parts[2:] == ['latest']:
+                return self._send(200, cache.latest(camera_name))
+            if parts[2:] == ['range']:
+                return self._send(200, cache.range(camera_name, start, end, limit))
+            if len(parts) == 4 and parts[2] == 'points':
+                point = int(parts[3])
+                return self._send(200, {
+                    'camera': camera_name,
+                    'point': point,
+                    'history': cache.point_history(camera_name, point, start, end, limit),
+                })
+            return self._send(404, {'error': f"未知接口: {url.path}"})
+        except ValueError as e:
+            return self._send(400, {'error': f"参数错误: {e}"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(f"查询接口 {self.address_string()} - {format % args}")
+
+
+class QueryServer:
+    """在后台线程运行的本地查询 HTTP 服务"""
+
+    def __init__(self, result_cache, host='127.0.0.1', port=8765, freshness_monitor=None, logger=None):
+        self.result_cache = result_cache
+        self.freshness_monitor = freshness_monitor
+        self.host = host
+        self.port = port
+        self.logger = logger or logging.getLogger('atli_monitor.query_api')
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _QueryHandler)
+        self._server.daemon_threads = True
+        self._server.result_cache = self.result_cache
+        self._server.freshness_monitor = self.freshness_monitor
+        self._server.logger = self.logger
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="QueryServer", daemon=True)
+        self._thread.start()
+        self.logger.info(f"查询接口已启动: http://{self.host}:{self.port}/cameras")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self.logger.info("查询接口已停止")
@@ -0,0 +1,239 @@
+"""
+结果推送模块
+每帧像素坐标计算完成后立即推送给通过本地套接字连接的订阅者（每行一个 JSON，NDJSON），
+告警系统等消费方无需轮询 pixel/*.txt，多个消费方共享同一份计算结果。
+
+地址以 / 开头时监听 Unix 流套接字，否则监听 host:port（TCP）。
+订阅者只需连接并逐行读取，例如:
+    nc 127.0.0.1 8766
+    socat - UNIX-CONNECT:/tmp/atli_results.sock
+
+每个订阅者有独立的有界缓冲区，由单独的 I/O 线程以非阻塞方式发送；
+消费方过慢导致缓冲区满时丢弃该订阅者最早的消息，帧处理线程永不阻塞。
+"""
+
+import collections
+import json
+import logging
+import os
+import selectors
+import socket
+import threading
+
+
+class _Subscriber:
+    """一个已连接的订阅者及其待发送消息"""
+
+    __slots__ = ('sock', 'name', 'queue', 'pending', 'sent', 'dropped', 'events')
+
+    def __init__(self, sock, name, buffer_size):
+        self.sock = sock
+        self.name = name
+        self.queue = collections.deque(maxlen=buffer_size)
+        self.pending = b''
+        self.sent = 0
+        self.dropped = 0
+        self.events = selectors.EVENT_READ
+
+
+class ResultPublisher:
+    """
+    本地套接字发布端。
+
+    publish 在帧处理线程中调用，只做一次序列化并追加到各订阅者的缓冲区后立即返回；
+    连接接入、断开检测与发送都在 I/O 线程中完成。
+    """
+
+    def __init__(self, address='127.0.0.1:8766', buffer_size=1000, logger=None):
+        """
+        Args:
+            address: 监听地址，/path 为 Unix 套接字，host:port 为 TCP
+            buffer_size: 每个订阅者最多缓存的消息条数，超出时丢弃最早的消息
+        """
+        self.address = address
+        self.buffer_size = buffer_size
+        self.logger = logger or logging.getLogger('atli_monitor.result_publisher')
+
+        self.published = 0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._listener = None
+        self._wake_r = None
+        self._wake_w = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """监听地址并启动 I/O 线程；地址被占用等绑定失败时关闭监听套接字并抛出 OSError"""
+        try:
+            if self.address.startswith('/'):
+                if os.path.exists(self.address):
+                    os.unlink(self.address)
+                self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._listener.bind(self.address)
+            else:
+                host, port = self.address.rsplit(':', 1)
+                self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self._listener.bind((host, int(port)))
+                self.address = f"{host}:{self._listener.getsockname()[1]}"
+            self._listener.listen(16)
+        except OSError:
+            if self._listener is not None:
+                self._listener.close()
+                self._listener = None
+            raise
+        self._listener.setblocking(False)
+
+        # 帧处理线程通过 socketpair 唤醒 I/O 线程
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, 'accept')
+        self._selector.register(self._wake_r, selectors.EVENT_READ, 'wake')
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ResultPublisher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"结果推送已启动: {self.address}")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake()
+        self._thread.join()
+        self._thread = None
+
+        for subscriber in list(self._subscribers.values()):
+            self._disconnect(subscriber)
+        self._selector.close()
+        self._listener.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        if self.address.startswith('/') and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.logger.info(f"结果推送已停止 - {self.format_stats()}")
+
+    def publish(self, camera_name, timestamp, points, batch=None, filename=None, history=False):
+        """
+        推送一帧结果，points 为按编号排序的 [(x, y), ...]。
+
+        消息格式与查询接口一致: {camera, timestamp, batch, filename, history, points: [[编号, x, y], ...]}
+        """
+        with self._lock:
+            self.published += 1
+            if not self._subscribers:
+                return
+            message = {
+                'camera': camera_name,
+                'timestamp': timestamp,
+                'batch': batch,
+                'filename': filename,
+                'history': history,
+                'points': [[index, float(x), float(y)] for index, (x, y) in enumerate(points, 1)],
+            }
+            data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+            for subscriber in self._subscribers.values():
+                if len(subscriber.queue) == subscriber.queue.maxlen:
+                    subscriber.dropped += 1
+                subscriber.queue.append(data)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            # 唤醒缓冲区已满说明 I/O 线程尚未处理上一次唤醒，无需重复
+            pass
+
+    def _run(self):
+        while self._running:
+            for key, events in self._selector.select(timeout=1.0):
+                if key.data == 'accept':
+                    self._accept()
+                elif key.data == 'wake':
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    subscriber = key.data
+                    if events & selectors.EVENT_READ and not self._check_alive(subscriber):
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self._flush(subscriber)
+
+            # 有待发送数据的订阅者关注可写事件
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for subscriber in subscribers:
+                events = selectors.EVENT_READ
+                if subscriber.pending or subscriber.queue:
+                    events |= selectors.EVENT_WRITE
+                if events != subscriber.events:
+                    subscriber.events = events
+                    self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        name = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else (address or 'unix')
+        subscriber = _Subscriber(sock, name, self.buffer_size)
+        with self._lock:
+            self._subscribers[sock.fileno()] = subscriber
+        self._selector.register(sock, selectors.EVENT_READ, subscriber)
+        self.logger.info(f"结果订阅者已连接: {name}")
+
+    def _check_alive(self, subscriber):
+        """订阅者不应发送数据，读到 EOF 或出错即视为断开"""
+        try:
+            if subscriber.sock.recv(4096):
+                return True
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        self._disconnect(subscriber)
+        return False
+
+    def _flush(self, subscriber):
+        while True:
+            if not subscriber.pending:
+                with self._lock:
+                    if not subscriber.queue:
+                        return
+                    subscriber.pending = subscriber.queue.popleft()
+            try:
+                sent = subscriber.sock.send(subscriber.pending)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._disconnect(subscriber)
+                return
+            subscriber.pending = subscriber.pending[sent:]
+            if not subscriber.pending:
+                subscriber.sent += 1
+
+    def _disconnect(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber.sock.fileno(), None)
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+        self.logger.info(f"结果订阅者已断开: {subscriber.name}，已发送: {subscriber.sent}, 丢弃: {subscriber.dropped}")
+
+    def format_stats(self):
+        """统计信息的单行日志文本"""
+        with self._lock:
+            dropped = sum(subscriber.dropped for subscriber in self._subscribers.values())
+            return f"已发布: {self.published}帧, 当前订阅者: {len(self._subscribers)}, 丢弃: {dropped}"
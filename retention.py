@@ -0,0 +1,342 @@
+"""
+处理结果保留与归档模块
+后台定期整理 atli_processed/<camera>/TLS_*：
+- 已关闭的批次（非最新批次且一段时间无新文件）将 img/ 与 draw_img/ 打包为单个 tar 归档，减少 inode 数量、加快备份；
+- 按相机的时间/容量配额删除最旧批次的图片归档，pixel/ 坐标文件作为测量记录保留；
+- 删除使用 os.scandir 收集文件后并行执行，全部 I/O 经令牌桶限速，写入繁忙时主动让路给实时处理。
+
+用法:
+    python retention.py [--once] [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import re
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ARCHIVE_PREFIX = 'images'
+IMAGE_SUBDIRS = ('img', 'draw_img')
+_TLS_PATTERN = re.compile(r'^TLS_(\d+)')
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class IoThrottle:
+    """令牌桶限速器，按字节数限制归档/删除的 I/O 速率，并在实时处理繁忙时暂停"""
+
+    def __init__(self, bytes_per_second, busy_check=None, busy_sleep=1.0):
+        self.bytes_per_second = bytes_per_second
+        self.busy_check = busy_check
+        self.busy_sleep = busy_sleep
+        self._allowance = float(bytes_per_second or 0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        """申请 nbytes 的 I/O 额度，不足时休眠等待"""
+        while self.busy_check is not None and self.busy_check():
+            time.sleep(self.busy_sleep)
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self._allowance + (now - self._last) * self.bytes_per_second,
+                                  float(self.bytes_per_second))
+            self._last = now
+            self._allowance -= nbytes
+            wait = -self._allowance / self.bytes_per_second if self._allowance < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _ThrottledReader:
+    """包装文件对象，读取时向限速器申请额度"""
+
+    def __init__(self, fileobj, throttle):
+        self._fileobj = fileobj
+        self._throttle = throttle
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size if 0 < size <= _COPY_CHUNK_SIZE else _COPY_CHUNK_SIZE)
+        self._throttle.consume(len(data))
+        return data
+
+
+def tls_number(folder_name):
+    """提取 TLS_0206 形式批次目录的编号，无法解析时返回 -1"""
+    match = _TLS_PATTERN.match(folder_name)
+    return int(match.group(1)) if match else -1
+
+
+def scan_files(path):
+    """
+    使用 os.scandir 递归收集目录下的文件与子目录。
+
+    Returns:
+        (files, dirs, newest_mtime, total_bytes): files 为 (路径, 字节数) 列表，dirs 按深度优先逆序便于自底向上删除
+    """
+    files = []
+    dirs = []
+    newest_mtime = 0.0
+    total_bytes = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        dirs.append(current)
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size))
+                        total_bytes += stat.st_size
+                        newest_mtime = max(newest_mtime, stat.st_mtime)
+        except FileNotFoundError:
+            continue
+    dirs.reverse()
+    return files, dirs, newest_mtime, total_bytes
+
+
+class RetentionService:
+    """按相机配额归档与清理处理结果的后台服务"""
+
+    def __init__(self, base_processed_path, retention_config=None, busy_check=None, logger=None):
+        """
+        Args:
+            base_processed_path: 处理结果根路径
+            retention_config: 保留策略配置（见 ConfigLoader.get_retention_config）
+            busy_check: 可选回调，返回 True 表示实时处理繁忙，此时暂停归档/删除 I/O
+        """
+        config = dict(retention_config or {})
+        self.base_processed_path = base_processed_path
+        self.interval_seconds = config.get('interval_minutes', 60) * 60
+        self.close_after_seconds = config.get('close_after_minutes', 60) * 60
+        self.default_quota = {
+            'max_age_days': config.get('max_age_days'),
+            'max_size_gb': config.get('max_size_gb'),
+        }
+        self.camera_quotas = config.get('cameras', {}) or {}
+        self.delete_workers = config.get('delete_workers', 4)
+        self.dry_run = config.get('dry_run', False)
+        io_rate_mb = config.get('io_rate_mb', 20)
+        self.throttle = IoThrottle(int(io_rate_mb * 1024 * 1024) if io_rate_mb else 0, busy_check=busy_check)
+        self.logger = logger or logging.getLogger('atli_monitor.retention')
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台线程，按间隔周期执行"""
+        self._thread = threading.Thread(target=self._run_loop, name="RetentionService", daemon=True)
+        self._thread.start()
+        self.logger.info(f"保留策略服务已启动 - 间隔: {self.interval_seconds / 60:.0f}分钟, 根目录: {self.base_processed_path}")
+
+    def stop(self):
+        """停止后台线程（当前步骤完成后退出）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"保留策略执行异常: {e}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def quota_for(self, camera_name):
+        """合并默认配额与相机专属配额"""
+        quota = dict(self.default_quota)
+        quota.update(self.camera_quotas.get(camera_name, {}) or {})
+        return quota
+
+    def run_once(self):
+        """对全部相机执行一次归档与配额清理，返回统计字典"""
+        summary = {'archived_batches': 0, 'archived_files': 0, 'deleted_batches': 0, 'deleted_bytes': 0}
+        if not os.path.isdir(self.base_processed_path):
+            return summary
+
+        with os.scandir(self.base_processed_path) as it:
+            cameras = sorted(entry.name for entry in it if entry.is_dir())
+
+        for camera_name in cameras:
+            if self._stop_event.is_set():
+                break
+            stats = self.process_camera(camera_name)
+            for key in summary:
+                summary[key] += stats[key]
+
+        self.logger.info(f"保留策略执行完成 - 归档批次: {summary['archived_batches']}, "
+                         f"归档文件: {summary['archived_files']}, 删除批次: {summary['deleted_batches']}, "
+                         f"释放: {summary['deleted_bytes'] / 1024 / 1024:.1f}MB")
+        return summary
+
+    def process_camera(self, camera_name):
+        """归档单台相机已关闭的批次，并按配额删除最旧的图片"""
+        stats = {'archived_batches': 0, 'archived_files': 0, 'deleted_batches': 0, 'deleted_bytes': 0}
+        camera_path = os.path.join(self.base_processed_path, camera_name)
+        with os.scandir(camera_path) as it:
+            batches = sorted((entry.path for entry in it if entry.is_dir() and tls_number(entry.name) >= 0),
+                             key=lambda path: tls_number(os.path.basename(path)))
+        if not batches:
+            return stats
+
+        now = time.time()
+        batch_infos = []
+        for index, batch_path in enumerate(batches):
+            if self._stop_event.is_set():
+                return stats
+            files, _, newest_mtime, total_bytes = scan_files(batch_path)
+            is_latest = index == len(batches) - 1
+            closed = not is_latest and now - newest_mtime >= self.close_after_seconds
+            if closed:
+                archived = self.archive_batch(batch_path)
+                if archived:
+                    stats['archived_batches'] += 1
+                    stats['archived_files'] += archived
+                    files, _, newest_mtime, total_bytes = scan_files(batch_path)
+            image_bytes = sum(size for path, size in files if not path.endswith('.txt'))
+            batch_infos.append((batch_path, closed, newest_mtime, image_bytes))
+
+        quota = self.quota_for(camera_name)
+        max_age_days = quota.get('max_age_days')
+        max_size_gb = quota.get('max_size_gb')
+        total_image_bytes = sum(info[3] for info in batch_infos)
+
+        # 从最旧的已关闭批次开始删除图片，直至满足时间与容量配额
+        for batch_path, closed, newest_mtime, image_bytes in batch_infos:
+            if not closed or image_bytes == 0:
+                continue
+            too_old = max_age_days is not None and now - newest_mtime > max_age_days * 86400
+            too_large = max_size_gb is not None and total_image_bytes > max_size_gb * 1024 ** 3
+            if not (too_old or too_large):
+                continue
+            freed = self.delete_batch_images(batch_path)
+            total_image_bytes -= freed
+            stats['deleted_batches'] += 1
+            stats['deleted_bytes'] += freed
+            reason = "超过保留天数" if too_old else "超过容量配额"
+            self.logger.info(f"删除批次图片: {camera_name}/{os.path.basename(batch_path)} - {reason}, "
+                             f"释放: {freed / 1024 / 1024:.1f}MB")
+        return stats
+
+    def _next_archive_path(self, batch_path):
+        path = os.path.join(batch_path, f"{ARCHIVE_PREFIX}.tar")
+        index = 1
+        while os.path.exists(path):
+            path = os.path.join(batch_path, f"{ARCHIVE_PREFIX}.{index}.tar")
+            index += 1
+        return path
+
+    def archive_batch(self, batch_path):
+        """
+        将批次内 img/、draw_img/ 下的散落图片打包为一个 tar 归档（不压缩，JPEG 本身已压缩）。
+
+        先写临时文件并 fsync，原子重命名后再删除原文件；归档的修改时间取其中最新图片的时间。
+        返回归档的文件数。
+        """
+        members = []
+        newest_mtime = 0.0
+        for subdir in IMAGE_SUBDIRS:
+            subdir_path = os.path.join(batch_path, subdir)
+            if os.path.isdir(subdir_path):
+                files, _, subdir_mtime, _ = scan_files(subdir_path)
+                members.extend(files)
+                newest_mtime = max(newest_mtime, subdir_mtime)
+        if not members:
+            return 0
+
+        archive_path = self._next_archive_path(batch_path)
+        if self.dry_run:
+            self.logger.info(f"[dry-run] 归档批次: {batch_path} -> {archive_path} ({len(members)}个文件)")
+            return len(members)
+
+        tmp_path = f"{archive_path}.tmp"
+        members.sort()
+        with open(tmp_path, 'wb') as raw:
+            with tarfile.open(fileobj=raw, mode='w', format=tarfile.PAX_FORMAT) as tar:
+                for path, _ in members:
+                    tarinfo = tar.gettarinfo(path, arcname=os.path.relpath(path, batch_path))
+                    with open(path, 'rb') as f:
+                        tar.addfile(tarinfo, _ThrottledReader(f, self.throttle))
+            raw.flush()
+            os.fsync(raw.fileno())
+        # 归档沿用其中最新图片的修改时间，保留天数仍按图片本身计算
+        os.utime(tmp_path, (newest_mtime, newest_mtime))
+        os.replace(tmp_path, archive_path)
+
+        self._parallel_remove([path for path, _ in members])
+        self.logger.info(f"批次已归档: {archive_path} ({len(members)}个文件)")
+        return len(members)
+
+    def delete_batch_images(self, batch_path):
+        """删除批次的图片归档与散落图片，保留 pixel/ 坐标文件；返回释放的字节数"""
+        targets = []
+        with os.scandir(batch_path) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.startswith(ARCHIVE_PREFIX) and entry.name.endswith('.tar'):
+                    targets.append((entry.path, entry.stat().st_size))
+        for subdir in IMAGE_SUBDIRS:
+            subdir_path = os.path.join(batch_path, subdir)
+            if os.path.isdir(subdir_path):
+                files, _, _, _ = scan_files(subdir_path)
+                targets.extend(files)
+
+        freed = sum(size for _, size in targets)
+        if self.dry_run:
+            self.logger.info(f"[dry-run] 删除批次图片: {batch_path} ({len(targets)}个文件)")
+            return freed
+        self._parallel_remove([path for path, _ in targets])
+        return freed
+
+    def _parallel_remove(self, paths):
+        """并行删除文件，每次删除计入一个文件系统块的 I/O 额度"""
+        def remove(path):
+            self.throttle.consume(4096)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"删除文件失败: {path} - {e}")
+
+        with ThreadPoolExecutor(max_workers=self.delete_workers) as executor:
+            list(executor.map(remove, paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='atli_processed 归档与保留策略')
+    parser.add_argument('--config', default='config.yaml', help='配置文件路径')
+    parser.add_argument('--once', action='store_true', help='只执行一次后退出')
+    parser.add_argument('--dry-run', action='store_true', help='只打印将执行的操作')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from config_loader import load_config
+    config = load_config(args.config)
+    retention_config = config.get_retention_config()
+    if args.dry_run:
+        retention_config['dry_run'] = True
+
+    service = RetentionService(config.get_base_processed_path(), retention_config)
+    if args.once:
+        service.run_once()
+        return
+
+    service.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+采样性能分析模块
+生产环境延迟突增时无法挂调试器，可向监控进程发送 SIGUSR1 临时开启采样:
+
+    sudo systemctl kill -s USR1 --kill-who=main atli-camera-monitor    # 或 kill -USR1 <pid>
+
+采样线程按固定间隔读取所有线程的 Python 调用栈（sys._current_frames），持续配置的时长后写出：
+
+- profile_<时间>.collapsed: 折叠栈格式（线程名;外层函数;...;内层函数 采样数），
+  可直接用 flamegraph.pl 生成火焰图或拖入 speedscope.app 查看；
+- profile_<时间>_top.txt: 各线程采样数，以及按自身/累计采样数排序的热点函数（不含空闲等待）。
+
+未触发时只登记信号处理函数，不启动线程，对处理流程没有额外开销。
+"""
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# 空闲等待（条件变量、线程 join、select、inotify 轮询）的栈顶函数，热点函数统计中不计入
+IDLE_FUNCTIONS = {('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+                  ('selectors.py', 'select'), ('inotify_c.py', 'do_poll')}
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_label(thread):
+    """线程名；未命名的线程（Thread-N）加上类型，如 InotifyEmitter-5"""
+    if thread.name.startswith('Thread-'):
+        return f"{type(thread).__name__}-{thread.name[len('Thread-'):]}"
+    return thread.name
+
+
+class SamplingProfiler:
+    """对全部线程采样的一次性分析器，每次 start 采样 duration 秒后写出结果"""
+
+    def __init__(self, output_dir, duration=30, interval=0.005, top_n=30, logger=None):
+        """
+        Args:
+            output_dir: 结果文件目录（默认与日志文件同目录）
+            duration: 每次采样时长（秒）
+            interval: 采样间隔（秒）
+            top_n: 热点函数列表的条数
+        """
+        self.output_dir = output_dir
+        self.duration = duration
+        self.interval = interval
+        self.top_n = top_n
+        self.logger = logger or logging.getLogger('atli_monitor.sampling_profiler')
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=None):
+        """
+        开始一次后台采样并立即返回；已在采样时忽略。可在信号处理函数中调用。
+
+        信号处理函数在主线程中执行，前一个信号的处理尚未返回时可能再次进入，
+        因此不阻塞等待锁，取不到锁时同样视为正在采样。
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self.running:
+                self.logger.info("性能采样正在进行，忽略本次请求")
+                return False
+            self._thread = threading.Thread(target=self._run, args=(duration or self.duration,),
+                                            name="SamplingProfiler", daemon=True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+        return True
+
+    def handle_signal(self, signum, frame):
+        """信号处理函数（signal.signal 的回调）"""
+        self.start()
+
+    def _run(self, duration):
+        self.logger.info(f"性能采样开始 - 时长: {duration}秒, 间隔: {self.interval * 1000:.1f}ms")
+        started = time.time()
+        stacks = collections.Counter()
+        idle_stacks = set()
+        samples = 0
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            names = {thread.ident: _thread_label(thread) for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                code = frame.f_code
+                idle = (os.path.basename(code.co_filename), code.co_name) in IDLE_FUNCTIONS
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stack = tuple(reversed(labels))
+                stacks[stack] += 1
+                if idle:
+                    idle_stacks.add(stack)
+            samples += 1
+            time.sleep(self.interval)
+
+        try:
+            collapsed_path, top_path = self.write(stacks, idle_stacks, samples, started, time.time() - started)
+            self.logger.info(f"性能采样完成 - 采样: {samples}次, 折叠栈: {collapsed_path}, 热点函数: {top_path}")
+        except OSError as e:
+            self.logger.error(f"性能采样结果写入失败: {e}")
+
+    def write(self, stacks, idle_stacks, samples, started, elapsed):
+        """写出折叠栈（含空闲等待）与热点函数摘要（不含空闲等待），返回两个文件路径"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"profile_{datetime.fromtimestamp(started).strftime('%Y%m%d_%H%M%S')}")
+        collapsed_path = prefix + '.collapsed'
+        top_path = prefix + '_top.txt'
+
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(';'.join(stack) + f" {count}\n")
+
+        threads = collections.Counter()
+        busy_threads = collections.Counter()
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        for stack, count in stacks.items():
+            threads[stack[0]] += count
+            if stack in idle_stacks:
+                continue
+            busy_threads[stack[0]] += count
+            if len(stack) > 1:
+                self_counts[stack[-1]] += count
+            # 递归调用在同一栈中只计一次
+            for label in set(stack[1:]):
+                total_counts[label] += count
+        busy_samples = sum(busy_threads.values()) or 1
+
+        with open(top_path, 'w', encoding='utf-8') as f:
+            f.write(f"采样时长: {elapsed:.1f}秒, 采样: {samples}次, 间隔: {self.interval * 1000:.1f}ms\n\n")
+            f.write("线程采样数（非空闲/全部）:\n")
+            for name, count in threads.most_common():
+                f.write(f"  {busy_threads[name]:8d} / {count:<8d}  {name}\n")
+            # 百分比为占全部非空闲采样的比例
+            for title, counter in (("自身采样（栈顶函数）", self_counts), ("累计采样（含调用的函数）", total_counts)):
+                f.write(f"\n{title} Top {self.top_n}:\n")
+                for label, count in counter.most_common(self.top_n):
+                    f.write(f"  {count:8d}  {count / busy_samples * 100:6.2f}%  {label}\n")
+        return collapsed_path, top_path
@@ -1,10 +1,14 @@
 import os
+import io
+import csv
+import random
 import shutil
 import time
+import argparse
 import threading
 from pathlib import Path
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 设置日志记录
 logging.basicConfig(
@@ -120,13 +124,338 @@ class CameraSimulator:
         logger.info("所有相机传输完成")
 
 
+# 负载测试中写入 EXIF DateTime 的占位符，每帧替换为唯一的时间戳（长度固定 19 字节）
+EXIF_PLACEHOLDER = b'2000:01:01 00:00:00'
+
+
+def make_frame_template(jpeg_bytes):
+    """
+    生成带 EXIF DateTime 占位符的 JPEG 模板。
+
+    已有 DateTime 的图片直接替换其原值；没有 EXIF 的图片在 SOI 后插入最小 APP1 段。
+    JPEG 结束标记之后的填充字节会被解码器忽略，可用于调整文件大小。
+    """
+    from PIL import Image
+
+    exif = Image.open(io.BytesIO(jpeg_bytes)).getexif()
+    old_time = exif.get(306)
+    if isinstance(old_time, str) and len(old_time.encode()) == len(EXIF_PLACEHOLDER):
+        return jpeg_bytes.replace(old_time.encode(), EXIF_PLACEHOLDER)
+
+    new_exif = Image.Exif()
+    new_exif[306] = EXIF_PLACEHOLDER.decode()
+    payload = new_exif.tobytes()
+    app1 = b'\xff\xe1' + (len(payload) + 2).to_bytes(2, 'big') + payload
+    return jpeg_bytes[:2] + app1 + jpeg_bytes[2:]
+
+
+def synthesize_frames(count, width, height, quality=90, seed=0):
+    """
+    合成 count 张互不相同的测试图片（噪声背景 + 红色方块标志物），返回 JPEG 字节列表。
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        img = rng.integers(40, 200, size=(height, width, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (0, 0), 3 + i % 5)
+        for row in range(4):
+            for col in range(6):
+                x = int(width * (0.3 + col * 0.07)) + int(rng.integers(-5, 6))
+                y = int(height * (0.3 + row * 0.1)) + int(rng.integers(-5, 6))
+                cv2.rectangle(img, (x, y), (x + 20, y + 30), (0, 0, 230), -1)
+        ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(encoded.tobytes())
+    return frames
+
+
+class LoadGenerator:
+    """
+    负载测试模式：模拟 N 台相机以可配置帧率/突发模式上传，并测量端到端延迟。
+
+    图片以 FTP 服务器的方式分块慢速写入（文件先出现、内容逐步写完），
+    从文件创建到对应 pixel/<时间戳>.txt 出现的时间即为端到端延迟。
+    """
+
+    def __init__(self, target_base_path, processed_base_path, frame_templates, camera_count=2,
+                 camera_prefix='camera', file_size=None, chunk_size=256 * 1024, chunk_delay=0.01,
+                 burst_size=1, poll_interval=0.1):
+        """
+        Args:
+            target_base_path: 上传根目录（监控程序的 base_upload_path）
+            processed_base_path: 处理结果根目录（监控程序的 base_processed_path）
+            frame_templates: make_frame_template 生成的 JPEG 模板列表，循环使用
+            camera_count: 模拟相机数量，目录名为 {camera_prefix}{1..N}，需与监控配置一致
+            file_size: 目标文件大小（字节），大于图片本身时在结束标记后填充
+            chunk_size / chunk_delay: 分块写入大小与块间延迟，模拟慢速 FTP 写入
+            burst_size: 每次突发连续上传的帧数（平均帧率不变）
+            poll_interval: 结果文件轮询间隔（秒）
+        """
+        self.target_base_path = Path(target_base_path)
+        self.processed_base_path = Path(processed_base_path)
+        self.frame_templates = frame_templates
+        self.cameras = [f"{camera_prefix}{i}" for i in range(1, camera_count + 1)]
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.burst_size = max(1, burst_size)
+        self.poll_interval = poll_interval
+
+        self._pending = {}
+        self._latencies = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # 每台相机独立的虚拟拍摄时间，保证 EXIF 时间戳（即结果文件名）唯一
+        self._clock = {camera: datetime(2025, 1, 1) for camera in self.cameras}
+        # 上一个批次编号，run_curve 开始时取各相机目录中已有的最大编号
+        self._batch_number = None
+
+    def latest_batch_number(self):
+        """各相机上传目录中已有 TLS_* 目录的最大批次编号（与监控程序相同，取 TLS_ 后 4 位），没有时为 999"""
+        latest = 999
+        for camera in self.cameras:
+            camera_dir = self.target_base_path / camera
+            if not camera_dir.is_dir():
+                continue
+            for entry in camera_dir.iterdir():
+                if entry.is_dir() and entry.name.startswith('TLS_'):
+                    try:
+                        latest = max(latest, int(entry.name[4:8]))
+                    except ValueError:
+                        continue
+        return latest
+
+    def _next_frame(self, camera, index):
+        shot_time = self._clock[camera] = self._clock[camera] + timedelta(seconds=1)
+        exif_time = shot_time.strftime('%Y:%m:%d %H:%M:%S').encode()
+        data = self.frame_templates[index % len(self.frame_templates)].replace(EXIF_PLACEHOLDER, exif_time)
+        if self.file_size and self.file_size > len(data):
+            data += b'\0' * (self.file_size - len(data))
+        return data, shot_time.strftime('%Y%m%d%H%M%S')
+
+    def _write_like_ftp(self, path, data):
+        """分块写入，块间休眠，模拟 FTP 上传过程"""
+        with open(path, 'wb') as f:
+            for offset in range(0, len(data), self.chunk_size):
+                f.write(data[offset:offset + self.chunk_size])
+                f.flush()
+                if self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+
+    def _camera_loop(self, camera, batch_folder, rate, duration):
+        """按平均帧率 rate（帧/秒）上传，每次突发 burst_size 帧"""
+        upload_dir = self.target_base_path / camera / batch_folder
+        processed_pixel_dir = self.processed_base_path / camera / batch_folder[:8] / 'pixel'
+        burst_period = self.burst_size / rate
+        # 随机错开各相机起始时间，避免完全同步
+        time.sleep(random.uniform(0, min(burst_period, 1.0)))
+        deadline = time.time() + duration
+        index = 0
+        next_burst = time.time()
+        while time.time() < deadline and not self._stop_event.is_set():
+            for _ in range(self.burst_size):
+                data, timestamp = self._next_frame(camera, index)
+                image_path = upload_dir / f"{batch_folder}_{index + 1:04d}.jpg"
+                created = time.time()
+                with self._lock:
+                    self._pending[processed_pixel_dir / f"{timestamp}.txt"] = created
+                try:
+                    self._write_like_ftp(image_path, data)
+                except Exception as e:
+                    logger.error(f"相机 {camera}: 写入失败 {image_path} - {e}")
+                index += 1
+            next_burst += burst_period
+            time.sleep(max(0.0, next_burst - time.time()))
+
+    def _poll_results(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                pending = list(self._pending.items())
+            for pixel_path, created in pending:
+                try:
+                    completed = os.stat(pixel_path).st_mtime
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    if self._pending.pop(pixel_path, None) is not None:
+                        self._latencies.append((created, max(0.0, completed - created)))
+            self._stop_event.wait(self.poll_interval)
+
+    def run_step(self, rate, duration, drain):
+        """
+        以每台相机 rate 帧/秒运行 duration 秒，再等待 drain 秒收尾，返回该档位的统计结果。
+        """
+        # 监控程序只跟踪编号最大的批次目录，且按 TLS_ 后固定 4 位解析编号，新批次必须大于已有编号且不超过 9999
+        if self._batch_number is None:
+            self._batch_number = self.latest_batch_number()
+        if self._batch_number >= 9999:
+            raise RuntimeError(f"批次编号已到 TLS_{self._batch_number:04d}，无法创建更大编号的批次目录，"
+                               f"请先清理 {self.target_base_path} 下各相机的旧 TLS_* 目录")
+        self._batch_number += 1
+        batch_folder = f"TLS_{self._batch_number:04d}"
+        for camera in self.cameras:
+            (self.target_base_path / camera / batch_folder).mkdir(parents=True, exist_ok=True)
+        # 给监控程序切换到新批次目录留出时间
+        time.sleep(1)
+
+        with self._lock:
+            self._pending.clear()
+            self._latencies = []
+        self._stop_event.clear()
+        poller = threading.Thread(target=self._poll_results, name="LoadTest-poller", daemon=True)
+        poller.start()
+
+        start = time.time()
+        threads = [
+            threading.Thread(target=self._camera_loop, args=(camera, batch_folder, rate, duration),
+                             name=f"LoadTest-{camera}", daemon=True)
+            for camera in self.cameras
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        drain_deadline = time.time() + drain
+        while time.time() < drain_deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+            time.sleep(self.poll_interval)
+        self._stop_event.set()
+        poller.join()
+
+        with self._lock:
+            latencies = sorted(latency for _, latency in self._latencies)
+            completed_times = [created + latency for created, latency in self._latencies]
+            lost = len(self._pending)
+
+        def percentile(q):
+            if not latencies:
+                return float('nan')
+            return latencies[min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))]
+
+        elapsed = (max(completed_times) - start) if completed_times else duration
+        result = {
+            'rate_per_camera': rate,
+            'offered_fps': rate * len(self.cameras),
+            'sent': len(latencies) + lost,
+            'completed': len(latencies),
+            'lost': lost,
+            'throughput_fps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if latencies else float('nan'),
+        }
+        logger.info(f"负载档位 {rate} 帧/秒/相机 - 提供: {result['offered_fps']:.2f} 帧/秒, "
+                    f"完成: {result['completed']}/{result['sent']}, 吞吐: {result['throughput_fps']:.2f} 帧/秒, "
+                    f"延迟 p50/p95/p99: {result['p50']:.2f}/{result['p95']:.2f}/{result['p99']:.2f}秒")
+        return result
+
+    def run_curve(self, rates, duration, drain, output_path=None):
+        """依次运行各负载档位，输出吞吐/延迟曲线（可选写入 CSV）；每个档位使用一个新的批次目录"""
+        self._batch_number = self.latest_batch_number()
+        if self._batch_number + len(rates) > 9999:
+            raise RuntimeError(f"已有批次编号 TLS_{self._batch_number:04d}，{len(rates)} 个档位将超过 TLS_9999，"
+                               f"请先清理 {self.target_base_path} 下各相机的旧 TLS_* 目录")
+        results = [self.run_step(rate, duration, drain) for rate in rates]
+
+        print("\n" + "=" * 90)
+        print(f"{'帧/秒/相机':>10} {'提供帧/秒':>10} {'吞吐帧/秒':>10} {'完成':>6} {'丢失':>6} "
+              f"{'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} {'max(s)':>8}")
+        for r in results:
+            print(f"{r['rate_per_camera']:>10.3f} {r['offered_fps']:>10.2f} {r['throughput_fps']:>10.2f} "
+                  f"{r['completed']:>6} {r['lost']:>6} {r['p50']:>8.2f} {r['p95']:>8.2f} "
+                  f"{r['p99']:>8.2f} {r['max']:>8.2f}")
+        print("=" * 90)
+
+        if output_path:
+            with open(output_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+                writer.writeheader()
+                writer.writerows(results)
+            logger.info(f"吞吐/延迟曲线已保存: {output_path}")
+        return results
+
+
+def load_frame_templates(source_base_path, synthetic=None, quality=90):
+    """从源目录收集图片（或合成图片）并生成 EXIF 模板"""
+    if synthetic:
+        width, height = (int(v) for v in synthetic.lower().split('x'))
+        frames = synthesize_frames(8, width, height, quality=quality)
+    else:
+        frames = [
+            path.read_bytes() for path in sorted(Path(source_base_path).rglob('*'))
+            if path.is_file() and path.suffix.lower() in ['.jpg', '.jpeg']
+        ]
+    return [make_frame_template(frame) for frame in frames]
+
+
+def run_load_test(args):
+    """负载测试入口"""
+    templates = load_frame_templates(args.source, args.synthetic, args.quality)
+    if not templates:
+        logger.error(f"没有可用的测试图片: {args.source}（可使用 --synthetic 4000x3000 合成图片）")
+        return
+
+    generator = LoadGenerator(
+        args.target,
+        args.processed,
+        templates,
+        camera_count=args.cameras,
+        camera_prefix=args.camera_prefix,
+        file_size=int(args.file_size_mb * 1024 * 1024) if args.file_size_mb else None,
+        chunk_size=int(args.chunk_kb * 1024),
+        chunk_delay=args.chunk_delay,
+        burst_size=args.burst
+    )
+    logger.info(f"负载测试: {args.cameras} 台相机 ({generator.cameras[0]}..{generator.cameras[-1]})，"
+                f"请确认监控配置中包含这些相机；建议关闭 processing.dedup 以免近似帧被复用")
+    rates = [float(v) for v in args.rates.split(',')]
+    try:
+        generator.run_curve(rates, args.duration, args.drain, args.output)
+    except RuntimeError as e:
+        logger.error(f"负载测试无法开始: {e}")
+        raise SystemExit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='相机图片传输模拟器')
+    parser.add_argument('--source', default='serve_text_data', help='源图片目录')
+    parser.add_argument('--target', default='RT_text/atli_uploads', help='上传目标目录')
+    parser.add_argument('--load-test', action='store_true', help='负载测试模式')
+    parser.add_argument('--processed', default='RT_text/atli_processed', help='处理结果目录（负载测试测量延迟用）')
+    parser.add_argument('--cameras', type=int, default=2, help='模拟相机数量')
+    parser.add_argument('--camera-prefix', default='camera', help='相机目录名前缀')
+    parser.add_argument('--rates', default='0.1,0.2,0.5,1', help='各档位每台相机帧率（帧/秒），逗号分隔')
+    parser.add_argument('--duration', type=float, default=60, help='每档位持续时间（秒）')
+    parser.add_argument('--drain', type=float, default=60, help='每档位结束后等待处理完成的最长时间（秒）')
+    parser.add_argument('--burst', type=int, default=1, help='每次突发连续上传帧数')
+    parser.add_argument('--file-size-mb', type=float, default=0, help='填充到的目标文件大小（MB）')
+    parser.add_argument('--synthetic', help='合成图片尺寸，如 4000x3000；不指定时复用源目录图片')
+    parser.add_argument('--quality', type=int, default=90, help='合成图片 JPEG 质量')
+    parser.add_argument('--chunk-kb', type=float, default=256, help='FTP 分块写入大小（KB）')
+    parser.add_argument('--chunk-delay', type=float, default=0.01, help='分块写入间隔（秒）')
+    parser.add_argument('--output', default='load_curve.csv', help='吞吐/延迟曲线 CSV 输出路径')
+    return parser.parse_args()
+
+
 def main():
     """
     主函数
     """
+    args = parse_args()
+    if args.load_test:
+        run_load_test(args)
+        return
+
     # 配置路径和映射关系
-    SOURCE_BASE = "serve_text_data"
-    TARGET_BASE = "RT_text/atli_uploads"
+    SOURCE_BASE = args.source
+    TARGET_BASE = args.target
 
     # 相机映射关系：{源相机文件夹: 目标相机文件夹}
     CAMERA_MAPPING = {
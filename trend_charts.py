@@ -0,0 +1,329 @@
+"""
+位移趋势图生成工具
+按相机（多 ROI 相机按 ROI）绘制每个点相对初始坐标的位移-时间曲线（matplotlib Agg 后端，无需图形界面），
+适合由 cron / systemd timer 定期执行。
+
+坐标序列增量缓存在 cache_dir 中：每个序列一个定长记录的追加文件（时间, 批次编号, P1_x, P1_y, ...）
+与一个状态文件（各批次 pixel 目录的修改时间与已读取帧数）。每次运行只读取修改过的批次中新增的坐标文件
+并追加到缓存，不重读历史；没有新数据的序列不重新绘图。
+
+用法:
+    python trend_charts.py                                  # 按 config.yaml 的 trend_charts 配置生成全部相机
+    python trend_charts.py --camera camera1 --days 30       # 只画最近 30 天
+    python trend_charts.py --rebuild                        # 丢弃缓存，从全部历史重建
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from export_coords import list_streams, read_points, stream_label
+
+STATE_VERSION = 1
+
+
+def _stream_file_name(camera_name, roi):
+    return camera_name if roi is None else f"{camera_name}_{roi}"
+
+
+def _exif_seconds(timestamp):
+    try:
+        return datetime.strptime(timestamp, '%Y%m%d%H%M%S').timestamp()
+    except ValueError:
+        return None
+
+
+class SeriesCache:
+    """
+    单个坐标序列的增量缓存。
+
+    记录为 float64 定长行 [时间(秒), 批次编号, P1_x, P1_y, ...]，只追加写入；
+    点数取第一次读到的帧，之后点数不同的帧多出的点忽略、缺失的点为 NaN。
+    """
+
+    def __init__(self, cache_dir, camera_name, roi=None):
+        self.camera_name = camera_name
+        self.roi = roi
+        name = _stream_file_name(camera_name, roi)
+        self.data_path = os.path.join(cache_dir, f"{name}.f64")
+        self.state_path = os.path.join(cache_dir, f"{name}.json")
+        self.state = {'version': STATE_VERSION, 'points': 0, 'rows': 0, 'batches': {}, 'rendered_rows': -1}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('version') == STATE_VERSION:
+                    self.state.update(state)
+            except (OSError, ValueError):
+                pass
+        self._truncate_to_state()
+
+    @property
+    def width(self):
+        return 2 + 2 * self.state['points']
+
+    def _truncate_to_state(self):
+        """缓存更新中断时数据文件可能多出未记入状态的行，截断到状态记录的行数；数据文件缺失时重建"""
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        expected = self.state['rows'] * self.width * 8
+        if size < expected:
+            self.state.update({'points': 0, 'rows': 0, 'batches': {}, 'rendered_rows': -1})
+            expected = 0
+        if size > expected:
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(expected)
+
+    def _batch_id(self, batch_name):
+        batch = self.state['batches'].get(batch_name)
+        if batch is None:
+            batch = self.state['batches'][batch_name] = {'id': len(self.state['batches']), 'mtime_ns': 0,
+                                                         'count': 0, 'last': ''}
+        return batch
+
+    def update(self, batches):
+        """
+        读取各批次新增的坐标文件并追加到缓存。
+
+        Args:
+            batches: 批次目录列表（TLS_* 路径）
+        Returns:
+            int: 新追加的帧数
+        """
+        appended = 0
+        for batch_path in batches:
+            batch_name = os.path.basename(batch_path)
+            pixel_dir = os.path.join(batch_path, 'pixel')
+            if self.roi is not None:
+                pixel_dir = os.path.join(pixel_dir, self.roi)
+            try:
+                mtime_ns = os.stat(pixel_dir).st_mtime_ns
+            except OSError:
+                continue
+            cached = self.state['batches'].get(batch_name)
+            if cached is not None and cached['mtime_ns'] == mtime_ns:
+                continue
+
+            with os.scandir(pixel_dir) as it:
+                names = sorted(entry.name[:-4] for entry in it if entry.name.endswith('.txt'))
+            batch = self._batch_id(batch_name)
+            if len(names) != batch['count']:
+                appended += self._append_batch(batch, pixel_dir, names)
+            batch['mtime_ns'] = mtime_ns
+            batch['count'] = len(names)
+        self.save_state()
+        return appended
+
+    def _append_batch(self, batch, pixel_dir, names):
+        """
+        追加批次中尚未缓存的帧。
+
+        通常新帧的时间戳都晚于批次已读取的最后一帧，直接追加；latest_first 调度补处理的历史帧
+        可能早于已读取的帧，此时才从缓存取出该批次已有的时间戳去重。
+        """
+        new_names = [name for name in names if name > batch['last']]
+        known = set()
+        if len(names) - len(new_names) != batch['count']:
+            data = self.load(ordered=False)
+            known = set(data[data[:, 1] == batch['id'], 0].tolist())
+            new_names = names
+        rows = []
+        for name in new_names:
+            seconds = _exif_seconds(name)
+            if seconds is None or seconds in known:
+                continue
+            try:
+                points = read_points(os.path.join(pixel_dir, f"{name}.txt"))
+            except (OSError, ValueError):
+                continue
+            if not self.state['points']:
+                self.state['points'] = max(points, default=0)
+                if not self.state['points']:
+                    continue
+            row = np.full(self.width, np.nan)
+            row[0] = seconds
+            row[1] = batch['id']
+            for idx, (x, y) in points.items():
+                if 1 <= idx <= self.state['points']:
+                    row[2 * idx:2 * idx + 2] = (x, y)
+            rows.append(row)
+        if names:
+            batch['last'] = max(batch['last'], names[-1])
+        if rows:
+            with open(self.data_path, 'ab') as f:
+                np.vstack(rows).tofile(f)
+            self.state['rows'] += len(rows)
+        return len(rows)
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self, ordered=True):
+        """缓存的全部记录，形状 (帧数, 2 + 2 * 点数)；ordered 时按时间升序"""
+        if not self.state['rows']:
+            return np.empty((0, self.width))
+        data = np.fromfile(self.data_path, dtype=np.float64, count=self.state['rows'] * self.width)
+        data = data.reshape(-1, self.width)
+        return data[np.argsort(data[:, 0], kind='stable')] if ordered else data
+
+    @property
+    def changed(self):
+        return self.state['rows'] != self.state['rendered_rows']
+
+
+def render_chart(data, reference, title, output_path, columns=4, dpi=100, since=None):
+    """
+    绘制每个点的位移-时间曲线（每个点一个子图），写出 PNG。
+
+    Args:
+        data: SeriesCache.load() 的记录
+        reference: 初始坐标 (点数, 2)，位移为 sqrt(dx^2 + dy^2)
+        since: 只绘制该时间（秒）之后的帧
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    if since is not None:
+        data = data[data[:, 0] >= since]
+    point_count = (data.shape[1] - 2) // 2
+    # 缓存中的时间是按本地时区换算的 EXIF 时间，还原为本地（不带时区）时间绘制；
+    # datetime64 会把这些秒数当作 UTC 显示，时间轴整体偏移时区差
+    times = [datetime.fromtimestamp(seconds) for seconds in data[:, 0]]
+    coords = data[:, 2:].reshape(len(data), point_count, 2)
+    displacement = np.hypot(coords[:, :, 0] - reference[:point_count, 0], coords[:, :, 1] - reference[:point_count, 1])
+
+    columns = max(1, min(columns, point_count))
+    rows = math.ceil(point_count / columns)
+    fig, axes = plt.subplots(rows, columns, figsize=(4 * columns, 2.4 * rows + 0.6), sharex=True, squeeze=False)
+    try:
+        for idx, ax in enumerate(axes.flat):
+            if idx >= point_count:
+                ax.set_visible(False)
+                continue
+            ax.plot(times, displacement[:, idx], linewidth=0.8)
+            ax.set_title(f"P{idx + 1}", fontsize=9)
+            ax.grid(True, linewidth=0.3)
+            ax.tick_params(labelsize=7)
+            if idx % columns == 0:
+                ax.set_ylabel('displacement (px)', fontsize=8)
+        locator = mdates.AutoDateLocator()
+        axes[0][0].xaxis.set_major_locator(locator)
+        axes[0][0].xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        fig.suptitle(title, fontsize=11)
+        fig.tight_layout()
+        tmp_path = f"{output_path}.tmp.png"
+        fig.savefig(tmp_path, dpi=dpi)
+        os.replace(tmp_path, output_path)
+    finally:
+        plt.close(fig)
+
+
+class TrendChartGenerator:
+    """全部相机的缓存更新与趋势图生成"""
+
+    def __init__(self, base_processed_path, trend_config=None, references=None, logger=None):
+        """
+        Args:
+            base_processed_path: 处理结果根路径
+            trend_config: 趋势图配置（见 ConfigLoader.get_trend_chart_config）
+            references: {序列名称(相机 或 相机:ROI): 初始坐标}，缺省时以缓存的第一帧为参考
+        """
+        config = dict(trend_config or {})
+        self.base_processed_path = base_processed_path
+        self.cache_dir = config.get('cache_dir', 'trend_cache')
+        self.output_dir = config.get('output_dir', 'trend_charts')
+        self.columns = config.get('columns', 4)
+        self.dpi = config.get('dpi', 100)
+        self.days = config.get('days', 0)
+        self.references = references or {}
+        self.logger = logger or logging.getLogger('atli_monitor.trend_charts')
+
+    def run_once(self, cameras=None, force=False):
+        """更新缓存并重绘有新数据的序列，返回 {序列名称: 新追加帧数}（未重绘的序列不列出）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        rendered = {}
+        for camera_name, roi, batches in list_streams(self.base_processed_path, cameras):
+            label = stream_label(camera_name, roi)
+            cache = SeriesCache(self.cache_dir, camera_name, roi)
+            appended = cache.update(batches)
+            output_path = os.path.join(self.output_dir, f"{_stream_file_name(camera_name, roi)}.png")
+            if not cache.state['rows']:
+                continue
+            if not force and not cache.changed and os.path.exists(output_path):
+                continue
+
+            data = cache.load()
+            reference = self.references.get(label)
+            if reference is None or len(reference) < cache.state['points']:
+                reference = data[0, 2:].reshape(-1, 2)
+            since = time.time() - self.days * 86400 if self.days else None
+            started = time.time()
+            render_chart(data, np.asarray(reference, dtype=np.float64), label, output_path,
+                         columns=self.columns, dpi=self.dpi, since=since)
+            cache.state['rendered_rows'] = cache.state['rows']
+            cache.save_state()
+            rendered[label] = appended
+            self.logger.info(f"趋势图已更新: {output_path} - 新增: {appended}帧, 共: {cache.state['rows']}帧, "
+                             f"绘图耗时: {time.time() - started:.2f}秒")
+        return rendered
+
+
+def load_references(config):
+    """从相机配置取得各序列的初始坐标；init_points_path 不可用时返回空字典（以第一帧为参考）"""
+    try:
+        camera_configs = config.get_camera_configs()
+    except (OSError, KeyError, ValueError):
+        return {}
+    references = {}
+    for camera_name, camera_config in camera_configs.items():
+        if 'rois' in camera_config:
+            for roi_name, roi_config in camera_config['rois'].items():
+                references[stream_label(camera_name, roi_name)] = roi_config['pre_points']
+        else:
+            references[camera_name] = camera_config['pre_points']
+    return references
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按相机生成点位移趋势图（增量缓存）')
+    parser.add_argument('--config', default='config.yaml', help='配置文件路径')
+    parser.add_argument('--processed', help='处理结果根路径，默认取配置文件中的 base_processed_path')
+    parser.add_argument('--camera', action='append', help='仅处理指定相机，可重复指定')
+    parser.add_argument('--days', type=int, help='只绘制最近 N 天，0 为全部历史')
+    parser.add_argument('--force', action='store_true', help='没有新数据也重新绘图')
+    parser.add_argument('--rebuild', action='store_true', help='丢弃缓存，从全部历史重建')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from config_loader import load_config
+    config = load_config(args.config)
+    trend_config = config.get_trend_chart_config()
+    if args.days is not None:
+        trend_config['days'] = args.days
+    if args.rebuild and os.path.isdir(trend_config['cache_dir']):
+        for name in os.listdir(trend_config['cache_dir']):
+            if name.endswith(('.f64', '.json')):
+                os.remove(os.path.join(trend_config['cache_dir'], name))
+
+    generator = TrendChartGenerator(args.processed or config.get_base_processed_path(), trend_config,
+                                    references=load_references(config))
+    started = time.time()
+    rendered = generator.run_once(args.camera, force=args.force or args.rebuild)
+    logging.getLogger('atli_monitor.trend_charts').info(
+        f"趋势图生成完成 - 重绘: {len(rendered)}个序列, 耗时: {time.time() - started:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()